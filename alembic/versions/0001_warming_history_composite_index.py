@@ -0,0 +1,42 @@
+"""Composite (domain_id, started_at) index for warming_history
+
+Revision ID: 0001_history_composite_index
+Revises: 
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001_history_composite_index'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # На свежей базе таблицу (уже с индексом) создаст Base.metadata.create_all
+    if not sa.inspect(op.get_bind()).has_table("warming_history"):
+        return
+
+    # CONCURRENTLY не блокирует запись истории, но требует выполнения вне транзакции
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_warming_history_domain_started "
+            "ON warming_history (domain_id, started_at)"
+        )
+        # Одиночный индекс по domain_id покрывается левым префиксом составного
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_warming_history_domain_id")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_warming_history_domain_id "
+            "ON warming_history (domain_id)"
+        )
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_warming_history_domain_started")
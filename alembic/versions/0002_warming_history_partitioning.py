@@ -0,0 +1,98 @@
+"""Optional monthly range partitioning of warming_history
+
+Применяется только при HISTORY_PARTITIONING=true: таблица пересоздается
+как PARTITION BY RANGE (started_at) с помесячными партициями и default-партицией,
+данные копируются. Дальше партиции создаются и удаляются задачей компактизации
+истории (DatabaseManager.maintain_history_partitions).
+
+Чтобы включить партиционирование позже, установите HISTORY_PARTITIONING=true и выполните
+alembic downgrade 0001_history_composite_index && alembic upgrade head
+(при выключенном флаге downgrade этой ревизии ничего не меняет).
+
+Revision ID: 0002_history_partitioning
+Revises: 0001_history_composite_index
+Create Date: 2026-10-19 10:30:00.000000
+
+"""
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.config import config as app_config
+from app.core import partitions
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002_history_partitioning'
+down_revision: Union[str, None] = '0001_history_composite_index'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+LEGACY_TABLE = "warming_history_legacy"
+
+
+def _is_partitioned(bind) -> bool:
+    return bool(bind.execute(sa.text(partitions.IS_PARTITIONED_SQL)).scalar())
+
+
+def _rebuild_table(bind, partitioned: bool) -> None:
+    """Пересоздание warming_history с копированием данных и сохранением последовательности id"""
+    table = partitions.HISTORY_TABLE
+
+    op.execute(f"ALTER TABLE {table} RENAME TO {LEGACY_TABLE}")
+    sequence = bind.execute(sa.text(f"SELECT pg_get_serial_sequence('{LEGACY_TABLE}', 'id')")).scalar()
+    op.execute(f"ALTER SEQUENCE {sequence} OWNED BY NONE")
+
+    # Индексы старой таблицы освобождают имена для новой
+    for index_name in ("ix_warming_history_domain_started", "ix_warming_history_started_at"):
+        op.execute(f"ALTER INDEX IF EXISTS {index_name} RENAME TO {index_name}_legacy")
+
+    partition_clause = " PARTITION BY RANGE (started_at)" if partitioned else ""
+    op.execute(f"CREATE TABLE {table} (LIKE {LEGACY_TABLE} INCLUDING DEFAULTS){partition_clause}")
+
+    # В партиционированной таблице ключ партиционирования обязан входить в первичный ключ
+    primary_key = "id, started_at" if partitioned else "id"
+    op.execute(f"ALTER TABLE {table} ADD PRIMARY KEY ({primary_key})")
+    op.execute(
+        f"ALTER TABLE {table} ADD FOREIGN KEY (domain_id) "
+        f"REFERENCES domains (id) ON DELETE CASCADE"
+    )
+
+    if partitioned:
+        bounds = bind.execute(sa.text(f"SELECT min(started_at) FROM {LEGACY_TABLE}")).scalar()
+        now = datetime.utcnow()
+        first_month = partitions.month_start(bounds or now)
+        last_month = partitions.add_months(partitions.month_start(now), app_config.HISTORY_PARTITIONS_AHEAD)
+        for month in partitions.months_between(first_month, last_month):
+            op.execute(partitions.create_partition_sql(month))
+        # Страховка от вставки вне созданных партиций
+        op.execute(f"CREATE TABLE IF NOT EXISTS {partitions.DEFAULT_PARTITION} PARTITION OF {table} DEFAULT")
+
+    op.execute(f"INSERT INTO {table} SELECT * FROM {LEGACY_TABLE}")
+    op.execute(f"ALTER SEQUENCE {sequence} OWNED BY {table}.id")
+    op.execute(f"DROP TABLE {LEGACY_TABLE}")
+
+    op.execute(f"CREATE INDEX ix_warming_history_domain_started ON {table} (domain_id, started_at)")
+    op.execute(f"CREATE INDEX ix_warming_history_started_at ON {table} (started_at)")
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+
+    if not app_config.HISTORY_PARTITIONING:
+        return
+    if not sa.inspect(bind).has_table(partitions.HISTORY_TABLE) or _is_partitioned(bind):
+        return
+
+    _rebuild_table(bind, partitioned=True)
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+
+    if not sa.inspect(bind).has_table(partitions.HISTORY_TABLE) or not _is_partitioned(bind):
+        return
+
+    _rebuild_table(bind, partitioned=False)
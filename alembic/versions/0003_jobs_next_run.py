@@ -0,0 +1,33 @@
+"""Planned next run time for warming jobs
+
+Revision ID: 0003_jobs_next_run
+Revises: 0002_history_partitioning
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003_jobs_next_run'
+down_revision: Union[str, None] = '0002_history_partitioning'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # На свежей базе таблицу (уже с колонкой) создаст Base.metadata.create_all
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("jobs"):
+        return
+    if "next_run" in {column["name"] for column in inspector.get_columns("jobs")}:
+        return
+
+    op.add_column("jobs", sa.Column("next_run", sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("jobs", "next_run")
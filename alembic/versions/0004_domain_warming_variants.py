@@ -0,0 +1,33 @@
+"""Cache variant profiles warmed per domain
+
+Revision ID: 0004_domain_warming_variants
+Revises: 0003_jobs_next_run
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004_domain_warming_variants'
+down_revision: Union[str, None] = '0003_jobs_next_run'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # На свежей базе таблицу (уже с колонкой) создаст Base.metadata.create_all
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("domains"):
+        return
+    if "warming_variants" in {column["name"] for column in inspector.get_columns("domains")}:
+        return
+
+    op.add_column("domains", sa.Column("warming_variants", sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("domains", "warming_variants")
@@ -0,0 +1,36 @@
+"""Static assets discovered per domain
+
+Revision ID: 0005_domain_assets
+Revises: 0004_domain_warming_variants
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005_domain_assets'
+down_revision: Union[str, None] = '0004_domain_warming_variants'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # На свежей базе таблицу (уже с колонками) создаст Base.metadata.create_all
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("domains"):
+        return
+    columns = {column["name"] for column in inspector.get_columns("domains")}
+
+    if "asset_urls" not in columns:
+        op.add_column("domains", sa.Column("asset_urls", sa.JSON(), nullable=True))
+    if "assets_discovered_at" not in columns:
+        op.add_column("domains", sa.Column("assets_discovered_at", sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("domains", "assets_discovered_at")
+    op.drop_column("domains", "asset_urls")
@@ -0,0 +1,36 @@
+"""Render warming flag per domain
+
+Revision ID: 0006_domain_render_warming
+Revises: 0005_domain_assets
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006_domain_render_warming'
+down_revision: Union[str, None] = '0005_domain_assets'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # На свежей базе таблицу (уже с колонкой) создаст Base.metadata.create_all
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("domains"):
+        return
+    if "render_warming" in {column["name"] for column in inspector.get_columns("domains")}:
+        return
+
+    op.add_column(
+        "domains",
+        sa.Column("render_warming", sa.Boolean(), nullable=False, server_default=sa.false()),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("domains", "render_warming")
@@ -0,0 +1,33 @@
+"""Deadline of queued warming tasks
+
+Revision ID: 0007_warming_task_deadline
+Revises: 0006_domain_render_warming
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007_warming_task_deadline'
+down_revision: Union[str, None] = '0006_domain_render_warming'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # На свежей базе таблицу (уже с колонкой) создаст Base.metadata.create_all
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("warming_tasks"):
+        return
+    if "deadline_at" in {column["name"] for column in inspector.get_columns("warming_tasks")}:
+        return
+
+    op.add_column("warming_tasks", sa.Column("deadline_at", sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("warming_tasks", "deadline_at")
@@ -4,13 +4,19 @@
 import logging
 from datetime import datetime
 from aiogram import Router, F
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.filters import Command
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 
 from app.core.db import db_manager
-from app.bot.keyboards.inline import get_clients_keyboard, get_client_actions_keyboard, get_back_keyboard
+from app.core.load_planner import render_curve
+from app.core.scheduler import warming_scheduler
+from app.core.variants import DEFAULT_VARIANT, ENCODINGS, is_known_variant, load_profiles
+from app.bot.keyboards.inline import (
+    get_clients_keyboard, get_client_actions_keyboard, get_back_keyboard, get_load_plan_keyboard,
+)
 from app.bot.middlewares.role_check import AdminOnlyMiddleware
 
 logger = logging.getLogger(__name__)
@@ -371,6 +377,156 @@ async def callback_link_domain(callback: CallbackQuery):
         )
 
 
+def _format_load_plan(plan: dict) -> str:
+    """Текст плана нагрузки с кривыми (пик одновременных запросов по времени горизонта)"""
+    if not plan["offsets"]:
+        return "📐 <b>План нагрузки</b>\n\nНет доменов в автопрогреве."
+    
+    peak = max(plan["current_peak"] or 0, plan["planned_peak"]) or 1
+    horizon_hours = plan["horizon_seconds"] / 3600
+    text = (
+        f"📐 <b>План нагрузки</b> ({len(plan['offsets'])} доменов, горизонт {horizon_hours:.1f}ч)\n\n"
+        f"• Пик сейчас: <b>{plan['current_peak'] or 0:.0f}</b> одновременных запросов\n"
+        f"• Пик по плану: <b>{plan['planned_peak']:.0f}</b>\n"
+        f"• В среднем: {plan['average']:.1f}\n"
+    )
+    
+    if plan["current"]:
+        text += f"\n<b>Сейчас:</b>\n<pre>{render_curve(plan['current'], plan['slot_seconds'], peak=peak)}</pre>"
+    text += f"\n<b>По плану:</b>\n<pre>{render_curve(plan['planned'], plan['slot_seconds'], peak=peak)}</pre>"
+    return text
+
+
+@router.message(Command("load_plan"))
+async def cmd_load_plan(message: Message):
+    """План фаз автопрогрева и прогноз нагрузки"""
+    status_message = await message.answer("📐 Считаю план нагрузки...")
+    plan = await warming_scheduler.build_load_plan()
+    await status_message.edit_text(
+        _format_load_plan(plan),
+        parse_mode="HTML",
+        reply_markup=get_load_plan_keyboard() if plan["offsets"] else None
+    )
+
+
+@router.callback_query(F.data == "refresh_load_plan")
+async def callback_refresh_load_plan(callback: CallbackQuery):
+    """Пересчет плана нагрузки"""
+    await callback.answer("📐 Пересчитываю...")
+    plan = await warming_scheduler.build_load_plan()
+    try:
+        await callback.message.edit_text(
+            _format_load_plan(plan),
+            parse_mode="HTML",
+            reply_markup=get_load_plan_keyboard() if plan["offsets"] else None
+        )
+    except TelegramBadRequest as e:
+        # Текст не изменился - Telegram не дает редактировать сообщение
+        if "message is not modified" not in str(e):
+            raise
+
+
+@router.callback_query(F.data == "apply_load_plan")
+async def callback_apply_load_plan(callback: CallbackQuery):
+    """Применение плана нагрузки (расчет заново - расписание могло измениться)"""
+    await callback.answer("📐 Применяю план...")
+    plan = await warming_scheduler.build_load_plan()
+    moved = await warming_scheduler.apply_load_plan(plan)
+    await callback.message.edit_text(
+        f"✅ <b>План применен</b>\n\n"
+        f"Перенесен следующий запуск {moved} доменов.\n"
+        f"Пик нагрузки: {plan['current_peak'] or 0:.0f} → <b>{plan['planned_peak']:.0f}</b> одновременных запросов",
+        parse_mode="HTML"
+    )
+
+
+@router.message(Command("variants"))
+async def cmd_variants(message: Message):
+    """
+    Варианты кэша домена: /variants <домен> [профиль ...]
+    
+    Без профилей - показать текущие, "default" - сбросить на вариант по умолчанию.
+    """
+    args = message.text.split()[1:]
+    profiles = load_profiles()
+    
+    if not args:
+        await message.answer(
+            "🧬 <b>Варианты кэша</b>\n\n"
+            "Использование: <code>/variants домен [профиль ...]</code>\n"
+            "Сброс: <code>/variants домен default</code>\n\n"
+            f"Профили: {', '.join(f'<code>{name}</code>' for name in profiles)}\n"
+            f"Сжатие: <code>профиль@кодировка</code> ({', '.join(ENCODINGS)}), например <code>mobile@gzip</code>",
+            parse_mode="HTML"
+        )
+        return
+    
+    domain = await db_manager.get_domain_by_name(args[0])
+    if not domain:
+        await message.answer(f"❌ Домен <b>{args[0]}</b> не найден", parse_mode="HTML")
+        return
+    
+    names = args[1:]
+    if names:
+        if names == ["default"]:
+            names = []
+        unknown = [name for name in names if not is_known_variant(name, profiles)]
+        if unknown:
+            await message.answer(
+                f"❌ Неизвестные профили: {', '.join(unknown)}\n"
+                f"Доступны: {', '.join(profiles)} (сжатие: профиль@{'|'.join(ENCODINGS)})"
+            )
+            return
+        # Порядок сохраняем, повторы убираем
+        names = list(dict.fromkeys(names))
+        await db_manager.set_domain_variants(domain.id, names)
+        logger.info(f"Domain {domain.name} warming variants set to {names or [DEFAULT_VARIANT]}")
+        current = names
+    else:
+        current = domain.warming_variants or []
+    
+    await message.answer(
+        f"🧬 <b>{domain.name}</b>: {', '.join(current or [DEFAULT_VARIANT])}\n\n"
+        f"Каждый URL прогревается в каждом варианте.",
+        parse_mode="HTML"
+    )
+
+
+@router.message(Command("render"))
+async def cmd_render(message: Message):
+    """
+    Прогрев через headless-браузер: /render <домен> [on|off]
+    
+    Для сайтов, где кэш заполняется только при настоящем переходе браузера
+    (серверный рендеринг фрагментов, edge-функции). Дороже обычного прогрева.
+    """
+    args = message.text.split()[1:]
+    if not args or (len(args) > 1 and args[1] not in ("on", "off")):
+        await message.answer(
+            "🧭 <b>Прогрев рендерингом</b>\n\n"
+            "Использование: <code>/render домен [on|off]</code>",
+            parse_mode="HTML"
+        )
+        return
+    
+    domain = await db_manager.get_domain_by_name(args[0])
+    if not domain:
+        await message.answer(f"❌ Домен <b>{args[0]}</b> не найден", parse_mode="HTML")
+        return
+    
+    enabled = domain.render_warming
+    if len(args) > 1:
+        enabled = args[1] == "on"
+        await db_manager.set_domain_render_warming(domain.id, enabled)
+        logger.info(f"Domain {domain.name} render warming {'enabled' if enabled else 'disabled'}")
+    
+    await message.answer(
+        f"🧭 <b>{domain.name}</b>: "
+        + ("прогрев в headless-браузере (Chromium)" if enabled else "обычный прогрев (HTTP)"),
+        parse_mode="HTML"
+    )
+
+
 @router.message(Command("restore_backup"))
 async def cmd_restore_backup(message: Message, state: FSMContext):
     """Восстановление БД из бэкапа"""
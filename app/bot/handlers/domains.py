@@ -236,7 +236,9 @@ async def callback_warm_group(callback: CallbackQuery):
         domain_name=domain.name,
         urls=urls,
         user_id=callback.from_user.id,
-        bot=callback.bot
+        bot=callback.bot,
+        variants=domain.warming_variants,
+        fetcher="browser" if domain.render_warming else None
     )
     
     if started:
@@ -540,70 +542,98 @@ async def callback_show_stats(callback: CallbackQuery):
         return
     
     try:
-        # Определяем период
+        # Определяем период и источник данных:
+        # 24 часа - сырые записи, длинные периоды - часовые/дневные агрегаты
+        granularity = None
         if period == "24h":
             start_date = datetime.utcnow() - timedelta(hours=24)
             period_name = "за последние 24 часа"
         elif period == "7d":
             start_date = datetime.utcnow() - timedelta(days=7)
             period_name = "за последние 7 дней"
+            granularity = "hour"
         elif period == "30d":
             start_date = datetime.utcnow() - timedelta(days=30)
             period_name = "за последние 30 дней"
+            granularity = "hour"
         else:  # all
             start_date = datetime.utcnow() - timedelta(days=365)  # год назад
             period_name = "за всю историю"
+            granularity = "day"
         
-        # Получаем историю прогревов
-        history = await db_manager.get_warming_history_by_period(
-            domain_id=domain_id,
-            start_date=start_date,
-            end_date=datetime.utcnow()
-        )
-        
-        if not history:
-            await callback.message.edit_text(
-                f"📊 <b>Статистика для {domain.name}</b>\n\n"
-                f"❌ Нет данных {period_name}.\n\n"
-                f"Выполните хотя бы один прогрев, чтобы увидеть статистику.",
-                parse_mode="HTML",
-                reply_markup=get_stats_period_keyboard(domain_id)
-            )
-            return
-        
-        # Генерируем график
-        graph_buf = graph_generator.generate_combined_graph(history, domain.name)
+        # Готовый график берем из кэша, пока у домена не появилось новых прогревов
+        last_history_id = await db_manager.get_last_warming_history_id(domain_id)
+        cache_key = (domain_id, period, last_history_id)
+        cached = graph_generator.get_cached(cache_key) if last_history_id else None
         
-        if not graph_buf:
-            await callback.message.edit_text(
-                f"❌ Ошибка генерации графика.\n\n"
-                f"Попробуйте позже.",
-                reply_markup=get_stats_period_keyboard(domain_id)
+        if cached:
+            graph_bytes, stats_text = cached
+        else:
+            # Получаем историю прогревов
+            if granularity:
+                history = await db_manager.get_warming_rollups_by_period(
+                    domain_id=domain_id,
+                    start_date=start_date,
+                    end_date=datetime.utcnow(),
+                    granularity=granularity
+                )
+            else:
+                history = await db_manager.get_warming_history_by_period(
+                    domain_id=domain_id,
+                    start_date=start_date,
+                    end_date=datetime.utcnow()
+                )
+            
+            if not history:
+                await callback.message.edit_text(
+                    f"📊 <b>Статистика для {domain.name}</b>\n\n"
+                    f"❌ Нет данных {period_name}.\n\n"
+                    f"Выполните хотя бы один прогрев, чтобы увидеть статистику.",
+                    parse_mode="HTML",
+                    reply_markup=get_stats_period_keyboard(domain_id)
+                )
+                return
+            
+            # Генерируем график в пуле процессов (не блокирует event loop)
+            graph_bytes = await graph_generator.render("combined", history, domain.name)
+            
+            if not graph_bytes:
+                await callback.message.edit_text(
+                    f"❌ Ошибка генерации графика.\n\n"
+                    f"Попробуйте позже.",
+                    reply_markup=get_stats_period_keyboard(domain_id)
+                )
+                return
+            
+            # Формируем текстовую статистику (агрегат = несколько прогревов)
+            if granularity:
+                measurements = sum(h.warmings_count for h in history)
+                avg_time = sum(h.response_time_sum for h in history) / measurements if measurements else 0
+            else:
+                measurements = len(history)
+                avg_time = sum(h.avg_response_time for h in history) / len(history)
+            avg_success_rate = sum(
+                (h.successful_requests / h.total_requests * 100) if h.total_requests > 0 else 0
+                for h in history
+            ) / len(history)
+            
+            stats_text = (
+                f"📊 <b>Статистика для {domain.name}</b>\n"
+                f"{period_name}\n\n"
+                f"📈 <b>Показатели:</b>\n"
+                f"• Всего измерений: <b>{measurements}</b>\n"
+                f"• Средняя скорость: <b>{avg_time:.2f}s</b>\n"
+                f"• Средняя успешность: <b>{avg_success_rate:.1f}%</b>\n\n"
+                f"📊 График прикреплен ниже"
             )
-            return
-        
-        # Формируем текстовую статистику
-        avg_time = sum(h.avg_response_time for h in history) / len(history)
-        avg_success_rate = sum(
-            (h.successful_requests / h.total_requests * 100) if h.total_requests > 0 else 0
-            for h in history
-        ) / len(history)
-        
-        stats_text = (
-            f"📊 <b>Статистика для {domain.name}</b>\n"
-            f"{period_name}\n\n"
-            f"📈 <b>Показатели:</b>\n"
-            f"• Всего измерений: <b>{len(history)}</b>\n"
-            f"• Средняя скорость: <b>{avg_time:.2f}s</b>\n"
-            f"• Средняя успешность: <b>{avg_success_rate:.1f}%</b>\n\n"
-            f"📊 График прикреплен ниже"
-        )
+            
+            graph_generator.put_cached(cache_key, (graph_bytes, stats_text))
         
         # Удаляем старое сообщение
         await callback.message.delete()
         
         # Отправляем новое сообщение с графиком
-        photo = BufferedInputFile(graph_buf.read(), filename=f"stats_{domain.name}_{period}.png")
+        photo = BufferedInputFile(graph_bytes, filename=f"stats_{domain.name}_{period}.png")
         await callback.message.answer_photo(
             photo=photo,
             caption=stats_text,
@@ -38,6 +38,9 @@ async def cmd_help(message: Message):
 /add_client - Добавить клиента (приглашение)
 /clients - Управление клиентами
 /status - Активные прогревы
+/load_plan - План нагрузки автопрогрева
+/variants - Варианты кэша домена (mobile, языки, cookies)
+/render - Прогрев домена в headless-браузере
 /help - Эта справка
 
 <b>Работа с клиентами:</b>
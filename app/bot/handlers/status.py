@@ -10,6 +10,7 @@ from aiogram.types import Message
 
 from app.core.warming_manager import warming_manager
 from app.core.db import db_manager
+from app.core.scheduler import warming_scheduler
 
 logger = logging.getLogger(__name__)
 
@@ -64,6 +65,17 @@ async def cmd_status(message: Message):
                     last_run_text = f" (прогрев {int(time_since / 3600)}ч назад)"
             
             status_text += f"• {domain.name} - каждые {job.schedule}{last_run_text}\n"
+            
+            # Успевает ли домен прогреваться в своем интервале
+            stats = warming_scheduler.run_stats.get(domain.id)
+            if stats and stats.duty_cycle is not None:
+                load_emoji = "⚠️" if stats.duty_cycle >= 0.9 or stats.skipped else "⏳"
+                details = f"  {load_emoji} прогрев ~{int(stats.avg_duration)}с, загрузка {stats.duty_cycle * 100:.0f}%"
+                if stats.skipped:
+                    details += f", пропущено запусков: {stats.skipped}"
+                if stats.interval != stats.base_interval:
+                    details += f", интервал растянут до {int(stats.interval // 60)}м"
+                status_text += details + "\n"
     
     if scheduled_count == 0:
         status_text += "Нет запланированных задач\n"
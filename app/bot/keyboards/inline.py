@@ -256,6 +256,16 @@ def get_client_actions_keyboard(client_id: int) -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+def get_load_plan_keyboard() -> InlineKeyboardMarkup:
+    """Клавиатура плана нагрузки"""
+    builder = InlineKeyboardBuilder()
+    builder.row(
+        InlineKeyboardButton(text="✅ Применить план", callback_data="apply_load_plan"),
+        InlineKeyboardButton(text="🔄 Обновить", callback_data="refresh_load_plan"),
+    )
+    return builder.as_markup()
+
+
 def get_back_keyboard() -> InlineKeyboardMarkup:
     """Простая клавиатура "Назад" """
     builder = InlineKeyboardBuilder()
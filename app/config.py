@@ -32,16 +32,129 @@ class Config:
     WARMER_CONCURRENCY: int = int(os.getenv("WARMER_CONCURRENCY", "5"))
     WARMER_MIN_DELAY: float = float(os.getenv("WARMER_MIN_DELAY", "0.5"))
     WARMER_MAX_DELAY: float = float(os.getenv("WARMER_MAX_DELAY", "2.0"))
-    WARMER_REPEAT_COUNT: int = int(os.getenv("WARMER_REPEAT_COUNT", "2"))
+    WARMER_REPEAT_COUNT: int = int(os.getenv("WARMER_REPEAT_COUNT", "2"))  # Максимум проходов по URL
     WARMER_REQUEST_TIMEOUT: int = int(os.getenv("WARMER_REQUEST_TIMEOUT", "30"))
     WARMER_CHUNK_SIZE: int = int(os.getenv("WARMER_CHUNK_SIZE", "400"))  # Размер части для разбиения больших доменов
+    WARMER_PROCESSES: int = int(os.getenv("WARMER_PROCESSES", "1"))  # > 1: URL делятся между процессами (по ядрам)
+    WARMER_PROCESS_MIN_URLS: int = int(os.getenv("WARMER_PROCESS_MIN_URLS", "200"))  # Меньшие сайты греются в одном процессе
+    
+    # Дедупликация: URL, прогретый другим прогревом за последние N секунд, пропускается (0 = выключить).
+    # Одновременные запросы одного URL из разных прогревов объединяются всегда
+    WARMER_DEDUP_WINDOW_SECONDS: float = float(os.getenv("WARMER_DEDUP_WINDOW_SECONDS", "60"))
+    WARMER_DEDUP_MAX_URLS: int = int(os.getenv("WARMER_DEDUP_MAX_URLS", "200000"))  # Ограничение памяти окна
+    
+    # Условные запросы (If-None-Match / If-Modified-Since) по валидаторам прошлого ответа
+    WARMER_REVALIDATE: bool = os.getenv("WARMER_REVALIDATE", "false").lower() == "true"
+    WARMER_VALIDATORS_MAX_URLS: int = int(os.getenv("WARMER_VALIDATORS_MAX_URLS", "200000"))
+    
+    # Повторные проходы только по URL, которые еще не горячие: промах кэша по заголовкам
+    # или ответ медленнее обычного в WARMER_HOT_SLOWDOWN раз (false - слепые повторы всех URL)
+    WARMER_VERIFY_HOT: bool = os.getenv("WARMER_VERIFY_HOT", "true").lower() == "true"
+    WARMER_HOT_SLOWDOWN: float = float(os.getenv("WARMER_HOT_SLOWDOWN", "2.0"))
+    
+    # Профили вариантов кэша (JSON: {"имя": {"headers": {...}, "cookies": {...}}}),
+    # дополняют встроенные desktop и mobile; варианты домена задаются командой /variants
+    WARMER_VARIANT_PROFILES: str = os.getenv("WARMER_VARIANT_PROFILES", "")
+    
+    # Прогрев статики (CSS, JS, изображения), найденной на выборке страниц домена
+    WARMER_ASSETS_ENABLED: bool = os.getenv("WARMER_ASSETS_ENABLED", "false").lower() == "true"
+    WARMER_ASSET_INTERVAL_MINUTES: int = int(os.getenv("WARMER_ASSET_INTERVAL_MINUTES", "360"))  # Статика меняется реже страниц
+    WARMER_ASSET_SAMPLE_PAGES: int = int(os.getenv("WARMER_ASSET_SAMPLE_PAGES", "20"))  # Страниц для поиска статики
+    WARMER_ASSET_IMAGES_PER_PAGE: int = int(os.getenv("WARMER_ASSET_IMAGES_PER_PAGE", "3"))  # Первые (верхние) изображения страницы
+    WARMER_ASSET_MAX_URLS: int = int(os.getenv("WARMER_ASSET_MAX_URLS", "300"))
+    WARMER_ASSET_HOSTS: str = os.getenv("WARMER_ASSET_HOSTS", "")  # Доп. хосты CDN через запятую
+    
+    # Прогрев рендерингом в headless Chromium (для доменов с флагом /render, нужен Playwright)
+    WARMER_BROWSER_PAGES: int = int(os.getenv("WARMER_BROWSER_PAGES", "4"))  # Вкладок на процесс прогрева
+    WARMER_BROWSER_BLOCK: str = os.getenv("WARMER_BROWSER_BLOCK", "image,media,font")  # Не загружаемые типы ресурсов
+    
+    # Повторы временных сбоев (ошибки соединения, 502/503/504, 429 с Retry-After):
+    # экспоненциальная задержка с джиттером, бюджет - процент от запросов прогрева
+    WARMER_RETRY_ATTEMPTS: int = int(os.getenv("WARMER_RETRY_ATTEMPTS", "2"))  # 0 = без повторов
+    WARMER_RETRY_BASE_DELAY: float = float(os.getenv("WARMER_RETRY_BASE_DELAY", "0.5"))
+    WARMER_RETRY_MAX_DELAY: float = float(os.getenv("WARMER_RETRY_MAX_DELAY", "10"))
+    WARMER_RETRY_BUDGET_PERCENT: float = float(os.getenv("WARMER_RETRY_BUDGET_PERCENT", "10"))
+    
+    # Circuit breaker по сайту: после N ошибок/таймаутов подряд запросы к сайту
+    # не выполняются, раз в RECOVERY_SECONDS - один пробный (0 = выключить)
+    WARMER_BREAKER_FAILURES: int = int(os.getenv("WARMER_BREAKER_FAILURES", "10"))
+    WARMER_BREAKER_RECOVERY_SECONDS: float = float(os.getenv("WARMER_BREAKER_RECOVERY_SECONDS", "300"))
     
     # Задержка между доменами для SaaS платформ (секунды, 0 = выключить)
     WARMER_DOMAIN_DELAY_MIN: int = int(os.getenv("WARMER_DOMAIN_DELAY_MIN", "0"))
     WARMER_DOMAIN_DELAY_MAX: int = int(os.getenv("WARMER_DOMAIN_DELAY_MAX", "60"))
     
+    # Автопрогрев, который не успевает за свой интервал: интервал растягивается так,
+    # чтобы прогрев занимал не больше SCHEDULER_TARGET_DUTY_CYCLE от него
+    SCHEDULER_AUTO_STRETCH: bool = os.getenv("SCHEDULER_AUTO_STRETCH", "false").lower() == "true"
+    SCHEDULER_TARGET_DUTY_CYCLE: float = float(os.getenv("SCHEDULER_TARGET_DUTY_CYCLE", "0.8"))
+    
+    # Срок автопрогрева - доля интервала домена (app.core.deadline): темп подбирается
+    # под срок, при нехватке времени отбрасываются повторы и URL идут по приоритету.
+    # 0 - без срока
+    SCHEDULER_DEADLINE_FRACTION: float = float(os.getenv("SCHEDULER_DEADLINE_FRACTION", "0.9"))
+    
+    # Планировщик нагрузки: фазы запуска доменов подбираются так, чтобы минимизировать
+    # пик одновременных запросов (ежедневно и по /load_plan). Случайная задержка
+    # WARMER_DOMAIN_DELAY при этом не используется
+    SCHEDULER_LOAD_SHAPING: bool = os.getenv("SCHEDULER_LOAD_SHAPING", "false").lower() == "true"
+    SCHEDULER_PLAN_SLOT_SECONDS: int = int(os.getenv("SCHEDULER_PLAN_SLOT_SECONDS", "30"))
+    
+    # Очередь прогревов в БД: бот только ставит задачи, прогрев выполняют воркеры (python -m app.worker)
+    WARMING_QUEUE_ENABLED: bool = os.getenv("WARMING_QUEUE_ENABLED", "false").lower() == "true"
+    WARMING_QUEUE_SYNC_SECONDS: int = int(os.getenv("WARMING_QUEUE_SYNC_SECONDS", "5"))  # Как часто бот читает результаты
+    WORKER_CONCURRENCY: int = int(os.getenv("WORKER_CONCURRENCY", "4"))  # Доменов одновременно на одного воркера
+    WORKER_POLL_SECONDS: float = float(os.getenv("WORKER_POLL_SECONDS", "2"))
+    WORKER_LEASE_SECONDS: int = int(os.getenv("WORKER_LEASE_SECONDS", "60"))  # Без heartbeat задача уходит другому воркеру
+    WORKER_MAX_ATTEMPTS: int = int(os.getenv("WORKER_MAX_ATTEMPTS", "3"))
+    WORKER_RETRY_DELAY_SECONDS: int = int(os.getenv("WORKER_RETRY_DELAY_SECONDS", "60"))
+    
+    # История прогревов: хранение сырых записей и агрегатов (дни, 0 = хранить всё)
+    # Дневные агрегаты хранятся всегда
+    HISTORY_RETENTION_DAYS: int = int(os.getenv("HISTORY_RETENTION_DAYS", "14"))
+    HISTORY_HOURLY_RETENTION_DAYS: int = int(os.getenv("HISTORY_HOURLY_RETENTION_DAYS", "90"))
+    
+    # Помесячное партиционирование warming_history (применяется миграцией Alembic)
+    HISTORY_PARTITIONING: bool = os.getenv("HISTORY_PARTITIONING", "false").lower() == "true"
+    HISTORY_PARTITIONS_AHEAD: int = int(os.getenv("HISTORY_PARTITIONS_AHEAD", "2"))  # Сколько месяцев создавать заранее
+    
+    # Фоновая пакетная запись результатов прогрева
+    HISTORY_WRITER_BATCH_SIZE: int = int(os.getenv("HISTORY_WRITER_BATCH_SIZE", "100"))
+    HISTORY_WRITER_FLUSH_MS: int = int(os.getenv("HISTORY_WRITER_FLUSH_MS", "500"))
+    HISTORY_WRITER_QUEUE_SIZE: int = int(os.getenv("HISTORY_WRITER_QUEUE_SIZE", "10000"))  # При переполнении задачи ждут
+    HISTORY_SPILL_PATH: str = os.getenv("HISTORY_SPILL_PATH", "/app/backups/history_spill.jsonl")  # Запись на диск, если БД недоступна
+    HISTORY_SPILL_RETRY_SECONDS: int = int(os.getenv("HISTORY_SPILL_RETRY_SECONDS", "30"))
+    
+    # Графики статистики
+    GRAPH_RENDER_WORKERS: int = int(os.getenv("GRAPH_RENDER_WORKERS", "1"))  # Процессы отрисовки (0 = поток в текущем процессе)
+    GRAPH_MAX_POINTS: int = int(os.getenv("GRAPH_MAX_POINTS", "500"))  # Больше точек прореживается (LTTB)
+    GRAPH_CACHE_SIZE: int = int(os.getenv("GRAPH_CACHE_SIZE", "64"))
+    GRAPH_CACHE_TTL: int = int(os.getenv("GRAPH_CACHE_TTL", "300"))  # секунды
+    
+    # Кэш пользователей и ролей (middleware обращаются к нему на каждый апдейт)
+    USER_CACHE_TTL: int = int(os.getenv("USER_CACHE_TTL", "60"))  # секунды
+    USER_ACTIVITY_FLUSH_SECONDS: int = int(os.getenv("USER_ACTIVITY_FLUSH_SECONDS", "30"))  # Пакетная запись last_activity
+    
+    # Целевое время запуска (до первого опроса Telegram), превышение - предупреждение в логе
+    STARTUP_TARGET_SECONDS: float = float(os.getenv("STARTUP_TARGET_SECONDS", "5"))
+    
+    # Метрики Prometheus (/metrics) - в боте и в каждом воркере
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "false").lower() == "true"
+    METRICS_HOST: str = os.getenv("METRICS_HOST", "0.0.0.0")
+    METRICS_PORT: int = int(os.getenv("METRICS_PORT", "9100"))
+    
+    # Event loop: asyncio или uvloop (pip install uvloop)
+    EVENT_LOOP: str = os.getenv("EVENT_LOOP", "asyncio").lower()
+    # Стек кода, заблокировавшего event loop дольше N мс, - в лог и метрики (0 - выключено)
+    LOOP_BLOCK_THRESHOLD_MS: int = int(os.getenv("LOOP_BLOCK_THRESHOLD_MS", "0"))
+    
     # Logging
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "text").lower()  # text или json (структурные записи)
+    # Запись логов в отдельном потоке (QueueHandler), event loop не ждет I/O
+    LOG_QUEUE: bool = os.getenv("LOG_QUEUE", "true").lower() == "true"
+    # Доля успешных запросов прогрева в логе (ошибки и таймауты - всегда), например 0.01
+    WARMER_LOG_SAMPLE_RATE: float = float(os.getenv("WARMER_LOG_SAMPLE_RATE", "1.0"))
     
     # Notifications
     SEND_WARMING_NOTIFICATIONS: bool = os.getenv("SEND_WARMING_NOTIFICATIONS", "true").lower() == "true"
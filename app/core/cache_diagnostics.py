@@ -11,6 +11,7 @@ from datetime import datetime, timedelta
 import httpx
 
 from app.core.db import db_manager
+from app.core.single_flight import url_flights
 
 logger = logging.getLogger(__name__)
 
@@ -114,6 +115,8 @@ class CacheDiagnostics:
             time = await self.measure_response_time(url, repeat=3)
             if time:
                 base_times[url] = time
+                # Страница прогрета - параллельные прогревы ее пропустят
+                url_flights.mark_warmed(url)
                 logger.info(f"  [{i}/{len(pages)}] {url}: {time:.3f}s")
             else:
                 logger.warning(f"  [{i}/{len(pages)}] {url}: failed")
@@ -0,0 +1,177 @@
+"""
+Circuit breaker прогрева по origin (схема + хост)
+
+Когда сайт лежит, каждый запрос прогрева ждет таймаут, занимая слот
+конкурентности, и так на каждый URL и каждый повтор. После
+WARMER_BREAKER_FAILURES ошибок и таймаутов подряд (ответы 5xx тоже считаются)
+breaker размыкается: оставшиеся запросы к origin не выполняются (shed).
+Через WARMER_BREAKER_RECOVERY_SECONDS пропускается один пробный запрос
+(half-open): успех замыкает breaker, неудача снова размыкает его на тот же срок.
+
+Состояние живет в памяти процесса и переживает прогревы, так что мертвый
+сайт стоит пробного запроса раз в интервал восстановления, а не тысяч таймаутов.
+
+При WARMER_PROCESSES > 1 процессы прогрева получают состояние breaker'ов
+из основного процесса, а порог ошибок делится между ними - вместе они
+делают до сбоя примерно столько же запросов, сколько один процесс. Итоговые
+состояния возвращаются в основной процесс (самое строгое из них). У воркеров
+очереди (app.worker) breaker свой в каждом воркере.
+"""
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from app.config import config
+from app.utils.metrics import warm_circuit_open
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Состояние для передачи между процессами: (state, ошибок подряд, сколько секунд назад разомкнут)
+BreakerState = Tuple[str, int, Optional[float]]
+
+
+def origin_of(url: str) -> str:
+    parsed = urlparse(url)
+    return f"{parsed.scheme}://{parsed.netloc}"
+
+
+class CircuitBreaker:
+    """Состояние одного origin"""
+
+    def __init__(self, origin: str, failure_threshold: int, recovery_seconds: float):
+        self.origin = origin
+        self.failure_threshold = failure_threshold
+        self.recovery_seconds = recovery_seconds
+
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.trips = 0
+        self._probe_in_flight = False
+
+    def allow_request(self) -> bool:
+        """Можно ли выполнить запрос (в half-open - только один пробный)"""
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < self.recovery_seconds:
+                return False
+            self.state = HALF_OPEN
+        if self._probe_in_flight:
+            return False
+        self._probe_in_flight = True
+        return True
+
+    def record_success(self) -> None:
+        self.consecutive_failures = 0
+        self._probe_in_flight = False
+        if self.state != CLOSED:
+            self.state = CLOSED
+            self.opened_at = None
+            warm_circuit_open.set(0, origin=self.origin)
+
+    def record_failure(self) -> bool:
+        """
+        Неудачный запрос
+
+        Returns:
+            True, если breaker только что разомкнулся из замкнутого состояния
+            (повод для оповещения; повторные размыкания после проб - нет)
+        """
+        self.consecutive_failures += 1
+        if self.state == HALF_OPEN:
+            self._probe_in_flight = False
+            self._open()
+            return False
+        if self.state == CLOSED and self.consecutive_failures >= self.failure_threshold:
+            self._open()
+            self.trips += 1
+            return True
+        return False
+
+    def export(self) -> BreakerState:
+        opened_age = time.monotonic() - self.opened_at if self.opened_at is not None else None
+        return self.state, self.consecutive_failures, opened_age
+
+    def restore(self, state: BreakerState) -> None:
+        """Состояние из другого процесса (пробный запрос там уже завершен)"""
+        name, failures, opened_age = state
+        self.consecutive_failures = failures
+        self._probe_in_flight = False
+        if name == CLOSED:
+            self.state = CLOSED
+            self.opened_at = None
+        else:
+            self.state = OPEN
+            self.opened_at = time.monotonic() - opened_age
+        warm_circuit_open.set(0 if name == CLOSED else 1, origin=self.origin)
+
+    def release(self) -> None:
+        """Запрос прерван без результата (отмена прогрева) - проба снова доступна"""
+        self._probe_in_flight = False
+
+    def _open(self) -> None:
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        warm_circuit_open.set(1, origin=self.origin)
+
+
+def strictest_states(parts: Iterable[Dict[str, BreakerState]]) -> Dict[str, BreakerState]:
+    """
+    Общее состояние по итогам нескольких процессов
+
+    Разомкнутый хоть в одном процессе breaker разомкнут (с самым поздним
+    размыканием), иначе - замкнут с наибольшим числом ошибок подряд.
+    """
+    merged: Dict[str, BreakerState] = {}
+    for states in parts:
+        for origin, state in states.items():
+            current = merged.get(origin)
+            if current is None:
+                merged[origin] = state
+            elif state[0] != CLOSED:
+                if current[0] == CLOSED or state[2] < current[2]:
+                    merged[origin] = state
+            elif current[0] == CLOSED and state[1] > current[1]:
+                merged[origin] = state
+    return merged
+
+
+class CircuitBreakerRegistry:
+    """Breaker'ы по origin"""
+
+    def __init__(self, failure_threshold: Optional[int] = None, recovery_seconds: Optional[float] = None):
+        self.failure_threshold = failure_threshold if failure_threshold is not None else config.WARMER_BREAKER_FAILURES
+        self.recovery_seconds = recovery_seconds if recovery_seconds is not None else config.WARMER_BREAKER_RECOVERY_SECONDS
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.failure_threshold > 0
+
+    def get(self, url: str) -> CircuitBreaker:
+        origin = origin_of(url)
+        breaker = self._breakers.get(origin)
+        if breaker is None:
+            breaker = self._breakers[origin] = CircuitBreaker(origin, self.failure_threshold, self.recovery_seconds)
+        return breaker
+
+    def export(self, origins: Iterable[str]) -> Dict[str, BreakerState]:
+        """Состояние breaker'ов по списку origin (для другого процесса)"""
+        return {origin: self._breakers[origin].export() for origin in origins if origin in self._breakers}
+
+    def load(self, states: Dict[str, BreakerState]) -> None:
+        """Состояние из другого процесса (export) вместо своего"""
+        for origin, state in states.items():
+            breaker = self.get(origin)
+            breaker.failure_threshold = self.failure_threshold
+            breaker.restore(state)
+
+    def open_origins(self) -> List[str]:
+        return [origin for origin, breaker in self._breakers.items() if breaker.state != CLOSED]
+
+
+# Глобальный экземпляр
+circuit_breakers = CircuitBreakerRegistry()
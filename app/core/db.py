@@ -2,19 +2,102 @@
 Работа с базой данных
 """
 import logging
-from datetime import datetime
-from typing import AsyncGenerator, Optional, List
+import time
+from datetime import datetime, timedelta
+from typing import AsyncGenerator, Any, Dict, Optional, List, Tuple
 
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
-from sqlalchemy import select, delete
+from sqlalchemy import event, select, delete, insert, update, func, text, and_, or_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import selectinload
 
 from app.config import config
-from app.models.domain import Base, Domain, URL, Job, User, WarmingHistory, PendingClient
+from app.core import partitions
+from app.models.domain import (
+    Base, Domain, URL, Job, User, WarmingHistory, PendingClient,
+    WarmingRollupMixin, WarmingHistoryHourly, WarmingHistoryDaily, WarmingTask,
+)
+from app.utils.latency_sketch import LatencySketch
+from app.utils.metrics import db_query_duration
 
 logger = logging.getLogger(__name__)
 
 
+def _truncate_to_hour(moment: datetime) -> datetime:
+    """Начало часа"""
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def _truncate_to_day(moment: datetime) -> datetime:
+    """Начало суток"""
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+# Уровни агрегации истории: модель -> функция округления started_at
+ROLLUP_LEVELS = (
+    (WarmingHistoryHourly, _truncate_to_hour),
+    (WarmingHistoryDaily, _truncate_to_day),
+)
+
+# Поля сырой записи, нужные для агрегатов
+ROLLUP_SOURCE_COLUMNS = (
+    WarmingHistory.domain_id,
+    WarmingHistory.started_at,
+    WarmingHistory.total_requests,
+    WarmingHistory.successful_requests,
+    WarmingHistory.failed_requests,
+    WarmingHistory.timeout_requests,
+    WarmingHistory.avg_response_time,
+    WarmingHistory.min_response_time,
+    WarmingHistory.max_response_time,
+)
+
+# Статусы задач очереди прогрева
+ACTIVE_TASK_STATUSES = ("pending", "running")
+NOTIFY_TASK_STATUSES = ("done", "failed")
+FINISHED_TASK_STATUSES = ("done", "failed", "cancelled")
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    started = conn.info["query_started"].pop()
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+    db_query_duration.observe(time.perf_counter() - started, operation=operation)
+
+
+def _accumulate_rollup(rollup: WarmingRollupMixin, rows: List[Dict[str, Any]]) -> None:
+    """Добавление сырых записей прогрева в агрегат"""
+    sketch = LatencySketch.from_dict(rollup.latency_sketch)
+    
+    for row in rows:
+        rollup.warmings_count = (rollup.warmings_count or 0) + 1
+        rollup.total_requests = (rollup.total_requests or 0) + row["total_requests"]
+        rollup.successful_requests = (rollup.successful_requests or 0) + row["successful_requests"]
+        rollup.failed_requests = (rollup.failed_requests or 0) + row["failed_requests"]
+        rollup.timeout_requests = (rollup.timeout_requests or 0) + row["timeout_requests"]
+        rollup.response_time_sum = (rollup.response_time_sum or 0.0) + row["avg_response_time"]
+        
+        if row["min_response_time"] is not None:
+            rollup.min_response_time = (
+                row["min_response_time"] if rollup.min_response_time is None
+                else min(rollup.min_response_time, row["min_response_time"])
+            )
+        if row["max_response_time"] is not None:
+            rollup.max_response_time = (
+                row["max_response_time"] if rollup.max_response_time is None
+                else max(rollup.max_response_time, row["max_response_time"])
+            )
+        
+        sketch.add(row["avg_response_time"])
+    
+    # Присваиваем новый dict, чтобы SQLAlchemy заметил изменение JSON-колонки
+    rollup.latency_sketch = sketch.to_dict()
+
+
 class DatabaseManager:
     """Менеджер базы данных"""
     
@@ -26,11 +109,21 @@ class DatabaseManager:
             pool_size=10,
             max_overflow=20,
         )
+        # Время запросов для метрик (siteheater_db_query_duration_seconds)
+        event.listen(self.engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(self.engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
         self.async_session = async_sessionmaker(
             self.engine,
             class_=AsyncSession,
             expire_on_commit=False,
         )
+        
+        # Кэш пользователей: user_id -> (истекает, User). Middleware обращаются
+        # к пользователю на каждый апдейт Telegram - без кэша это транзакция на запись
+        self.user_cache_ttl = config.USER_CACHE_TTL
+        self._user_cache: Dict[int, Tuple[float, User]] = {}
+        # Накопленные обновления last_activity: user_id -> время последнего действия
+        self._pending_activity: Dict[int, datetime] = {}
     
     async def init_db(self) -> None:
         """Инициализация базы данных"""
@@ -142,6 +235,46 @@ class DatabaseManager:
             await session.commit()
             return True
     
+    async def get_domain_warming_options(self, domain_id: int) -> Dict[str, Any]:
+        """Параметры прогрева домена для SiteWarmer.warm_site (варианты кэша и способ запроса)"""
+        async with self.async_session() as session:
+            result = await session.execute(
+                select(Domain.warming_variants, Domain.render_warming).where(Domain.id == domain_id)
+            )
+            row = result.one_or_none()
+            if row is None:
+                return {}
+            return {"variants": row.warming_variants, "fetcher": "browser" if row.render_warming else None}
+    
+    async def set_domain_render_warming(self, domain_id: int, enabled: bool) -> None:
+        """Включение прогрева через headless-браузер"""
+        async with self.async_session() as session:
+            await session.execute(
+                update(Domain).where(Domain.id == domain_id).values(render_warming=enabled)
+            )
+            await session.commit()
+    
+    async def set_domain_variants(self, domain_id: int, variants: Optional[List[str]]) -> bool:
+        """Установка профилей вариантов кэша домена"""
+        async with self.async_session() as session:
+            result = await session.execute(
+                update(Domain)
+                .where(Domain.id == domain_id)
+                .values(warming_variants=variants or None)
+            )
+            await session.commit()
+            return result.rowcount > 0
+    
+    async def set_domain_assets(self, domain_id: int, asset_urls: List[str]) -> None:
+        """Сохранение найденной статики домена"""
+        async with self.async_session() as session:
+            await session.execute(
+                update(Domain)
+                .where(Domain.id == domain_id)
+                .values(asset_urls=asset_urls, assets_discovered_at=datetime.utcnow())
+            )
+            await session.commit()
+    
     # Job methods
     async def create_job(
         self,
@@ -193,6 +326,17 @@ class DatabaseManager:
                 job.last_run = datetime.utcnow()
                 await session.commit()
     
+    async def save_job_next_runs(self, next_runs: Dict[int, Optional[datetime]]) -> None:
+        """Сохранение плановых запусков задач (job_id -> время в UTC)"""
+        if not next_runs:
+            return
+        async with self.async_session() as session:
+            await session.execute(
+                update(Job),
+                [{"id": job_id, "next_run": next_run} for job_id, next_run in next_runs.items()],
+            )
+            await session.commit()
+    
     async def deactivate_jobs_for_domain(self, domain_id: int) -> None:
         """Деактивация всех задач для домена"""
         async with self.async_session() as session:
@@ -206,7 +350,290 @@ class DatabaseManager:
             
             await session.commit()
     
+    # Warming task queue methods
+    async def enqueue_warming_task(
+        self,
+        domain_id: int,
+        domain_name: str,
+        urls: List[str],
+        warming_type: str = "manual",
+        job_id: Optional[int] = None,
+        requested_by: Optional[int] = None,
+        delay_seconds: float = 0,
+        deadline_seconds: Optional[float] = None
+    ) -> Optional[WarmingTask]:
+        """
+        Постановка прогрева в очередь для воркеров
+        
+        deadline_seconds - срок прогрева от момента доступности задачи
+        
+        Returns:
+            Задача или None, если у домена уже есть незавершенная задача
+        """
+        async with self.async_session() as session:
+            # Блокируем строку домена: две одновременные постановки не создадут дубль
+            await session.execute(
+                select(Domain.id).where(Domain.id == domain_id).with_for_update()
+            )
+            result = await session.execute(
+                select(WarmingTask.id)
+                .where(WarmingTask.domain_id == domain_id, WarmingTask.status.in_(ACTIVE_TASK_STATUSES))
+                .limit(1)
+            )
+            if result.scalar_one_or_none() is not None:
+                return None
+            
+            now = datetime.utcnow()
+            task = WarmingTask(
+                domain_id=domain_id,
+                job_id=job_id,
+                domain_name=domain_name,
+                urls=list(urls),
+                warming_type=warming_type,
+                requested_by=requested_by,
+                status="pending",
+                created_at=now,
+                available_at=now + timedelta(seconds=delay_seconds),
+                deadline_at=(
+                    now + timedelta(seconds=delay_seconds + deadline_seconds)
+                    if deadline_seconds is not None else None
+                ),
+            )
+            session.add(task)
+            await session.commit()
+            return task
+    
+    async def claim_warming_task(self, worker_id: str, lease_seconds: int, max_attempts: int) -> Optional[WarmingTask]:
+        """
+        Захват следующей задачи воркером (SELECT ... FOR UPDATE SKIP LOCKED)
+        
+        Доступны ожидающие задачи, время которых наступило, и выполняющиеся
+        задачи с истекшей арендой (воркер упал или завис).
+        """
+        now = datetime.utcnow()
+        async with self.async_session() as session:
+            result = await session.execute(
+                select(WarmingTask)
+                .where(
+                    WarmingTask.attempts < max_attempts,
+                    or_(
+                        and_(WarmingTask.status == "pending", WarmingTask.available_at <= now),
+                        and_(WarmingTask.status == "running", WarmingTask.lease_expires_at < now),
+                    )
+                )
+                .order_by(WarmingTask.available_at, WarmingTask.id)
+                .limit(1)
+                .with_for_update(skip_locked=True)
+            )
+            task = result.scalar_one_or_none()
+            
+            if task is None:
+                return None
+            
+            if task.status == "running":
+                logger.warning(f"Reclaiming warming task {task.id} from {task.worker_id} (lease expired)")
+            
+            task.status = "running"
+            task.worker_id = worker_id
+            task.attempts += 1
+            task.started_at = now
+            task.lease_expires_at = now + timedelta(seconds=lease_seconds)
+            await session.commit()
+            return task
+    
+    async def renew_warming_task_lease(self, task_id: int, worker_id: str, lease_seconds: int) -> bool:
+        """
+        Продление аренды задачи (heartbeat воркера)
+        
+        Returns:
+            False, если задача больше не принадлежит воркеру (отменена или перехвачена)
+        """
+        async with self.async_session() as session:
+            result = await session.execute(
+                update(WarmingTask)
+                .where(
+                    WarmingTask.id == task_id,
+                    WarmingTask.worker_id == worker_id,
+                    WarmingTask.status == "running",
+                )
+                .values(lease_expires_at=datetime.utcnow() + timedelta(seconds=lease_seconds))
+            )
+            await session.commit()
+            return result.rowcount > 0
+    
+    async def complete_warming_task(self, task_id: int, worker_id: str, result: Dict[str, Any]) -> bool:
+        """Завершение задачи с результатом (только если аренда не потеряна)"""
+        async with self.async_session() as session:
+            updated = await session.execute(
+                update(WarmingTask)
+                .where(
+                    WarmingTask.id == task_id,
+                    WarmingTask.worker_id == worker_id,
+                    WarmingTask.status == "running",
+                )
+                .values(
+                    status="done",
+                    result=result,
+                    completed_at=datetime.utcnow(),
+                    lease_expires_at=None,
+                )
+            )
+            await session.commit()
+            return updated.rowcount > 0
+    
+    async def fail_warming_task(
+        self,
+        task_id: int,
+        worker_id: str,
+        error: str,
+        max_attempts: int,
+        retry_delay: int
+    ) -> None:
+        """Ошибка выполнения: повтор с задержкой или окончательный отказ после max_attempts"""
+        async with self.async_session() as session:
+            result = await session.execute(
+                select(WarmingTask)
+                .where(
+                    WarmingTask.id == task_id,
+                    WarmingTask.worker_id == worker_id,
+                    WarmingTask.status == "running",
+                )
+                .with_for_update()
+            )
+            task = result.scalar_one_or_none()
+            
+            if task is None:
+                return
+            
+            now = datetime.utcnow()
+            task.error = error
+            task.lease_expires_at = None
+            if task.attempts < max_attempts:
+                task.status = "pending"
+                task.available_at = now + timedelta(seconds=retry_delay * task.attempts)
+            else:
+                task.status = "failed"
+                task.completed_at = now
+            
+            await session.commit()
+    
+    async def release_warming_task(self, task_id: int, worker_id: str) -> None:
+        """Возврат задачи в очередь при штатной остановке воркера (попытка не засчитывается)"""
+        async with self.async_session() as session:
+            await session.execute(
+                update(WarmingTask)
+                .where(
+                    WarmingTask.id == task_id,
+                    WarmingTask.worker_id == worker_id,
+                    WarmingTask.status == "running",
+                )
+                .values(
+                    status="pending",
+                    worker_id=None,
+                    lease_expires_at=None,
+                    available_at=datetime.utcnow(),
+                    attempts=WarmingTask.attempts - 1,
+                )
+            )
+            await session.commit()
+    
+    async def cancel_warming_tasks(self, domain_id: int) -> int:
+        """Отмена незавершенных задач домена (воркер заметит это при следующем heartbeat)"""
+        async with self.async_session() as session:
+            result = await session.execute(
+                update(WarmingTask)
+                .where(WarmingTask.domain_id == domain_id, WarmingTask.status.in_(ACTIVE_TASK_STATUSES))
+                .values(status="cancelled", completed_at=datetime.utcnow(), lease_expires_at=None)
+            )
+            await session.commit()
+            return result.rowcount
+    
+    async def get_active_warming_tasks(self) -> List[WarmingTask]:
+        """Ожидающие и выполняющиеся задачи"""
+        async with self.async_session() as session:
+            result = await session.execute(
+                select(WarmingTask)
+                .where(WarmingTask.status.in_(ACTIVE_TASK_STATUSES))
+                .order_by(WarmingTask.id)
+            )
+            return list(result.scalars().all())
+    
+    async def fail_abandoned_warming_tasks(self, max_attempts: int) -> int:
+        """Отказ по задачам, аренда которых истекла после последней попытки"""
+        async with self.async_session() as session:
+            result = await session.execute(
+                update(WarmingTask)
+                .where(
+                    WarmingTask.status == "running",
+                    WarmingTask.lease_expires_at < datetime.utcnow(),
+                    WarmingTask.attempts >= max_attempts,
+                )
+                .values(
+                    status="failed",
+                    error="Worker lease expired",
+                    completed_at=datetime.utcnow(),
+                    lease_expires_at=None,
+                )
+            )
+            await session.commit()
+            return result.rowcount
+    
+    async def get_unnotified_warming_tasks(self, limit: int = 100) -> List[WarmingTask]:
+        """Завершенные задачи, о которых бот еще не уведомил"""
+        async with self.async_session() as session:
+            result = await session.execute(
+                select(WarmingTask)
+                .where(WarmingTask.status.in_(NOTIFY_TASK_STATUSES), WarmingTask.notified == False)
+                .order_by(WarmingTask.id)
+                .limit(limit)
+            )
+            return list(result.scalars().all())
+    
+    async def mark_warming_tasks_notified(self, task_ids: List[int]) -> None:
+        """Отметка об отправленных уведомлениях"""
+        if not task_ids:
+            return
+        
+        async with self.async_session() as session:
+            await session.execute(
+                update(WarmingTask).where(WarmingTask.id.in_(task_ids)).values(notified=True)
+            )
+            await session.commit()
+    
+    async def delete_finished_warming_tasks(self, older_than: datetime) -> int:
+        """Удаление старых завершенных задач очереди"""
+        async with self.async_session() as session:
+            result = await session.execute(
+                delete(WarmingTask).where(
+                    WarmingTask.status.in_(FINISHED_TASK_STATUSES),
+                    WarmingTask.completed_at < older_than,
+                )
+            )
+            await session.commit()
+            return result.rowcount
+    
     # User methods
+    def _cache_user(self, user: Optional[User]) -> None:
+        """Сохранение пользователя в кэш"""
+        if user is not None:
+            self._user_cache[user.id] = (time.monotonic() + self.user_cache_ttl, user)
+    
+    def invalidate_user(self, user_id: int) -> None:
+        """Удаление пользователя из кэша (после изменения роли, телефона и т.п.)"""
+        self._user_cache.pop(user_id, None)
+    
+    def _get_cached_user(self, user_id: int) -> Optional[User]:
+        """Пользователь из кэша, если запись не устарела"""
+        entry = self._user_cache.get(user_id)
+        if entry is None:
+            return None
+        
+        expires_at, user = entry
+        if expires_at < time.monotonic():
+            del self._user_cache[user_id]
+            return None
+        return user
+    
     async def register_user(
         self,
         user_id: int,
@@ -214,7 +641,22 @@ class DatabaseManager:
         first_name: Optional[str] = None,
         last_name: Optional[str] = None
     ) -> User:
-        """Регистрация или обновление пользователя"""
+        """
+        Регистрация или обновление пользователя
+        
+        Известный пользователь с неизменными данными отдается из кэша без обращения
+        к БД, а его last_activity записывается пакетно через flush_user_activity().
+        """
+        now = datetime.utcnow()
+        cached = self._get_cached_user(user_id)
+        if (
+            cached is not None
+            and cached.is_active
+            and (cached.username, cached.first_name, cached.last_name) == (username, first_name, last_name)
+        ):
+            self._pending_activity[user_id] = now
+            return cached
+        
         async with self.async_session() as session:
             result = await session.execute(
                 select(User).where(User.id == user_id)
@@ -226,7 +668,7 @@ class DatabaseManager:
                 user.username = username
                 user.first_name = first_name
                 user.last_name = last_name
-                user.last_activity = datetime.utcnow()
+                user.last_activity = now
                 user.is_active = True
             else:
                 # Создаем нового пользователя
@@ -240,7 +682,37 @@ class DatabaseManager:
             
             await session.commit()
             await session.refresh(user)
-            return user
+        
+        # Свежая запись уже содержит актуальный last_activity
+        self._pending_activity.pop(user_id, None)
+        self._cache_user(user)
+        return user
+    
+    async def flush_user_activity(self) -> int:
+        """
+        Пакетная запись накопленных last_activity
+        
+        Returns:
+            Количество обновленных пользователей
+        """
+        if not self._pending_activity:
+            return 0
+        
+        pending, self._pending_activity = self._pending_activity, {}
+        try:
+            async with self.async_session() as session:
+                await session.execute(
+                    update(User),
+                    [{"id": user_id, "last_activity": moment} for user_id, moment in pending.items()]
+                )
+                await session.commit()
+        except Exception:
+            # Возвращаем обновления в очередь, не затирая более свежие
+            for user_id, moment in pending.items():
+                self._pending_activity.setdefault(user_id, moment)
+            raise
+        
+        return len(pending)
     
     async def get_all_active_users(self) -> List[User]:
         """Получение всех активных пользователей"""
@@ -281,11 +753,43 @@ class DatabaseManager:
                 warming_type=warming_type
             )
             session.add(history)
+            await session.flush()
+            
+            # Агрегаты обновляются в той же транзакции, что и сырая запись
+            await self._apply_warming_rollups(session, [{
+                "domain_id": domain_id,
+                "started_at": started_at,
+                "total_requests": total_requests,
+                "successful_requests": successful_requests,
+                "failed_requests": failed_requests,
+                "timeout_requests": timeout_requests,
+                "avg_response_time": avg_response_time,
+                "min_response_time": min_response_time,
+                "max_response_time": max_response_time,
+            }])
+            
             await session.commit()
-            await session.refresh(history)
+            # refresh() не нужен: id заполнен при flush, а expire_on_commit=False сохраняет атрибуты
             logger.info(f"Saved warming result for domain_id={domain_id}, avg_time={avg_response_time}s")
             return history
     
+    async def save_warming_results_batch(self, rows: List[Dict[str, Any]]) -> None:
+        """
+        Пакетное сохранение результатов прогрева
+        
+        Все записи вставляются одним multi-row INSERT, агрегаты обновляются
+        в той же транзакции. Используется фоновой очередью HistoryWriter.
+        """
+        if not rows:
+            return
+        
+        async with self.async_session() as session:
+            await session.execute(insert(WarmingHistory), rows)
+            await self._apply_warming_rollups(session, rows)
+            await session.commit()
+        
+        logger.info(f"Saved {len(rows)} warming results in batch")
+    
     async def get_warming_history(
         self,
         domain_id: int,
@@ -320,6 +824,236 @@ class DatabaseManager:
             )
             return list(result.scalars().all())
     
+    async def get_last_warming_history_id(self, domain_id: int) -> Optional[int]:
+        """ID последней записи истории домена (версия данных для кэша графиков)"""
+        async with self.async_session() as session:
+            return await session.scalar(
+                select(WarmingHistory.id)
+                .where(WarmingHistory.domain_id == domain_id)
+                .order_by(WarmingHistory.started_at.desc())
+                .limit(1)
+            )
+    
+    # Warming history rollups
+    async def _apply_warming_rollups(self, session: AsyncSession, rows: List[Dict[str, Any]]) -> None:
+        """
+        Инкрементальное обновление часовых и дневных агрегатов
+        
+        Вызывается внутри транзакции, которая вставляет сырые записи.
+        Строка агрегата создается при необходимости (ON CONFLICT DO NOTHING)
+        и блокируется на время обновления, поэтому параллельные сохранения
+        не теряют инкременты.
+        """
+        for model, truncate in ROLLUP_LEVELS:
+            grouped: Dict[tuple, List[Dict[str, Any]]] = {}
+            for row in rows:
+                key = (row["domain_id"], truncate(row["started_at"]))
+                grouped.setdefault(key, []).append(row)
+            
+            for (domain_id, bucket_start), bucket_rows in grouped.items():
+                await session.execute(
+                    pg_insert(model)
+                    .values(domain_id=domain_id, bucket_start=bucket_start)
+                    .on_conflict_do_nothing(index_elements=["domain_id", "bucket_start"])
+                )
+                result = await session.execute(
+                    select(model)
+                    .where(model.domain_id == domain_id, model.bucket_start == bucket_start)
+                    .with_for_update()
+                    .execution_options(populate_existing=True)
+                )
+                _accumulate_rollup(result.scalar_one(), bucket_rows)
+    
+    async def get_warming_rollups_by_period(
+        self,
+        domain_id: int,
+        start_date: datetime,
+        end_date: datetime,
+        granularity: str = "hour"
+    ) -> List[WarmingRollupMixin]:
+        """
+        Получение агрегатов истории за период
+        
+        Args:
+            domain_id: ID домена
+            start_date: Начало периода
+            end_date: Конец периода
+            granularity: "hour" или "day"
+        """
+        model, truncate = ROLLUP_LEVELS[0] if granularity == "hour" else ROLLUP_LEVELS[1]
+        
+        async with self.async_session() as session:
+            result = await session.execute(
+                select(model)
+                .where(
+                    model.domain_id == domain_id,
+                    model.bucket_start >= truncate(start_date),
+                    model.bucket_start <= end_date
+                )
+                .order_by(model.bucket_start.asc())
+            )
+            return list(result.scalars().all())
+    
+    async def history_compaction_due(self, retention_days: int) -> bool:
+        """
+        Нужна ли компактизация вне расписания (при старте)
+        
+        Да, если агрегаты еще не построены при непустой истории (первый запуск
+        после обновления) или в истории есть записи старше срока хранения больше
+        чем на сутки - плановая компактизация давно не выполнялась.
+        """
+        async with self.async_session() as session:
+            oldest = await session.scalar(select(func.min(WarmingHistory.started_at)))
+            if oldest is None:
+                return False
+            
+            if await session.scalar(select(func.max(WarmingHistoryDaily.bucket_start))) is None:
+                return True
+            
+            return retention_days > 0 and oldest < datetime.utcnow() - timedelta(days=retention_days + 1)
+    
+    async def compact_warming_history(
+        self,
+        retention_days: int,
+        hourly_retention_days: int
+    ) -> Dict[str, int]:
+        """
+        Компактизация истории прогревов
+        
+        1. Пересчитывает агрегаты с начала вчерашних суток (или со старейшей
+           сырой записи при первом запуске) - восстанавливает пропущенные инкременты.
+        2. Удаляет сырые записи старше retention_days и часовые агрегаты
+           старше hourly_retention_days (0 = не удалять). Дневные агрегаты хранятся всегда.
+        
+        Returns:
+            Счетчики: пересчитанные записи, удаленные сырые записи и часовые агрегаты
+        """
+        now = datetime.utcnow()
+        stats = {"rebuilt": 0, "pruned_raw": 0, "pruned_hourly": 0}
+        
+        async with self.async_session() as session:
+            # Блокируем агрегаты на время пересчета: инкрементальные обновления
+            # дождутся коммита и не будут посчитаны дважды
+            await session.execute(text(
+                f"LOCK TABLE {WarmingHistoryHourly.__tablename__}, {WarmingHistoryDaily.__tablename__} "
+                f"IN EXCLUSIVE MODE"
+            ))
+            
+            last_daily = await session.scalar(select(func.max(WarmingHistoryDaily.bucket_start)))
+            if last_daily is None:
+                since = await session.scalar(select(func.min(WarmingHistory.started_at)))
+            else:
+                since = min(last_daily, now - timedelta(days=1))
+            
+            if since is not None:
+                since = _truncate_to_day(since)
+                
+                for model, _ in ROLLUP_LEVELS:
+                    await session.execute(delete(model).where(model.bucket_start >= since))
+                
+                # Пересчитываем по суткам, чтобы не держать в памяти всю историю при первом запуске
+                day_start = since
+                while day_start <= now:
+                    day_end = day_start + timedelta(days=1)
+                    result = await session.execute(
+                        select(*ROLLUP_SOURCE_COLUMNS).where(
+                            WarmingHistory.started_at >= day_start,
+                            WarmingHistory.started_at < day_end
+                        )
+                    )
+                    rows = [dict(row._mapping) for row in result]
+                    
+                    for model, truncate in ROLLUP_LEVELS:
+                        grouped: Dict[tuple, List[Dict[str, Any]]] = {}
+                        for row in rows:
+                            grouped.setdefault((row["domain_id"], truncate(row["started_at"])), []).append(row)
+                        
+                        for (domain_id, bucket_start), bucket_rows in grouped.items():
+                            rollup = model(domain_id=domain_id, bucket_start=bucket_start)
+                            _accumulate_rollup(rollup, bucket_rows)
+                            session.add(rollup)
+                    
+                    await session.flush()
+                    stats["rebuilt"] += len(rows)
+                    day_start = day_end
+            
+            if retention_days > 0:
+                result = await session.execute(
+                    delete(WarmingHistory).where(WarmingHistory.started_at < now - timedelta(days=retention_days))
+                )
+                stats["pruned_raw"] = result.rowcount
+            
+            if hourly_retention_days > 0:
+                result = await session.execute(
+                    delete(WarmingHistoryHourly).where(
+                        WarmingHistoryHourly.bucket_start < now - timedelta(days=hourly_retention_days)
+                    )
+                )
+                stats["pruned_hourly"] = result.rowcount
+            
+            await session.commit()
+        
+        logger.info(
+            f"History compaction: rebuilt from {stats['rebuilt']} rows, "
+            f"pruned {stats['pruned_raw']} raw rows and {stats['pruned_hourly']} hourly rollups"
+        )
+        return stats
+    
+    async def maintain_history_partitions(self, months_ahead: int, retention_days: int) -> Dict[str, int]:
+        """
+        Обслуживание помесячных партиций warming_history
+        
+        Создает партиции на текущий и months_ahead следующих месяцев и удаляет
+        партиции, целиком вышедшие за срок хранения (retention_days, 0 = не удалять)
+        и уже свернутые в дневные агрегаты. Если таблица не партиционирована - ничего не делает.
+        
+        Каждая партиция создается и удаляется в своей транзакции: если в
+        warming_history_default уже есть строки нового месяца, CREATE ... PARTITION OF
+        отклоняется, и этот месяц пропускается (conflicts), не откатывая остальное.
+        """
+        stats = {"created": 0, "dropped": 0, "conflicts": 0}
+        
+        async with self.engine.connect() as conn:
+            if not await conn.scalar(text(partitions.IS_PARTITIONED_SQL)):
+                return stats
+            
+            existing = set((await conn.execute(text(partitions.LIST_PARTITIONS_SQL))).scalars().all())
+            # Сырые данные до последних дневных агрегатов уже свернуты - их можно удалять
+            rolled_until = await conn.scalar(select(func.max(WarmingHistoryDaily.bucket_start)))
+        
+        now = datetime.utcnow()
+        current = partitions.month_start(now)
+        for month in partitions.months_between(current, partitions.add_months(current, months_ahead)):
+            name = partitions.partition_name(month)
+            if name in existing:
+                continue
+            try:
+                async with self.engine.begin() as conn:
+                    await conn.execute(text(partitions.create_partition_sql(month)))
+            except IntegrityError as e:
+                # Строки месяца уже лежат в default-партиции - их нужно перенести вручную
+                stats["conflicts"] += 1
+                logger.warning(
+                    f"⚠️ Cannot create history partition {name}: "
+                    f"{partitions.DEFAULT_PARTITION} already has rows for this month ({e.orig})"
+                )
+                continue
+            stats["created"] += 1
+            logger.info(f"Created history partition {name}")
+        
+        if retention_days > 0 and rolled_until is not None:
+            cutoff = min(now - timedelta(days=retention_days), rolled_until)
+            for name in sorted(existing):
+                month = partitions.parse_partition_month(name)
+                # Удаляем только если весь месяц старше границы хранения
+                if month and partitions.add_months(month, 1) <= cutoff:
+                    async with self.engine.begin() as conn:
+                        await conn.execute(text(f"DROP TABLE IF EXISTS {name}"))
+                    stats["dropped"] += 1
+                    logger.info(f"Dropped expired history partition {name}")
+        
+        return stats
+    
     # Role and client methods
     async def set_user_role(self, user_id: int, role: str) -> User:
         """Установка роли пользователя"""
@@ -335,6 +1069,7 @@ class DatabaseManager:
                 await session.refresh(user)
                 logger.info(f"User {user_id} role changed to {role}")
             
+            self.invalidate_user(user_id)
             return user
     
     async def get_user_by_id(self, user_id: int) -> Optional[User]:
@@ -374,6 +1109,8 @@ class DatabaseManager:
             await session.commit()
             await session.refresh(user)
             logger.info(f"Created client: {telegram_id} ({username or phone})")
+            
+            self.invalidate_user(telegram_id)
             return user
     
     async def get_all_admins(self) -> List[User]:
@@ -443,6 +1180,7 @@ class DatabaseManager:
                 await session.refresh(user)
                 logger.info(f"User {user_id} phone updated to {phone}")
             
+            self.invalidate_user(user_id)
             return user
     
     # === Методы для работы с ожидающими клиентами ===
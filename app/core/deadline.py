@@ -0,0 +1,121 @@
+"""
+Срок прогрева (deadline)
+
+Автопрогрев, который не укладывается в свой интервал, копится: APScheduler
+пропускает запуски, а страницы в конце списка не успевают прогреться никогда.
+Поэтому у автопрогрева есть срок - доля SCHEDULER_DEADLINE_FRACTION от
+интервала домена.
+
+Перед стартом прогрев оценивает, сколько займут все запросы (URL x варианты
+x повторы) при его конкурентности, по среднему времени запроса домена из
+прошлых прогревов. Если не укладывается, прогрев деградирует по шагам:
+    1. сокращаются паузы между запросами (вплоть до нуля - нагрузку на сайт
+       по-прежнему ограничивает конкурентность);
+    2. отбрасываются повторы;
+    3. URL идут по приоритету (главная, основные страницы, остальное), а
+       запросы, не начатые до срока, пропускаются.
+Повторы после сбоев и повторные проходы, которые не успевают до срока, тоже
+не начинаются.
+
+Покрытие (coverage) - доля пар URL x вариант, прогретых до срока.
+"""
+import time
+from typing import Dict, List, Optional, Tuple
+
+from app.core.load_planner import ESTIMATED_REQUEST_SECONDS
+from app.utils.url_grouper import url_grouper
+
+
+def priority_order(urls: List[str], domain_name: str) -> List[str]:
+    """URL по приоритету: главная, основные страницы (группа 2), остальные"""
+    def priority(url: str) -> int:
+        if url_grouper.is_homepage(url, domain_name):
+            return 0
+        return 1 if url_grouper.is_group_2_url(url) else 2
+    return sorted(urls, key=priority)
+
+
+def plan_run(
+    seconds: float,
+    requests: int,
+    repeat_count: int,
+    concurrency: int,
+    request_seconds: float,
+    mean_delay: float,
+) -> Tuple[float, int]:
+    """
+    Темп прогрева под срок
+
+    Args:
+        seconds: Срок прогрева
+        requests: Запросов за один проход (URL x варианты)
+        repeat_count: Проходов по настройкам
+        concurrency: Одновременных запросов
+        request_seconds: Среднее время запроса
+        mean_delay: Средняя пауза после запроса
+
+    Returns:
+        (множитель пауз 0..1, число проходов)
+    """
+    # Сколько секунд слота приходится на один запрос, если уложиться в срок
+    capacity = seconds * concurrency
+    for repeats in range(repeat_count, 0, -1):
+        spare = capacity / max(1, requests * repeats) - request_seconds
+        if spare >= mean_delay:
+            return 1.0, repeats
+        if spare >= 0:
+            return spare / mean_delay, repeats
+    # Не укладывается даже один проход без пауз - успеет то, что выше по приоритету
+    return 0.0, 1
+
+
+class RunDeadline:
+    """Срок одного прогрева и план под него"""
+
+    def __init__(
+        self,
+        seconds: float,
+        concurrency: int,
+        request_seconds: float,
+        delay_scale: float = 1.0,
+        repeat_count: int = 1,
+    ):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+        # Одновременных запросов одного чанка (для оценки, успевает ли повторный проход)
+        self.concurrency = concurrency
+        self.request_seconds = request_seconds
+        self.delay_scale = delay_scale
+        self.repeat_count = repeat_count
+        self.repeats_dropped = 0
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def fits(self, requests: int) -> bool:
+        """Успеют ли requests запросов одного чанка до срока"""
+        return requests * self.request_seconds / self.concurrency <= self.remaining()
+
+
+class RequestTimeEstimator:
+    """Среднее время запроса по доменам (экспоненциальное сглаживание по прогревам)"""
+
+    def __init__(self, alpha: float = 0.3):
+        self.alpha = alpha
+        self._estimates: Dict[str, float] = {}
+
+    def estimate(self, domain_name: str) -> float:
+        return self._estimates.get(domain_name, ESTIMATED_REQUEST_SECONDS)
+
+    def observe(self, domain_name: str, seconds: Optional[float]) -> None:
+        if not seconds:
+            return
+        previous = self._estimates.get(domain_name)
+        self._estimates[domain_name] = seconds if previous is None else previous + self.alpha * (seconds - previous)
+
+
+# Глобальный экземпляр
+request_times = RequestTimeEstimator()
@@ -0,0 +1,217 @@
+"""
+Способы запроса страниц при прогреве
+
+    http    - httpx: запрос страницы без загрузки ресурсов (по умолчанию)
+    browser - headless Chromium (Playwright): полноценная навигация, как у
+              посетителя. Нужна сайтам, где кэш заполняют серверный рендеринг
+              фрагментов или edge-функции, которые срабатывают только на
+              настоящий переход браузера.
+
+Прогрев работает с любым способом через один интерфейс: асинхронный
+контекстный менеджер с методом fetch(url, headers, timeout), который
+возвращает {"status_code", "headers", "bytes"}. Таймаут - FetchTimeout или
+httpx.TimeoutException.
+
+Playwright - необязательная зависимость:
+    pip install playwright && playwright install --with-deps chromium
+"""
+import asyncio
+import logging
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+from typing import Any, Dict, Mapping, Optional
+
+import httpx
+
+from app.config import config
+from app.core.variants import DESKTOP_USER_AGENT
+
+logger = logging.getLogger(__name__)
+
+
+class FetchTimeout(Exception):
+    """Таймаут запроса (для способов, отличных от httpx)"""
+
+
+class _RejectAllCookies(DefaultCookiePolicy):
+    """Политика cookie jar, которая не сохраняет ни одной cookie"""
+
+    def set_ok(self, cookie, request) -> bool:
+        return False
+
+
+class HttpxFetcher:
+    """Запрос страницы через httpx, тело читается без распаковки"""
+
+    name = "http"
+    # Условные запросы (If-None-Match) поддерживаются
+    conditional = True
+
+    def __init__(self):
+        self.client: Optional[httpx.AsyncClient] = None
+
+    async def __aenter__(self) -> "HttpxFetcher":
+        # Один клиент (пул соединений) на все варианты: заголовки варианта - в каждом запросе.
+        # Set-Cookie ответов не запоминаются: иначе cookie, выставленная сайтом при прогреве
+        # одного варианта (валюта, язык), уходила бы в запросы остальных
+        self.client = httpx.AsyncClient(
+            headers={"User-Agent": DESKTOP_USER_AGENT},
+            cookies=CookieJar(policy=_RejectAllCookies()),
+        )
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.client.aclose()
+
+    async def fetch(self, url: str, headers: Mapping[str, str], timeout: float) -> Dict[str, Any]:
+        request = self.client.build_request("GET", url, headers=headers, timeout=timeout)
+        response = await self.client.send(request, stream=True, follow_redirects=True)
+        try:
+            await self._discard_body(response)
+        finally:
+            await response.aclose()
+        return {
+            "status_code": response.status_code,
+            "headers": response.headers,
+            "bytes": response.num_bytes_downloaded,
+        }
+
+    async def _discard_body(self, response: httpx.Response) -> None:
+        """
+        Чтение тела ответа без распаковки
+
+        Странице в кэше достаточно того, что ответ передан целиком; распаковка
+        gzip/br тела, которое никто не читает, - лишний CPU на каждый запрос.
+        """
+        async for _ in response.aiter_raw():
+            pass
+
+
+class BrowserFetcher:
+    """
+    Навигация headless Chromium
+
+    Один браузер на прогрев и пул из WARMER_BROWSER_PAGES вкладок: вкладки
+    переиспользуются между URL, одновременно открыто не больше размера пула.
+    Ресурсы типов из WARMER_BROWSER_BLOCK (по умолчанию изображения, шрифты,
+    медиа) не загружаются - они не влияют на рендеринг на сервере, а стоят
+    трафика и CPU.
+    """
+
+    name = "browser"
+    # Браузер сам решает, что ревалидировать - свои If-None-Match не шлем
+    conditional = False
+
+    def __init__(self, pages: Optional[int] = None, blocked_types: Optional[str] = None):
+        self.pages = pages or config.WARMER_BROWSER_PAGES
+        blocked = blocked_types if blocked_types is not None else config.WARMER_BROWSER_BLOCK
+        self.blocked_types = {value.strip() for value in blocked.split(",") if value.strip()}
+        self._playwright = None
+        self._browser = None
+        self._context = None
+        self._pool: Optional[asyncio.Queue] = None
+
+    async def __aenter__(self) -> "BrowserFetcher":
+        try:
+            from playwright.async_api import async_playwright
+        except ImportError:
+            raise RuntimeError(
+                "Render warming requires Playwright: "
+                "pip install playwright && playwright install --with-deps chromium"
+            )
+
+        self._playwright = await async_playwright().start()
+        try:
+            self._browser = await self._playwright.chromium.launch(headless=True)
+            self._context = await self._browser.new_context(user_agent=DESKTOP_USER_AGENT)
+            if self.blocked_types:
+                await self._context.route("**/*", self._route)
+            self._pool = asyncio.Queue()
+            for _ in range(self.pages):
+                self._pool.put_nowait(await self._context.new_page())
+        except Exception:
+            await self.__aexit__()
+            raise
+
+        logger.info(f"🧭 Browser fetcher started ({self.pages} pages, blocking: {', '.join(sorted(self.blocked_types)) or 'nothing'})")
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        if self._browser is not None:
+            await self._browser.close()
+        if self._playwright is not None:
+            await self._playwright.stop()
+        self._browser = self._context = self._playwright = None
+
+    async def _route(self, route) -> None:
+        if route.request.resource_type in self.blocked_types:
+            await route.abort()
+        else:
+            await route.continue_()
+
+    async def fetch(self, url: str, headers: Mapping[str, str], timeout: float) -> Dict[str, Any]:
+        from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+        page = await self._pool.get()
+        if page is None:
+            # Вкладок не осталось - будим следующий ожидающий запрос
+            self._pool.put_nowait(None)
+            raise RuntimeError("Browser fetcher has no pages left")
+        try:
+            # Заголовки варианта (User-Agent, язык, cookies) - на все запросы вкладки
+            await page.set_extra_http_headers(dict(headers))
+            try:
+                response = await page.goto(url, wait_until="load", timeout=timeout * 1000)
+            except PlaywrightTimeoutError:
+                raise FetchTimeout(f"Navigation timeout after {timeout}s")
+            if response is None:
+                raise RuntimeError("Navigation without response")
+
+            size = 0
+            try:
+                size = len(await response.body())
+            except Exception:
+                # Тело редиректа или уже выгруженной страницы недоступно
+                pass
+            return {
+                "status_code": response.status,
+                "headers": httpx.Headers(await response.all_headers()),
+                "bytes": size,
+            }
+        except Exception:
+            # Вкладка в неизвестном состоянии - заменяем новой
+            page = await self._replace_page(page)
+            raise
+        finally:
+            if page is not None:
+                self._pool.put_nowait(page)
+            elif self.pages == 0:
+                # Ожидающие вкладку запросы не должны ждать вечно
+                self._pool.put_nowait(None)
+
+    async def _replace_page(self, page):
+        """Новая вкладка вместо сломанной (None - открыть не удалось, пул уменьшается)"""
+        try:
+            await page.close()
+        except Exception as e:
+            # Вкладка (или ее процесс) уже умерла - закрывать нечего
+            logger.debug(f"Failed to close broken page: {e}")
+        try:
+            return await self._context.new_page()
+        except Exception as e:
+            self.pages -= 1
+            logger.error(f"❌ Failed to open a browser page, pool shrinks to {self.pages}: {e}")
+            return None
+
+
+FETCHERS = {
+    HttpxFetcher.name: HttpxFetcher,
+    BrowserFetcher.name: BrowserFetcher,
+}
+
+
+def create_fetcher(name: Optional[str] = None):
+    """Способ запроса по имени (None - http)"""
+    fetcher_class = FETCHERS.get(name or HttpxFetcher.name)
+    if fetcher_class is None:
+        raise ValueError(f"Unknown fetcher: {name}")
+    return fetcher_class()
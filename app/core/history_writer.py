@@ -0,0 +1,297 @@
+"""
+Фоновая пакетная запись результатов прогрева (write-behind)
+"""
+import asyncio
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.exc import DataError, IntegrityError
+
+from app.config import config
+from app.core.db import db_manager
+from app.utils.metrics import history_writer_queue_depth
+
+logger = logging.getLogger(__name__)
+
+# Тип записи -> обработчик пакета (должен писать весь пакет одной транзакцией)
+BatchHandler = Callable[[List[Dict[str, Any]]], Awaitable[None]]
+
+# Ошибки, которые повтор не исправит (например, домен удален посреди прогрева - FK)
+PERMANENT_ERRORS = (IntegrityError, DataError)
+
+
+def _encode_value(value: Any) -> Any:
+    """Сериализация значений, которые json не умеет сам"""
+    if isinstance(value, datetime):
+        return {"$dt": value.isoformat()}
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _decode_object(obj: Dict[str, Any]) -> Any:
+    """Обратное преобразование для json.loads"""
+    if set(obj) == {"$dt"}:
+        return datetime.fromisoformat(obj["$dt"])
+    return obj
+
+
+class HistoryWriter:
+    """
+    Очередь записи результатов в БД
+
+    Задачи прогрева только кладут запись в очередь и сразу продолжают работу.
+    Фоновая задача собирает записи в пакеты (по размеру или по таймеру)
+    и пишет их multi-row INSERT'ом. Очередь ограничена - при переполнении
+    submit() ждет (backpressure). Если PostgreSQL недоступен, пакет
+    сохраняется в JSONL-файл на диске и дозаписывается позже.
+
+    Пакет, который БД отвергла (IntegrityError, DataError), делится пополам,
+    пока не найдутся плохие записи: они уходят в файл <spill>.rejected,
+    остальные записываются.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = None,
+        flush_interval: float = None,
+        queue_size: int = None,
+        spill_path: str = None,
+    ):
+        self.batch_size = batch_size or config.HISTORY_WRITER_BATCH_SIZE
+        self.flush_interval = flush_interval or config.HISTORY_WRITER_FLUSH_MS / 1000
+        self.queue_size = queue_size or config.HISTORY_WRITER_QUEUE_SIZE
+        self.spill_path = spill_path or config.HISTORY_SPILL_PATH
+        self.spill_retry_interval = config.HISTORY_SPILL_RETRY_SECONDS
+
+        self.handlers: Dict[str, BatchHandler] = {
+            "warming_history": db_manager.save_warming_results_batch,
+        }
+        self.queue: Optional[asyncio.Queue] = None
+        self.task: Optional[asyncio.Task] = None
+        self._last_spill_attempt = 0.0
+
+    def register_handler(self, kind: str, handler: BatchHandler) -> None:
+        """Регистрация обработчика для нового типа записей (например, результаты по URL)"""
+        self.handlers[kind] = handler
+
+    def start(self) -> None:
+        """Запуск фоновой задачи записи"""
+        if self.task and not self.task.done():
+            return
+
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self.task = asyncio.create_task(self._run())
+        logger.info(
+            f"History writer started (batch: {self.batch_size}, "
+            f"flush: {self.flush_interval * 1000:.0f}ms, queue: {self.queue_size})"
+        )
+
+    async def stop(self) -> None:
+        """Остановка с записью всего, что осталось в очереди"""
+        if not self.task:
+            return
+
+        # None - сигнал завершения; все записи до него будут записаны
+        await self.queue.put(None)
+        await self.task
+        self.task = None
+        logger.info("History writer stopped")
+
+    @property
+    def pending(self) -> int:
+        """Количество записей, ожидающих записи"""
+        return self.queue.qsize() if self.queue else 0
+
+    async def submit(self, kind: str, row: Dict[str, Any]) -> None:
+        """
+        Постановка записи в очередь
+
+        Если writer не запущен (скрипты, тесты), запись выполняется сразу.
+        """
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown history record kind: {kind}")
+
+        if not self.task or self.task.done():
+            await self.handlers[kind]([row])
+            return
+
+        await self.queue.put((kind, row))
+
+    async def submit_warming_result(self, domain_id: int, stats: Dict[str, Any], warming_type: str) -> None:
+        """Постановка в очередь результата прогрева из статистики SiteWarmer.warm_site"""
+        await self.submit("warming_history", {
+            "domain_id": domain_id,
+            "started_at": stats["started_at"],
+            "completed_at": stats["completed_at"],
+            "total_requests": stats["total_requests"],
+            "successful_requests": stats["success"],
+            "failed_requests": stats["error"],
+            "timeout_requests": stats["timeout"],
+            "avg_response_time": stats["avg_time"],
+            "min_response_time": stats["min_time"],
+            "max_response_time": stats["max_time"],
+            "warming_type": warming_type,
+        })
+
+    async def _run(self) -> None:
+        """Цикл сбора пакетов"""
+        loop = asyncio.get_running_loop()
+        stopping = False
+
+        while not stopping:
+            batch: List[Tuple[str, Dict[str, Any]]] = []
+
+            try:
+                item = await asyncio.wait_for(self.queue.get(), timeout=self.spill_retry_interval)
+            except asyncio.TimeoutError:
+                # Простой - хорошее время дозаписать отложенное на диск
+                await self._replay_spill()
+                continue
+
+            if item is None:
+                stopping = True
+            else:
+                batch.append(item)
+
+            # Добираем пакет до batch_size или до истечения flush_interval
+            deadline = loop.time() + self.flush_interval
+            while not stopping and len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                else:
+                    batch.append(item)
+
+            if batch:
+                written = await self._flush(batch)
+                if written:
+                    await self._replay_spill()
+
+    async def _flush(self, batch: List[Tuple[str, Dict[str, Any]]]) -> bool:
+        """Запись пакета; при ошибке БД пакет уходит на диск"""
+        grouped: Dict[str, List[Dict[str, Any]]] = {}
+        for kind, row in batch:
+            grouped.setdefault(kind, []).append(row)
+
+        all_written = True
+        for kind, rows in grouped.items():
+            failed = await self._write(kind, rows)
+            if failed:
+                all_written = False
+                logger.error(f"Error writing {len(failed)} {kind} records, spilling to disk")
+                await asyncio.to_thread(self._append_spill, kind, failed)
+            else:
+                logger.debug(f"💾 Wrote {len(rows)} {kind} records")
+
+        return all_written
+
+    async def _write(self, kind: str, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Запись пакета с отделением плохих записей
+
+        Returns:
+            Записи, которые не удалось записать из-за недоступности БД (для повтора)
+        """
+        try:
+            await self.handlers[kind](rows)
+            return []
+        except PERMANENT_ERRORS as e:
+            if len(rows) == 1:
+                logger.error(f"❌ Rejected {kind} record, moved to {self.rejected_path}: {e}")
+                await asyncio.to_thread(self._append_spill, kind, rows, self.rejected_path)
+                return []
+            # Пакет пишется одной транзакцией - ищем плохие записи делением пополам
+            middle = len(rows) // 2
+            return await self._write(kind, rows[:middle]) + await self._write(kind, rows[middle:])
+        except Exception as e:
+            logger.warning(f"Error writing {len(rows)} {kind} records: {e}")
+            return rows
+
+    @property
+    def rejected_path(self) -> str:
+        """Файл записей, которые БД отвергла (для ручного разбора)"""
+        return f"{self.spill_path}.rejected"
+
+    def _append_spill(self, kind: str, rows: List[Dict[str, Any]], path: Optional[str] = None) -> None:
+        """Дописывание записей в файл отложенной записи"""
+        path = path or self.spill_path
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(path, "a", encoding="utf-8") as f:
+                for row in rows:
+                    f.write(json.dumps({"kind": kind, "row": row}, default=_encode_value) + "\n")
+        except OSError as e:
+            logger.error(f"❌ Failed to spill {len(rows)} {kind} records to {path}: {e}")
+
+    def _read_spill(self) -> List[Tuple[str, Dict[str, Any]]]:
+        """Чтение файла отложенной записи"""
+        items = []
+        with open(self.spill_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line, object_hook=_decode_object)
+                    items.append((record["kind"], record["row"]))
+        return items
+
+    async def _replay_spill(self) -> None:
+        """Дозапись отложенных на диск записей (не чаще spill_retry_interval)"""
+        loop = asyncio.get_running_loop()
+        if not os.path.exists(self.spill_path):
+            return
+        if loop.time() - self._last_spill_attempt < self.spill_retry_interval:
+            return
+        self._last_spill_attempt = loop.time()
+
+        try:
+            items = await asyncio.to_thread(self._read_spill)
+        except (OSError, ValueError) as e:
+            logger.error(f"❌ Failed to read spill file {self.spill_path}: {e}")
+            return
+
+        # Пишем пакетами; то, что не удалось записать, остается в файле.
+        # Неудачный пакет не останавливает остальные: плохие записи отсеивает _write
+        remaining: List[Tuple[str, Dict[str, Any]]] = []
+        for i in range(0, len(items), self.batch_size):
+            chunk = items[i:i + self.batch_size]
+
+            grouped: Dict[str, List[Dict[str, Any]]] = {}
+            for kind, row in chunk:
+                grouped.setdefault(kind, []).append(row)
+
+            for kind, rows in grouped.items():
+                if kind not in self.handlers:
+                    logger.error(f"Dropping {len(rows)} spilled records of unknown kind: {kind}")
+                    continue
+                failed = await self._write(kind, rows)
+                if failed:
+                    logger.warning(f"Spill replay of {len(failed)} {kind} records failed, will retry later")
+                    remaining.extend((kind, row) for row in failed)
+
+        def rewrite() -> None:
+            try:
+                os.remove(self.spill_path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                # Файл остается как есть: записанное из него будет записано повторно,
+                # но дописывать в него остаток - значит задвоить то, что не записалось
+                logger.error(f"❌ Failed to remove replayed spill file {self.spill_path}: {e}")
+                return
+            for kind in {kind for kind, _ in remaining}:
+                self._append_spill(kind, [row for k, row in remaining if k == kind])
+
+        await asyncio.to_thread(rewrite)
+        logger.info(f"💾 Replayed {len(items) - len(remaining)}/{len(items)} spilled history records")
+
+
+# Глобальный экземпляр
+history_writer = HistoryWriter()
+history_writer_queue_depth.set_function(lambda: history_writer.pending)
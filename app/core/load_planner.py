@@ -0,0 +1,144 @@
+"""
+Планировщик нагрузки: фазы запуска автопрогрева
+
+Каждый домен прогревается раз в свой интервал и во время прогрева держит
+примерно постоянное число одновременных запросов. Если прогревы разных
+доменов совпадают по времени, суммарная нагрузка (на сервер прогревщика и
+на SaaS-платформы) получает пики. Планировщик подбирает смещение (фазу)
+каждого домена внутри его интервала так, чтобы пик суммарной нагрузки был
+минимальным: домены раскладываются по одному, от самых тяжелых, в место с
+наименьшим пиком (жадная упаковка, как в bin packing).
+
+Время дискретизируется слотами slot_seconds на горизонте - НОК интервалов
+(не больше max_horizon_seconds), на котором расписание периодично.
+"""
+import math
+from functools import reduce
+from typing import Any, Dict, List, Optional
+
+from app.config import config
+
+# Оценка времени одного запроса, пока у домена нет замеров длительности прогрева
+ESTIMATED_REQUEST_SECONDS = 1.0
+
+# Сколько вариантов смещения перебирать для одного домена
+MAX_CANDIDATE_OFFSETS = 240
+
+
+def estimate_load(url_count: int) -> int:
+    """Одновременных запросов во время прогрева домена (как в SiteWarmer._warm_partial)"""
+    chunks = max(1, math.ceil(url_count / config.WARMER_CHUNK_SIZE))
+    concurrency = config.WARMER_CONCURRENCY if chunks == 1 else chunks * max(3, config.WARMER_CONCURRENCY // chunks)
+    return max(1, min(url_count, concurrency))
+
+
+def estimate_duration(url_count: int) -> float:
+    """Длительность прогрева домена без замеров (секунды)"""
+    per_request = ESTIMATED_REQUEST_SECONDS + (config.WARMER_MIN_DELAY + config.WARMER_MAX_DELAY) / 2
+    return url_count * config.WARMER_REPEAT_COUNT * per_request / estimate_load(url_count)
+
+
+def _lcm(a: int, b: int) -> int:
+    return a * b // math.gcd(a, b)
+
+
+def _occupancy(np, horizon: int, interval: int, duration: int, load: float):
+    """Нагрузка домена на горизонте при нулевом смещении"""
+    profile = np.zeros(horizon)
+    for start in range(0, horizon, interval):
+        end = start + duration
+        profile[start:min(end, horizon)] += load
+        if end > horizon:
+            profile[:end - horizon] += load
+    return profile
+
+
+def plan_offsets(
+    items: List[Dict[str, Any]],
+    slot_seconds: int = 30,
+    max_horizon_seconds: int = 86400,
+) -> Dict[str, Any]:
+    """
+    Расчет смещений запуска доменов
+
+    Args:
+        items: Домены: {"domain_id", "interval", "duration", "load", "offset"}
+            (секунды; offset - текущее смещение, если известно)
+        slot_seconds: Шаг дискретизации
+        max_horizon_seconds: Ограничение горизонта планирования
+
+    Returns:
+        {"offsets": {domain_id: секунды}, "current": [...], "planned": [...],
+         "slot_seconds", "horizon_seconds", "current_peak", "planned_peak", "average"}
+    """
+    import numpy as np
+
+    if not items:
+        return {
+            "offsets": {}, "current": [], "planned": [], "slot_seconds": slot_seconds,
+            "horizon_seconds": 0, "current_peak": 0, "planned_peak": 0, "average": 0,
+        }
+
+    intervals = {item["domain_id"]: max(1, round(item["interval"] / slot_seconds)) for item in items}
+    max_horizon = max(max_horizon_seconds // slot_seconds, max(intervals.values()))
+    horizon = reduce(_lcm, intervals.values(), 1)
+    if horizon > max_horizon:
+        # Расписание не периодично на разумном горизонте - берем кратное самому длинному интервалу
+        longest = max(intervals.values())
+        horizon = max_horizon // longest * longest
+
+    bases = {}
+    current = np.zeros(horizon)
+    for item in items:
+        interval = intervals[item["domain_id"]]
+        # Запуски одного домена не пересекаются (max_instances=1)
+        duration = min(interval, max(1, math.ceil(item["duration"] / slot_seconds)))
+        base = _occupancy(np, horizon, interval, duration, item["load"])
+        bases[item["domain_id"]] = base
+        if item.get("offset") is not None:
+            current += np.roll(base, round(item["offset"] / slot_seconds) % interval)
+
+    # Сначала самые тяжелые домены (средняя нагрузка), мелкие заполняют просветы
+    order = sorted(items, key=lambda item: bases[item["domain_id"]].sum(), reverse=True)
+
+    planned = np.zeros(horizon)
+    offsets: Dict[int, int] = {}
+    for item in order:
+        interval = intervals[item["domain_id"]]
+        base = bases[item["domain_id"]]
+        step = max(1, interval // MAX_CANDIDATE_OFFSETS)
+        candidates = list(range(0, interval, step))
+
+        totals = planned + np.stack([np.roll(base, offset) for offset in candidates])
+        peaks = totals.max(axis=1)
+        # При равном пике - более ровная нагрузка (меньше сумма квадратов)
+        best = int(np.lexsort(((totals ** 2).sum(axis=1), peaks))[0])
+
+        planned += np.roll(base, candidates[best])
+        offsets[item["domain_id"]] = candidates[best] * slot_seconds
+
+    return {
+        "offsets": offsets,
+        "current": current.tolist(),
+        "planned": planned.tolist(),
+        "slot_seconds": slot_seconds,
+        "horizon_seconds": horizon * slot_seconds,
+        "current_peak": float(current.max()) if any(item.get("offset") is not None for item in items) else None,
+        "planned_peak": float(planned.max()),
+        "average": float(planned.mean()),
+    }
+
+
+def render_curve(values: List[float], slot_seconds: int, rows: int = 24, width: int = 20, peak: Optional[float] = None) -> str:
+    """Кривая нагрузки текстом: строка - пик нагрузки за отрезок горизонта"""
+    if not values:
+        return ""
+    peak = peak or max(values) or 1
+    per_row = max(1, math.ceil(len(values) / rows))
+    lines = []
+    for start in range(0, len(values), per_row):
+        value = max(values[start:start + per_row])
+        minutes = start * slot_seconds // 60
+        bar = "█" * round(value / peak * width)
+        lines.append(f"{minutes // 60:02d}:{minutes % 60:02d} {bar:<{width}} {value:.0f}")
+    return "\n".join(lines)
@@ -0,0 +1,77 @@
+"""
+Помесячное партиционирование таблицы warming_history
+
+Партиционирование опционально (HISTORY_PARTITIONING): таблица переводится
+в RANGE-партиционированную по started_at миграцией Alembic, а дальше
+партиции создаются заранее и удаляются целиком по сроку хранения -
+DROP TABLE партиции вместо DELETE миллионов строк.
+"""
+from datetime import datetime
+from typing import List, Optional
+
+HISTORY_TABLE = "warming_history"
+DEFAULT_PARTITION = f"{HISTORY_TABLE}_default"
+
+
+def month_start(moment: datetime) -> datetime:
+    """Начало месяца"""
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    """Сдвиг начала месяца на указанное количество месяцев"""
+    index = month.year * 12 + (month.month - 1) + months
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(month: datetime) -> str:
+    """Имя партиции месяца: warming_history_p202610"""
+    return f"{HISTORY_TABLE}_p{month.strftime('%Y%m')}"
+
+
+def parse_partition_month(name: str) -> Optional[datetime]:
+    """Месяц партиции по имени (None для default и чужих таблиц)"""
+    prefix = f"{HISTORY_TABLE}_p"
+    if not name.startswith(prefix):
+        return None
+
+    try:
+        return datetime.strptime(name[len(prefix):], "%Y%m")
+    except ValueError:
+        return None
+
+
+def create_partition_sql(month: datetime, table: str = HISTORY_TABLE) -> str:
+    """DDL создания партиции на месяц"""
+    upper = add_months(month, 1)
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(month)} PARTITION OF {table} "
+        f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{upper:%Y-%m-%d}')"
+    )
+
+
+def months_between(first: datetime, last: datetime) -> List[datetime]:
+    """Список начал месяцев от first до last включительно"""
+    months = []
+    current = month_start(first)
+    while current <= last:
+        months.append(current)
+        current = add_months(current, 1)
+    return months
+
+
+# Проверка, что таблица истории партиционирована
+IS_PARTITIONED_SQL = (
+    "SELECT EXISTS ("
+    "SELECT 1 FROM pg_partitioned_table pt "
+    "JOIN pg_class c ON c.oid = pt.partrelid "
+    f"WHERE c.relname = '{HISTORY_TABLE}')"
+)
+
+# Список партиций таблицы истории
+LIST_PARTITIONS_SQL = (
+    "SELECT child.relname FROM pg_inherits i "
+    "JOIN pg_class child ON child.oid = i.inhrelid "
+    "JOIN pg_class parent ON parent.oid = i.inhparent "
+    f"WHERE parent.relname = '{HISTORY_TABLE}'"
+)
@@ -0,0 +1,97 @@
+"""
+Повторы запросов прогрева
+
+Запрос прогрева - идемпотентный GET, поэтому временные сбои можно
+повторить: ошибки соединения (в том числе сброс соединения), ответы
+502/503/504 и 429 с Retry-After. Таймауты чтения не повторяются - медленный
+сайт повторы только добьют (за них отвечает circuit breaker).
+
+Задержка - экспоненциальная с полным джиттером: случайная от 0 до
+min(WARMER_RETRY_MAX_DELAY, WARMER_RETRY_BASE_DELAY * 2^попытка), чтобы
+повторы разных URL не шли волной. Retry-After сервера соблюдается как есть
+(если не длиннее WARMER_RETRY_MAX_DELAY - иначе без повтора).
+
+Бюджет повторов на прогрев - WARMER_RETRY_BUDGET_PERCENT от числа запросов:
+если сайт сыпется массово, повторы не удваивают нагрузку (retry storm).
+"""
+import math
+import random
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Mapping, Optional
+
+import httpx
+
+from app.config import config
+
+RETRYABLE_STATUS_CODES = {502, 503, 504}
+
+# Сбои соединения: запрос до сайта не дошел или ответ оборвался
+RETRYABLE_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.ReadError, httpx.RemoteProtocolError)
+
+
+def backoff_delay(attempt: int, base: Optional[float] = None, cap: Optional[float] = None) -> float:
+    """Задержка перед повтором (attempt с 0) - полный джиттер"""
+    base = base if base is not None else config.WARMER_RETRY_BASE_DELAY
+    cap = cap if cap is not None else config.WARMER_RETRY_MAX_DELAY
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def retry_after_seconds(headers: Mapping[str, str]) -> Optional[float]:
+    """Retry-After в секундах (число или HTTP-дата), None - заголовка нет или он некорректен"""
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+def retry_delay(result: Dict[str, Any], attempt: int) -> Optional[float]:
+    """
+    Задержка перед повтором по результату запроса
+
+    Returns:
+        Секунды до повтора или None, если повторять не нужно
+    """
+    if attempt >= config.WARMER_RETRY_ATTEMPTS:
+        return None
+
+    if result["status"] == "success":
+        status_code = result.get("status_code")
+        if status_code in RETRYABLE_STATUS_CODES:
+            return backoff_delay(attempt)
+        if status_code == 429 and result.get("retry_after") is not None:
+            if result["retry_after"] > config.WARMER_RETRY_MAX_DELAY:
+                return None
+            return result["retry_after"]
+        return None
+
+    if result.get("retryable"):
+        return backoff_delay(attempt)
+    return None
+
+
+class RetryBudget:
+    """Бюджет повторов одного прогрева"""
+
+    def __init__(self, planned_requests: int, percent: Optional[float] = None):
+        percent = percent if percent is not None else config.WARMER_RETRY_BUDGET_PERCENT
+        self.limit = math.ceil(planned_requests * percent / 100) if percent > 0 else 0
+        self.used = 0
+        self.denied = 0
+
+    def try_acquire(self) -> bool:
+        """Взять повтор из бюджета"""
+        if self.used >= self.limit:
+            self.denied += 1
+            return False
+        self.used += 1
+        return True
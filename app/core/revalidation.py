@@ -0,0 +1,81 @@
+"""
+Условные запросы прогрева (ETag / Last-Modified)
+
+При WARMER_REVALIDATE=true валидаторы ответа запоминаются по URL, и следующий
+запрос того же URL уходит с If-None-Match / If-Modified-Since. Кэш, который
+поддерживает ревалидацию, отвечает 304 без тела: запись в кэше обновляется,
+а сайт не рендерит страницу и не передает ее заново. Размер пропущенного
+тела (по последнему полному ответу) учитывается как сэкономленные байты.
+
+Хранилище в памяти процесса, ограничено WARMER_VALIDATORS_MAX_URLS (LRU).
+При WARMER_PROCESSES > 1 процесс прогрева получает валидаторы своих URL из
+основного процесса и возвращает обновленные (export / load). Воркеры очереди
+(app.worker) - отдельные процессы: домен, попавший на другой воркер, первый
+раз запрашивается без валидаторов (полным GET).
+"""
+from collections import OrderedDict
+from typing import Dict, Iterable, Mapping, Optional, Tuple
+
+from app.config import config
+
+
+class ValidatorStore:
+    """Валидаторы и размер последнего полного ответа по URL"""
+
+    def __init__(self, max_urls: Optional[int] = None):
+        self.max_urls = max_urls or config.WARMER_VALIDATORS_MAX_URLS
+        # url -> (ETag, Last-Modified, размер тела)
+        self._entries: "OrderedDict[str, Tuple[Optional[str], Optional[str], int]]" = OrderedDict()
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        """Заголовки условного запроса (пусто, если валидаторов нет)"""
+        entry = self._entries.get(url)
+        if entry is None:
+            return {}
+        self._entries.move_to_end(url)
+        etag, last_modified, _ = entry
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        return headers
+
+    def body_size(self, url: str) -> int:
+        """Размер последнего полного ответа (0, если неизвестен)"""
+        entry = self._entries.get(url)
+        return entry[2] if entry else 0
+
+    def export(self, urls: Iterable[str]) -> Dict[str, Optional[Tuple[Optional[str], Optional[str], int]]]:
+        """Записи по списку URL для другого процесса (None - валидаторов нет)"""
+        return {url: self._entries.get(url) for url in urls}
+
+    def load(self, entries: Dict[str, Optional[Tuple[Optional[str], Optional[str], int]]]) -> None:
+        """Записи из другого процесса (export) вместо своих"""
+        for url, entry in entries.items():
+            if entry is None:
+                self._entries.pop(url, None)
+                continue
+            self._entries[url] = entry
+            self._entries.move_to_end(url)
+        while len(self._entries) > self.max_urls:
+            self._entries.popitem(last=False)
+
+    def update(self, url: str, status_code: int, headers: Mapping[str, str], size: int) -> None:
+        """Запоминание валидаторов из ответа 200 (ответ 304 их не меняет)"""
+        if status_code != 200:
+            return
+        etag = headers.get("etag")
+        last_modified = headers.get("last-modified")
+        if not etag and not last_modified:
+            self._entries.pop(url, None)
+            return
+
+        self._entries[url] = (etag, last_modified, size)
+        self._entries.move_to_end(url)
+        while len(self._entries) > self.max_urls:
+            self._entries.popitem(last=False)
+
+
+# Глобальный экземпляр
+validator_store = ValidatorStore()
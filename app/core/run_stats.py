@@ -0,0 +1,103 @@
+"""
+Статистика запусков автопрогрева по доменам
+
+APScheduler по умолчанию (max_instances=1) молча пропускает запуск, если
+предыдущий прогрев домена еще идет. Здесь копится то, что планировщик не
+показывает: задержка старта, длительность, пропуски и реальная частота
+прогрева. Duty cycle - доля интервала, которую занимает прогрев: при
+значениях около 1 и выше домен не успевает прогреваться в своем интервале.
+"""
+import math
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, Optional
+
+# Сколько последних запусков учитывать в средних
+RUN_WINDOW = 20
+
+
+class DomainRunStats:
+    """Запуски автопрогрева одного домена"""
+
+    def __init__(self, interval_seconds: float):
+        # Интервал из расписания и текущий (может быть растянут планировщиком)
+        self.base_interval = interval_seconds
+        self.interval = interval_seconds
+
+        self.runs = 0
+        self.overlaps = 0  # Прогрев дольше интервала
+        self.skipped = 0  # Запуск пропущен: предыдущий еще идет
+        self.missed = 0  # Запуск опоздал больше misfire_grace_time
+
+        self.durations: Deque[float] = deque(maxlen=RUN_WINDOW)
+        self.lags: Deque[float] = deque(maxlen=RUN_WINDOW)
+        self.starts: Deque[datetime] = deque(maxlen=RUN_WINDOW)
+
+    def record_start(self, started_at: datetime, lag: float) -> None:
+        """Старт запуска (lag - фактическое время старта минус плановое)"""
+        self.starts.append(started_at)
+        self.lags.append(lag)
+
+    def record_run(self, duration: float) -> None:
+        """Завершенный прогрев"""
+        self.runs += 1
+        self.durations.append(duration)
+        if duration > self.interval:
+            self.overlaps += 1
+
+    def record_skipped(self) -> None:
+        self.skipped += 1
+
+    def record_missed(self) -> None:
+        self.missed += 1
+
+    @property
+    def avg_duration(self) -> Optional[float]:
+        return sum(self.durations) / len(self.durations) if self.durations else None
+
+    @property
+    def avg_lag(self) -> Optional[float]:
+        return sum(self.lags) / len(self.lags) if self.lags else None
+
+    @property
+    def duty_cycle(self) -> Optional[float]:
+        """Средняя длительность прогрева / интервал расписания"""
+        if self.avg_duration is None or not self.base_interval:
+            return None
+        return self.avg_duration / self.base_interval
+
+    @property
+    def effective_interval(self) -> Optional[float]:
+        """Реальный средний интервал между стартами (с учетом пропусков)"""
+        if len(self.starts) < 2:
+            return None
+        return (self.starts[-1] - self.starts[0]).total_seconds() / (len(self.starts) - 1)
+
+    def suggested_interval(self, target_duty_cycle: float, min_runs: int = 3) -> Optional[float]:
+        """
+        Интервал, при котором прогрев занимает не больше target_duty_cycle
+
+        Не меньше интервала из расписания, округляется до минут.
+        None, пока запусков меньше min_runs.
+        """
+        if len(self.durations) < min_runs or not target_duty_cycle:
+            return None
+        needed = self.avg_duration / target_duty_cycle
+        return max(self.base_interval, math.ceil(needed / 60) * 60)
+
+    def to_dict(self) -> Dict[str, Any]:
+        def rounded(value: Optional[float]) -> Optional[float]:
+            return round(value, 2) if value is not None else None
+
+        return {
+            "interval": self.interval,
+            "base_interval": self.base_interval,
+            "runs": self.runs,
+            "overlaps": self.overlaps,
+            "skipped": self.skipped,
+            "missed": self.missed,
+            "avg_duration": rounded(self.avg_duration),
+            "avg_lag": rounded(self.avg_lag),
+            "duty_cycle": rounded(self.duty_cycle),
+            "effective_interval": rounded(self.effective_interval),
+        }
@@ -5,24 +5,54 @@ import asyncio
 import logging
 import os
 import random
-from typing import Dict, Optional, TYPE_CHECKING
-from datetime import datetime
+from typing import Dict, Optional, Tuple, TYPE_CHECKING
+from datetime import datetime, timedelta, timezone
 
+from apscheduler.events import (
+    EVENT_JOB_ERROR, EVENT_JOB_EXECUTED, EVENT_JOB_MAX_INSTANCES, EVENT_JOB_MISSED,
+    EVENT_JOB_SUBMITTED, JobEvent, JobExecutionEvent, JobSubmissionEvent,
+)
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 
 from app.config import config
 from app.core.db import db_manager
+from app.core.history_writer import history_writer
 from app.core.warmer import warmer
+from app.core.warming_manager import warming_manager
 from app.core.reports import report_generator
+from app.core.run_stats import DomainRunStats
+from app.core import load_planner
 from app.utils.url_grouper import url_grouper
 from app.utils.sitemap import sitemap_parser
+from app.utils.metrics import (
+    scheduler_lag, scheduler_run_duration, scheduler_skipped_runs,
+    scheduler_duty_cycle, scheduler_interval,
+)
 
 if TYPE_CHECKING:
     from aiogram import Bot
 
 logger = logging.getLogger(__name__)
 
+# Префикс id задач автопрогрева в APScheduler
+DOMAIN_JOB_PREFIX = "warm_domain_"
+
+
+def _job_domain_id(job_id: str) -> Optional[int]:
+    """ID домена по id задачи APScheduler (None для служебных задач)"""
+    if job_id.startswith(DOMAIN_JOB_PREFIX):
+        try:
+            return int(job_id[len(DOMAIN_JOB_PREFIX):])
+        except ValueError:
+            return None
+    return None
+
+
+def _to_utc_naive(moment: datetime) -> datetime:
+    """Время APScheduler (с часовым поясом) -> naive UTC, как в БД"""
+    return moment.astimezone(timezone.utc).replace(tzinfo=None)
+
 
 class WarmingScheduler:
     """Планировщик задач прогрева"""
@@ -31,6 +61,9 @@ class WarmingScheduler:
         self.scheduler = AsyncIOScheduler()
         self.job_map: Dict[int, str] = {}  # domain_id -> apscheduler_job_id
         self.bot: Optional['Bot'] = None
+        self.run_stats: Dict[int, DomainRunStats] = {}  # domain_id -> статистика запусков
+        self._started: Dict[Tuple[str, datetime], datetime] = {}  # (job_id, плановое время) -> фактический старт
+        self._domain_delays: Dict[int, float] = {}  # domain_id -> случайная задержка текущего запуска
     
     def set_bot(self, bot: 'Bot') -> None:
         """Установка экземпляра бота для отправки уведомлений"""
@@ -39,6 +72,9 @@ class WarmingScheduler:
     
     def start(self) -> None:
         """Запуск планировщика"""
+        self.scheduler.add_listener(self._on_job_submitted, EVENT_JOB_SUBMITTED)
+        self.scheduler.add_listener(self._on_job_finished, EVENT_JOB_EXECUTED | EVENT_JOB_ERROR)
+        self.scheduler.add_listener(self._on_job_skipped, EVENT_JOB_MAX_INSTANCES | EVENT_JOB_MISSED)
         self.scheduler.start()
         
         # Добавляем задачу для ежедневных отчетов (в 6:00 UTC = 9:00 UTC+3 Минск)
@@ -79,9 +115,174 @@ class WarmingScheduler:
             replace_existing=True
         )
         
-        logger.info("Scheduler started with daily reports at 06:00 UTC, URL updates at 03:00 UTC, hourly backups, and 2-hour admin reports")
+        # Добавляем задачу для компактизации истории прогревов (в 03:30 UTC - после обновления URL)
+        self.scheduler.add_job(
+            self.compact_history_task,
+            trigger='cron',
+            hour=3,
+            minute=30,
+            id='compact_history',
+            replace_existing=True
+        )
+        # При старте - только если компактизация отстала: она блокирует агрегаты,
+        # и запуск на каждом деплое останавливал бы запись истории
+        self.scheduler.add_job(
+            self.catch_up_history_task,
+            id='compact_history_catch_up',
+            replace_existing=True
+        )
+        
+        # Перераспределение фаз автопрогрева по замерам длительности (в 03:45 UTC)
+        if config.SCHEDULER_LOAD_SHAPING:
+            self.scheduler.add_job(
+                self.rebalance_schedule_task,
+                trigger='cron',
+                hour=3,
+                minute=45,
+                id='rebalance_schedule',
+                replace_existing=True
+            )
+        
+        # Прогрев статики доменов в автопрогреве (реже, чем страницы)
+        if config.WARMER_ASSETS_ENABLED:
+            self.scheduler.add_job(
+                self.warm_assets_task,
+                trigger='interval',
+                minutes=config.WARMER_ASSET_INTERVAL_MINUTES,
+                id='warm_assets',
+                replace_existing=True,
+                max_instances=1,
+                next_run_time=datetime.now() + timedelta(minutes=5)
+            )
+        
+        # Пакетная запись last_activity пользователей (см. DatabaseManager.register_user)
+        self.scheduler.add_job(
+            self.flush_user_activity_task,
+            trigger='interval',
+            seconds=config.USER_ACTIVITY_FLUSH_SECONDS,
+            id='flush_user_activity',
+            replace_existing=True
+        )
+        
+        # Результаты прогревов из очереди БД (выполняются воркерами app.worker)
+        if config.WARMING_QUEUE_ENABLED:
+            self.scheduler.add_job(
+                self.process_warming_queue_task,
+                trigger='interval',
+                seconds=config.WARMING_QUEUE_SYNC_SECONDS,
+                id='process_warming_queue',
+                replace_existing=True,
+                max_instances=1
+            )
+        
+        logger.info("Scheduler started with daily reports at 06:00 UTC, URL updates at 03:00 UTC, history compaction at 03:30 UTC, hourly backups, and 2-hour admin reports")
 
     
+    def _on_job_submitted(self, event: JobSubmissionEvent) -> None:
+        """Задержка запуска: фактическое время старта минус плановое"""
+        now = datetime.now(self.scheduler.timezone)
+        domain_id = _job_domain_id(event.job_id)
+        for run_time in event.scheduled_run_times:
+            lag = max(0.0, (now - run_time).total_seconds())
+            scheduler_lag.observe(lag, job=event.job_id)
+            self._started[(event.job_id, run_time)] = now
+            if domain_id in self.run_stats:
+                self.run_stats[domain_id].record_start(now, lag)
+    
+    def _on_job_finished(self, event: JobExecutionEvent) -> None:
+        """Длительность запуска"""
+        started = self._started.pop((event.job_id, event.scheduled_run_time), None)
+        if started is None:
+            return
+        duration = (datetime.now(self.scheduler.timezone) - started).total_seconds()
+        scheduler_run_duration.observe(duration, job=event.job_id)
+        
+        # В режиме очереди задача только ставит прогрев в очередь - длительность
+        # прогрева приходит из воркера (process_warming_queue_task)
+        domain_id = _job_domain_id(event.job_id)
+        if domain_id is not None and not config.WARMING_QUEUE_ENABLED:
+            # Случайная задержка перед прогревом - не работа домена, в загрузку не входит
+            delay = self._domain_delays.pop(domain_id, 0.0)
+            self._record_domain_run(domain_id, max(0.0, duration - delay))
+    
+    def _on_job_skipped(self, event: JobEvent) -> None:
+        """Запуск не состоялся: предыдущий еще идет (max_instances) или опоздал (misfire)"""
+        overlap = event.code == EVENT_JOB_MAX_INSTANCES
+        scheduler_skipped_runs.inc(job=event.job_id, reason="overlap" if overlap else "misfire")
+        
+        domain_id = _job_domain_id(event.job_id)
+        stats = self.run_stats.get(domain_id)
+        if stats is None:
+            if not overlap:
+                logger.warning(f"⚠️ Job {event.job_id} missed its run time")
+            return
+        
+        if overlap:
+            stats.record_skipped()
+            logger.warning(
+                f"⏭ Skipped run of {event.job_id}: previous warming still in progress "
+                f"(avg duration {stats.avg_duration or 0:.0f}s, interval {stats.interval:.0f}s, "
+                f"skipped {stats.skipped} so far)"
+            )
+        else:
+            stats.record_missed()
+            logger.warning(f"⚠️ Job {event.job_id} missed its run time")
+    
+    def _record_domain_run(self, domain_id: int, duration: float) -> None:
+        """Учет завершенного прогрева домена и подстройка интервала"""
+        stats = self.run_stats.get(domain_id)
+        if stats is None:
+            return
+        
+        stats.record_run(duration)
+        if stats.duty_cycle is not None:
+            scheduler_duty_cycle.set(stats.duty_cycle, domain=domain_id)
+        
+        if duration > stats.interval:
+            logger.warning(
+                f"⚠️ Warming of domain {domain_id} took {duration:.0f}s, "
+                f"longer than its interval ({stats.interval:.0f}s)"
+            )
+        
+        if config.SCHEDULER_AUTO_STRETCH:
+            self._stretch_interval(domain_id, stats)
+    
+    def _stretch_interval(self, domain_id: int, stats: DomainRunStats) -> None:
+        """
+        Растягивание интервала домена, который не успевает прогреваться
+        
+        Интервал подбирается так, чтобы прогрев занимал не больше
+        SCHEDULER_TARGET_DUTY_CYCLE от него. Когда прогрев снова укладывается
+        в интервал из расписания, он возвращается к исходному.
+        """
+        suggested = stats.suggested_interval(config.SCHEDULER_TARGET_DUTY_CYCLE)
+        job_id = self.job_map.get(domain_id)
+        if suggested is None or job_id is None:
+            return
+        # Мелкие колебания длительности не должны постоянно двигать расписание
+        if abs(suggested - stats.interval) < 0.1 * stats.interval:
+            return
+        
+        try:
+            self.scheduler.reschedule_job(job_id, trigger=IntervalTrigger(seconds=suggested))
+        except Exception as e:
+            logger.error(f"Error rescheduling job for domain {domain_id}: {e}")
+            return
+        
+        logger.warning(
+            f"📐 Interval for domain {domain_id} changed {stats.interval:.0f}s → {suggested:.0f}s "
+            f"(avg warming {stats.avg_duration:.0f}s, configured {stats.base_interval:.0f}s)"
+        )
+        stats.interval = suggested
+        scheduler_interval.set(suggested, domain=domain_id)
+    
+    def _deadline_seconds(self, domain_id: int) -> Optional[float]:
+        """Срок автопрогрева домена: доля его текущего интервала (None - без срока)"""
+        stats = self.run_stats.get(domain_id)
+        if stats is None or config.SCHEDULER_DEADLINE_FRACTION <= 0:
+            return None
+        return stats.interval * config.SCHEDULER_DEADLINE_FRACTION
+    
     def shutdown(self) -> None:
         """Остановка планировщика"""
         self.scheduler.shutdown()
@@ -119,12 +320,20 @@ class WarmingScheduler:
     async def warm_domain_task(self, domain_id: int, job_id: int) -> None:
         """Задача прогрева домена"""
         try:
+            # Следующий плановый запуск - в БД, чтобы после рестарта продолжить в той же фазе
+            await self._save_next_run(domain_id, job_id)
+            
             # Добавляем случайную задержку между доменами (настраивается в .env)
             # Чтобы не все домены прогревались одновременно на SaaS платформах
-            if config.WARMER_DOMAIN_DELAY_MAX > 0:
+            # При SCHEDULER_LOAD_SHAPING фазы доменов уже разнесены планировщиком нагрузки
+            delay = 0.0
+            if config.WARMER_DOMAIN_DELAY_MAX > 0 and not config.SCHEDULER_LOAD_SHAPING:
                 delay = random.uniform(config.WARMER_DOMAIN_DELAY_MIN, config.WARMER_DOMAIN_DELAY_MAX)
                 logger.info(f"⏰ Scheduled warming task for domain_id={domain_id}, waiting {delay:.1f}s to avoid platform overload")
-                await asyncio.sleep(delay)
+                # В режиме очереди задержка задается временем доступности задачи
+                if not config.WARMING_QUEUE_ENABLED:
+                    self._domain_delays[domain_id] = delay
+                    await asyncio.sleep(delay)
             else:
                 logger.info(f"⏰ Scheduled warming task for domain_id={domain_id} (no delay)")
             
@@ -153,25 +362,39 @@ class WarmingScheduler:
             
             logger.info(f"Scheduled warming for {domain.name} (group {active_group}): {len(urls)}/{len(all_urls)} URLs")
             
+            if config.WARMING_QUEUE_ENABLED:
+                # Прогрев выполнит воркер; результат и уведомление - через process_warming_queue_task
+                task = await db_manager.enqueue_warming_task(
+                    domain_id=domain_id,
+                    domain_name=domain.name,
+                    urls=urls,
+                    warming_type="scheduled",
+                    job_id=job_id,
+                    delay_seconds=delay,
+                    deadline_seconds=self._deadline_seconds(domain_id)
+                )
+                if task:
+                    logger.info(f"📥 Queued scheduled warming task {task.id} for {domain.name}")
+                else:
+                    logger.info(f"⏭ {domain.name} already has a queued warming task, skipping")
+                    scheduler_skipped_runs.inc(job=f"{DOMAIN_JOB_PREFIX}{domain_id}", reason="queued")
+                    if domain_id in self.run_stats:
+                        self.run_stats[domain_id].record_skipped()
+                return
+            
             # Прогреваем (передаем имя домена для логирования)
-            stats = await warmer.warm_site(urls, domain_name=domain.name)
+            stats = await warmer.warm_site(
+                urls,
+                domain_name=domain.name,
+                variants=domain.warming_variants,
+                fetcher="browser" if domain.render_warming else None,
+                deadline_seconds=self._deadline_seconds(domain_id)
+            )
             
-            # Сохраняем результаты прогрева в БД
+            # Ставим результат в очередь фоновой записи в БД (не ждем коммита)
             try:
-                await db_manager.save_warming_result(
-                    domain_id=domain_id,
-                    started_at=stats["started_at"],
-                    completed_at=stats["completed_at"],
-                    total_requests=stats["total_requests"],
-                    successful_requests=stats["success"],
-                    failed_requests=stats["error"],
-                    timeout_requests=stats["timeout"],
-                    avg_response_time=stats["avg_time"],
-                    min_response_time=stats["min_time"],
-                    max_response_time=stats["max_time"],
-                    warming_type="scheduled"
-                )
-                logger.info(f"💾 Saved warming result to database for {domain.name}")
+                await history_writer.submit_warming_result(domain_id, stats, warming_type="scheduled")
+                logger.info(f"💾 Queued warming result for {domain.name}")
             except Exception as e:
                 logger.error(f"Error saving warming result to DB: {e}", exc_info=True)
             
@@ -180,19 +403,22 @@ class WarmingScheduler:
             
             logger.info(f"✅ Scheduled warming completed for {domain.name}: {stats}")
             
+            if stats.get("circuit_opened"):
+                await self._send_circuit_alert(domain.name, stats)
+            
             # Отправляем уведомление пользователю (если включено в настройках)
             if config.SEND_WARMING_NOTIFICATIONS and self.bot:
-                await self._send_warming_notification(domain, stats)
+                await self._send_warming_notification(domain.name, stats)
             
         except Exception as e:
             logger.error(f"Error in scheduled warming task for domain {domain_id}: {e}", exc_info=True)
     
-    async def _send_warming_notification(self, domain, stats: Dict) -> None:
+    async def _send_warming_notification(self, domain_name: str, stats: Dict) -> None:
         """Отправка уведомления о прогреве (только если включено в настройках)"""
         
         # Проверяем, включены ли уведомления
         if not config.SEND_WARMING_NOTIFICATIONS:
-            logger.debug(f"Warming notifications disabled, skipping for domain {domain.name}")
+            logger.debug(f"Warming notifications disabled, skipping for domain {domain_name}")
             return
         
         try:
@@ -209,7 +435,7 @@ class WarmingScheduler:
             # 3. Убрать "общее время" из отчета
             message = (
                 f"{status_emoji} <b>Автопрогрев завершен</b>\n\n"
-                f"🌐 Домен: <b>{domain.name}</b>\n"
+                f"🌐 Домен: <b>{domain_name}</b>\n"
                 f"🕒 Время: {datetime.utcnow().strftime('%Y-%m-%d %H:%M UTC')}\n\n"
                 f"📊 <b>Статистика:</b>\n"
                 f"• Всего запросов: <b>{stats['total_requests']}</b>\n"
@@ -218,6 +444,36 @@ class WarmingScheduler:
                 f"• ❌ Ошибки: <b>{stats['error']}</b>\n"
                 f"• ⏱ Среднее время: <b>{stats['avg_time']:.2f}s</b>"
             )
+            if stats.get("deduplicated"):
+                message += f"\n• 🔁 Уже прогреты другим прогревом: <b>{stats['deduplicated']}</b>"
+            shed = stats.get("shed")
+            if shed:
+                message += f"\n• 🔌 Сайт не отвечает, пропущено запросов: <b>{shed}</b>"
+            if stats.get("retried_success"):
+                message += f"\n• 🔄 Успешно после повтора: <b>{stats['retried_success']}</b>"
+            if stats.get("still_cold"):
+                message += f"\n• 🧊 Не прогрелись после проверок: <b>{stats['still_cold']}</b>"
+            deadline = stats.get("deadline")
+            if deadline:
+                message += (
+                    f"\n• ⌛ Покрытие в срок ({deadline['seconds']:.0f}s): <b>{deadline['coverage']:.1%}</b>"
+                    f"{'' if deadline['met'] else ', срок не выдержан'}"
+                )
+                if deadline["repeats_dropped"]:
+                    message += f", повторов отброшено: {deadline['repeats_dropped']}"
+            if stats.get("bytes_saved"):
+                message += (
+                    f"\n• ♻️ Ревалидировано (304): <b>{stats['revalidated']}</b>, "
+                    f"сэкономлено {stats['bytes_saved'] / 1024 / 1024:.1f} МБ"
+                )
+            variants = stats.get("variants") or {}
+            if len(variants) > 1:
+                message += "\n\n🧬 <b>По вариантам:</b>"
+                for name, variant in variants.items():
+                    message += (
+                        f"\n• {name}: ✅ {variant['success']}/{variant['total_requests']}, "
+                        f"⏱ {variant['avg_time']:.2f}s"
+                    )
             
             # Если указан технический канал - отправляем туда
             if config.TECHNICAL_CHANNEL_ID:
@@ -228,7 +484,7 @@ class WarmingScheduler:
                         text=message,
                         parse_mode="HTML"
                     )
-                    logger.info(f"📤 Notification sent to technical channel ({config.TECHNICAL_CHANNEL_ID}) for domain {domain.name}")
+                    logger.info(f"📤 Notification sent to technical channel ({config.TECHNICAL_CHANNEL_ID}) for domain {domain_name}")
                 except Exception as e:
                     logger.error(
                         f"❌ Failed to send notification to technical channel ({config.TECHNICAL_CHANNEL_ID}): {type(e).__name__}: {e}\n"
@@ -254,12 +510,52 @@ class WarmingScheduler:
                     except Exception as e:
                         logger.warning(f"Failed to send notification to admin {admin.id}: {e}")
                 
-                logger.info(f"📤 Notification sent to {sent_count}/{len(admins)} admins for domain {domain.name}")
+                logger.info(f"📤 Notification sent to {sent_count}/{len(admins)} admins for domain {domain_name}")
             
         except Exception as e:
             logger.error(f"Error sending notifications: {e}", exc_info=True)
     
-    def add_job(self, domain_id: int, job_id: int, schedule: str, start_delay: int = 0) -> bool:
+    async def _send_circuit_alert(self, domain_name: str, stats: Dict) -> None:
+        """
+        Оповещение админов о недоступном сайте (circuit breaker разомкнулся)
+        
+        Отправляется один раз: пока сайт не ответит на пробный запрос, breaker
+        остается разомкнутым, и повторных оповещений нет.
+        """
+        if not self.bot:
+            return
+        
+        message = (
+            f"🔌 <b>Сайт не отвечает</b>\n\n"
+            f"🌐 Домен: <b>{domain_name}</b>\n"
+            f"Origin: {', '.join(stats['circuit_opened'])}\n\n"
+            f"После {config.WARMER_BREAKER_FAILURES} ошибок/таймаутов подряд прогрев остановлен "
+            f"(пропущено запросов: {stats.get('shed', 0)}).\n"
+            f"Пробный запрос - раз в {config.WARMER_BREAKER_RECOVERY_SECONDS / 60:.0f} мин, "
+            f"прогрев возобновится, когда сайт ответит."
+        )
+        
+        chat_ids = [config.TECHNICAL_CHANNEL_ID] if config.TECHNICAL_CHANNEL_ID else [
+            admin.id for admin in await db_manager.get_all_admins()
+        ]
+        for chat_id in chat_ids:
+            try:
+                await self.bot.send_message(chat_id=chat_id, text=message, parse_mode="HTML")
+            except Exception as e:
+                logger.warning(f"Failed to send circuit alert to {chat_id}: {e}")
+        logger.info(f"📤 Circuit alert for {domain_name} sent to {len(chat_ids)} chats")
+    
+    async def _save_next_run(self, domain_id: int, job_id: int) -> None:
+        """Запись следующего запуска задачи домена в БД"""
+        apscheduler_job = self.scheduler.get_job(f"{DOMAIN_JOB_PREFIX}{domain_id}")
+        if apscheduler_job is None or apscheduler_job.next_run_time is None:
+            return
+        try:
+            await db_manager.save_job_next_runs({job_id: _to_utc_naive(apscheduler_job.next_run_time)})
+        except Exception as e:
+            logger.warning(f"Failed to save next run for domain {domain_id}: {e}")
+    
+    def add_job(self, domain_id: int, job_id: int, schedule: str, start_delay: Optional[float] = None) -> bool:
         """
         Добавление задачи в планировщик
         
@@ -267,7 +563,8 @@ class WarmingScheduler:
             domain_id: ID домена
             job_id: ID задачи
             schedule: Расписание (например, "10m")
-            start_delay: Задержка первого запуска в секундах (для умного распределения при старте)
+            start_delay: Задержка первого запуска в секундах (0 - сразу,
+                None - через интервал расписания)
         """
         try:
             # Удаляем старую задачу, если есть
@@ -283,26 +580,32 @@ class WarmingScheduler:
             # Создаем триггер
             trigger = IntervalTrigger(**interval_params)
             
+            # Статистика запусков переживает пересоздание задачи; интервал - из нового расписания
+            interval_seconds = trigger.interval.total_seconds()
+            stats = self.run_stats.setdefault(domain_id, DomainRunStats(interval_seconds))
+            stats.base_interval = stats.interval = interval_seconds
+            scheduler_interval.set(interval_seconds, domain=domain_id)
+            
             # Если задана стартовая задержка, планируем первый запуск через указанное время
             import datetime as dt
-            if start_delay > 0:
+            if start_delay is not None:
                 start_date = datetime.now() + dt.timedelta(seconds=start_delay)
                 apscheduler_job = self.scheduler.add_job(
                     self.warm_domain_task,
                     trigger=trigger,
                     args=[domain_id, job_id],
-                    id=f"warm_domain_{domain_id}",
+                    id=f"{DOMAIN_JOB_PREFIX}{domain_id}",
                     replace_existing=True,
                     next_run_time=start_date  # Первый запуск через start_delay секунд
                 )
-                logger.info(f"✅ Added scheduled job for domain {domain_id}: {schedule} (starts in {start_delay}s)")
+                logger.info(f"✅ Added scheduled job for domain {domain_id}: {schedule} (starts in {start_delay:.0f}s)")
             else:
                 # Обычный запуск без задержки
                 apscheduler_job = self.scheduler.add_job(
                     self.warm_domain_task,
                     trigger=trigger,
                     args=[domain_id, job_id],
-                    id=f"warm_domain_{domain_id}",
+                    id=f"{DOMAIN_JOB_PREFIX}{domain_id}",
                     replace_existing=True,
                 )
                 logger.info(f"✅ Added scheduled job for domain {domain_id}: {schedule}")
@@ -330,8 +633,13 @@ class WarmingScheduler:
     
     async def reload_jobs(self) -> None:
         """
-        Перезагрузка всех активных задач из базы с умным распределением
-        Домены запускаются с задержкой в зависимости от размера
+        Перезагрузка всех активных задач из базы с сохранением фазы расписания
+        
+        Плановое время запуска берется из текущей задачи планировщика, из Job.next_run
+        (сохраняется при каждом запуске) или считается как Job.last_run + интервал.
+        Задачи, время которых еще не наступило, запускаются по плану. Просроченные
+        (в т.ч. пропущенные за время простоя) - начиная с сейчас, равномерно по своему
+        интервалу: самые просроченные первыми.
         """
         logger.info("Reloading scheduled jobs from database...")
         
@@ -342,69 +650,190 @@ class WarmingScheduler:
                 logger.info("No active jobs to reload")
                 return
             
-            # Очищаем все текущие задачи
-            for domain_id in list(self.job_map.keys()):
-                self.remove_job(domain_id)
+            now = datetime.utcnow()
+            on_schedule = []  # (job, задержка)
+            overdue = []  # (job, интервал, на сколько просрочена)
             
-            # Получаем домены с количеством URL для сортировки
-            domains_info = []
             for job in active_jobs:
-                if job.schedule:
-                    domain = await db_manager.get_domain_by_id(job.domain_id)
-                    if domain:
-                        url_count = len(domain.urls) if domain.urls else 0
-                        domains_info.append({
-                            'job': job,
-                            'domain_id': job.domain_id,
-                            'domain_name': domain.name,
-                            'url_count': url_count
-                        })
-            
-            # Сортируем: сначала маленькие домены, потом большие
-            domains_info.sort(key=lambda x: x['url_count'])
-            
-            # Рассчитываем задержку для каждого домена
-            # Разбиваем домены на группы по размеру
-            total_domains = len(domains_info)
-            
-            logger.info(f"📊 Scheduling {total_domains} domains by size:")
-            for i, info in enumerate(domains_info):
-                # Задержка увеличивается для каждого следующего домена
-                # Маленькие домены (0-50 URL) - стартуют быстрее
-                # Средние домены (50-200 URL) - средняя задержка
-                # Большие домены (>200 URL) - большая задержка
-                
-                url_count = info['url_count']
+                if not job.schedule or not job.domain:
+                    continue
+                interval_params = self.parse_schedule(job.schedule)
+                if not interval_params:
+                    continue
+                interval = IntervalTrigger(**interval_params).interval.total_seconds()
                 
-                # Базовая задержка на основе позиции в очереди
-                base_delay = i * 30  # 30 секунд между каждым доменом
-                
-                # Дополнительная задержка на основе размера
-                if url_count > 500:
-                    size_delay = 120  # Очень большой домен - дополнительные 2 минуты
-                elif url_count > 200:
-                    size_delay = 60   # Большой домен - дополнительно 60 сек
-                elif url_count > 50:
-                    size_delay = 30   # Средний домен - дополнительно 30 сек
+                current = self.scheduler.get_job(f"{DOMAIN_JOB_PREFIX}{job.domain_id}")
+                if current is not None and current.next_run_time is not None:
+                    planned = _to_utc_naive(current.next_run_time)
+                elif job.next_run:
+                    planned = job.next_run
+                elif job.last_run:
+                    planned = job.last_run + timedelta(seconds=interval)
                 else:
-                    size_delay = 15   # Маленький домен - дополнительно 15 сек
-                
-                total_delay = base_delay + size_delay
-                
-                # Добавляем задачу с учетом стартовой задержки
-                job = info['job']
-                self.add_job(job.domain_id, job.id, job.schedule, start_delay=total_delay)
+                    planned = None  # Еще ни разу не прогревался
                 
-                logger.info(
-                    f"  {i+1}. {info['domain_name']}: {url_count} URLs → "
-                    f"start in {total_delay}s (base: {base_delay}s + size: {size_delay}s)"
-                )
+                if planned is not None and planned > now:
+                    # Расписание могли сократить - ждать дольше нового интервала незачем
+                    on_schedule.append((job, min((planned - now).total_seconds(), interval)))
+                else:
+                    overdue_by = (now - planned).total_seconds() if planned else float("inf")
+                    overdue.append((job, interval, overdue_by))
+            
+            # Очищаем все текущие задачи
+            for domain_id in list(self.job_map.keys()):
+                self.remove_job(domain_id)
+            
+            overdue.sort(key=lambda item: item[2], reverse=True)
+            scheduled = list(on_schedule)
+            for position, (job, interval, _) in enumerate(overdue):
+                scheduled.append((job, position * interval / len(overdue)))
             
-            logger.info(f"✅ Reloaded {len(domains_info)} scheduled jobs with smart distribution")
+            next_runs = {}
+            for job, delay in scheduled:
+                if self.add_job(job.domain_id, job.id, job.schedule, start_delay=delay):
+                    next_runs[job.id] = now + timedelta(seconds=delay)
+            
+            try:
+                await db_manager.save_job_next_runs(next_runs)
+            except Exception as e:
+                logger.warning(f"Failed to save next runs: {e}")
+            
+            logger.info(
+                f"✅ Reloaded {len(scheduled)} scheduled jobs: {len(on_schedule)} on schedule, "
+                f"{len(overdue)} overdue spread across their intervals"
+            )
             
         except Exception as e:
             logger.error(f"Error reloading jobs: {e}", exc_info=True)
     
+    async def build_load_plan(self) -> Dict:
+        """
+        План фаз автопрогрева (см. load_planner.plan_offsets)
+        
+        Длительность прогрева - средняя по последним запускам (run_stats), для
+        доменов без замеров - оценка по количеству URL. Текущие смещения берутся
+        из времени следующего запуска задач планировщика.
+        """
+        active_jobs = await db_manager.get_active_jobs()
+        now = datetime.now(self.scheduler.timezone)
+        
+        items = []
+        jobs = {}
+        for job in active_jobs:
+            apscheduler_job = self.scheduler.get_job(f"{DOMAIN_JOB_PREFIX}{job.domain_id}")
+            if apscheduler_job is None or not job.domain:
+                continue
+            
+            all_urls = [url.url for url in job.domain.urls]
+            url_count = len(url_grouper.filter_urls_by_group(all_urls, job.domain.name, job.active_url_group))
+            interval = apscheduler_job.trigger.interval.total_seconds()
+            
+            stats = self.run_stats.get(job.domain_id)
+            duration = stats.avg_duration if stats and stats.avg_duration is not None else None
+            if duration is None:
+                duration = load_planner.estimate_duration(url_count)
+            
+            offset = None
+            if apscheduler_job.next_run_time is not None:
+                offset = (apscheduler_job.next_run_time - now).total_seconds() % interval
+            
+            items.append({
+                "domain_id": job.domain_id,
+                "interval": interval,
+                "duration": duration,
+                "load": load_planner.estimate_load(url_count),
+                "offset": offset,
+            })
+            jobs[job.domain_id] = job
+        
+        # Перебор смещений - CPU, не блокируем event loop
+        plan = await asyncio.to_thread(
+            load_planner.plan_offsets, items, config.SCHEDULER_PLAN_SLOT_SECONDS
+        )
+        plan["domains"] = {
+            item["domain_id"]: {
+                "name": jobs[item["domain_id"]].domain.name,
+                "job_id": jobs[item["domain_id"]].id,
+                "duration": item["duration"],
+                "load": item["load"],
+            }
+            for item in items
+        }
+        return plan
+    
+    async def apply_load_plan(self, plan: Dict) -> int:
+        """Перенос следующего запуска каждого домена на смещение из плана"""
+        now = datetime.now(self.scheduler.timezone)
+        next_runs = {}
+        for domain_id, offset in plan["offsets"].items():
+            job_id = self.job_map.get(domain_id)
+            if job_id is None:
+                continue
+            next_run = now + timedelta(seconds=offset)
+            try:
+                self.scheduler.modify_job(job_id, next_run_time=next_run)
+            except Exception as e:
+                logger.warning(f"Failed to move next run for domain {domain_id}: {e}")
+                continue
+            next_runs[plan["domains"][domain_id]["job_id"]] = _to_utc_naive(next_run)
+        
+        await db_manager.save_job_next_runs(next_runs)
+        logger.info(
+            f"📐 Load plan applied to {len(next_runs)} domains: "
+            f"peak {plan['current_peak'] or 0:.0f} → {plan['planned_peak']:.0f} concurrent requests"
+        )
+        return len(next_runs)
+    
+    async def rebalance_schedule_task(self) -> None:
+        """Задача для перераспределения фаз автопрогрева"""
+        try:
+            plan = await self.build_load_plan()
+            # Не двигаем расписание ради незначительного выигрыша
+            if plan["current_peak"] and plan["planned_peak"] < 0.9 * plan["current_peak"]:
+                await self.apply_load_plan(plan)
+            else:
+                logger.info("📐 Load plan: current schedule is already balanced")
+        except Exception as e:
+            logger.error(f"Error in schedule rebalance task: {e}", exc_info=True)
+    
+    async def warm_assets_task(self) -> None:
+        """
+        Задача прогрева статики (CSS, JS, изображения) доменов в автопрогреве
+        
+        Статика ищется на выборке основных страниц домена и обновляется раз в
+        сутки; прогревается с теми же вариантами кэша, что и страницы.
+        """
+        try:
+            jobs = await db_manager.get_active_jobs()
+        except Exception as e:
+            logger.error(f"Error loading jobs for asset warming: {e}", exc_info=True)
+            return
+        
+        rediscover_before = datetime.utcnow() - timedelta(days=1)
+        for job in jobs:
+            domain = job.domain
+            if not domain or not domain.is_active or not domain.urls:
+                continue
+            
+            try:
+                assets = domain.asset_urls
+                if assets is None or not domain.assets_discovered_at or domain.assets_discovered_at < rediscover_before:
+                    all_urls = [url.url for url in domain.urls]
+                    main_urls = url_grouper.filter_urls_by_group(all_urls, domain.name, 2) or all_urls
+                    assets = await sitemap_parser.discover_assets(domain.name, main_urls)
+                    await db_manager.set_domain_assets(domain.id, assets)
+                
+                if not assets:
+                    continue
+                
+                stats = await warmer.warm_site(assets, domain_name=domain.name, variants=domain.warming_variants)
+                logger.info(
+                    f"🧱 Assets warmed for {domain.name}: {stats['success']}/{stats['total_requests']} "
+                    f"({len(assets)} assets, avg {stats['avg_time']:.2f}s)"
+                )
+            except Exception as e:
+                logger.error(f"Error warming assets for {domain.name}: {e}", exc_info=True)
+    
     async def send_daily_reports_task(self) -> None:
         """Задача для отправки ежедневных отчетов"""
         if not self.bot:
@@ -423,6 +852,85 @@ class WarmingScheduler:
         logger.info("Sending 2-hour admin reports...")
         await report_generator.send_hourly_admin_reports(self.bot)
     
+    async def catch_up_history_task(self) -> None:
+        """Компактизация при старте, если плановая отстала (агрегатов нет или история старше срока)"""
+        try:
+            if not await db_manager.history_compaction_due(config.HISTORY_RETENTION_DAYS):
+                # Партиции текущего и следующих месяцев нужны и без компактизации (без удаления старых)
+                await db_manager.maintain_history_partitions(
+                    months_ahead=config.HISTORY_PARTITIONS_AHEAD,
+                    retention_days=0
+                )
+                return
+        except Exception as e:
+            logger.error(f"Error checking history compaction state: {e}", exc_info=True)
+            return
+        logger.info("🗜 History compaction is behind schedule, catching up on startup")
+        await self.compact_history_task()
+    
+    async def compact_history_task(self) -> None:
+        """Задача для пересчета агрегатов истории и удаления старых записей"""
+        logger.info("🗜 Starting warming history compaction...")
+        
+        try:
+            # Сначала целиком удаляем устаревшие партиции (если таблица партиционирована),
+            # чтобы построчное удаление ниже трогало только пограничный месяц
+            partition_stats = await db_manager.maintain_history_partitions(
+                months_ahead=config.HISTORY_PARTITIONS_AHEAD,
+                retention_days=config.HISTORY_RETENTION_DAYS
+            )
+            if any(partition_stats.values()):
+                logger.info(f"✅ History partitions maintained: {partition_stats}")
+            
+            stats = await db_manager.compact_warming_history(
+                retention_days=config.HISTORY_RETENTION_DAYS,
+                hourly_retention_days=config.HISTORY_HOURLY_RETENTION_DAYS
+            )
+            logger.info(f"✅ History compaction completed: {stats}")
+            
+            # Завершенные задачи очереди прогревов храним столько же, сколько сырую историю
+            if config.HISTORY_RETENTION_DAYS > 0:
+                deleted = await db_manager.delete_finished_warming_tasks(
+                    older_than=datetime.utcnow() - timedelta(days=config.HISTORY_RETENTION_DAYS)
+                )
+                if deleted:
+                    logger.info(f"🗑 Deleted {deleted} finished warming queue tasks")
+        except Exception as e:
+            logger.error(f"Error in history compaction task: {e}", exc_info=True)
+    
+    async def process_warming_queue_task(self) -> None:
+        """Задача для чтения результатов воркеров и отправки уведомлений"""
+        try:
+            finished = await warming_manager.sync_queue(self.bot)
+        except Exception as e:
+            logger.error(f"Error syncing warming queue: {e}", exc_info=True)
+            return
+        
+        # Длительность прогрева автопрогревом - по данным воркера
+        for task in finished:
+            if task.status == "done" and task.started_at and task.completed_at:
+                self._record_domain_run(task.domain_id, (task.completed_at - task.started_at).total_seconds())
+        
+        for task in finished:
+            if task.status == "done" and task.result and task.result.get("circuit_opened"):
+                await self._send_circuit_alert(task.domain_name, task.result)
+        
+        if not (config.SEND_WARMING_NOTIFICATIONS and self.bot):
+            return
+        
+        for task in finished:
+            if task.status == "done":
+                await self._send_warming_notification(task.domain_name, task.result)
+    
+    async def flush_user_activity_task(self) -> None:
+        """Задача для пакетной записи last_activity пользователей"""
+        try:
+            updated = await db_manager.flush_user_activity()
+            if updated:
+                logger.debug(f"Flushed last_activity for {updated} users")
+        except Exception as e:
+            logger.error(f"Error flushing user activity: {e}")
+    
     async def update_domains_urls_task(self) -> None:
         """Задача для автоматического обновления URL всех доменов"""
         logger.info("🔄 Starting automatic URL update for all domains...")
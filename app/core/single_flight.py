@@ -0,0 +1,136 @@
+"""
+Дедупликация запросов прогрева между одновременными прогревами
+
+Ручной прогрев, автопрогрев и диагностика могут одновременно греть одни и те
+же URL. Реестр ведет запросы, которые выполняются прямо сейчас: второй
+прогрев того же URL не делает свой запрос, а дожидается первого (single-flight).
+Кроме того, URL, успешно прогретый другим прогревом не раньше чем
+WARMER_DEDUP_WINDOW_SECONDS назад, пропускается.
+
+Повторы внутри одного прогрева (WARMER_REPEAT_COUNT) не пропускаются - это
+часть самого прогрева.
+
+Реестр свой у каждого процесса. При WARMER_PROCESSES > 1 основной процесс
+передает процессу прогрева отметки о недавнем прогреве его URL (export) и
+забирает новые обратно (load), так что окно дедупликации работает между
+прогревами. Объединение одновременных запросов - только внутри процесса.
+Воркеры очереди (app.worker) - отдельные процессы, у каждого свои отметки.
+
+Диагностика кэша (CacheDiagnostics) свои запросы через реестр не пускает:
+ей нужно время ответа каждого своего запроса, а присоединение к чужому его
+не дает. Она только отмечает прогретые страницы (mark_warmed), чтобы
+параллельный прогрев их пропустил.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+from app.config import config
+from app.utils.metrics import warm_deduplicated
+
+
+class URLFlightRegistry:
+    """Запросы в полете и недавно прогретые URL"""
+
+    def __init__(self, window_seconds: Optional[float] = None, max_urls: Optional[int] = None):
+        self.window = window_seconds if window_seconds is not None else config.WARMER_DEDUP_WINDOW_SECONDS
+        self.max_urls = max_urls or config.WARMER_DEDUP_MAX_URLS
+        self._inflight: Dict[str, asyncio.Future] = {}
+        # url -> (время прогрева, id прогрева); порядок - от давних к свежим
+        self._recent: "OrderedDict[str, Tuple[float, int]]" = OrderedDict()
+
+    def mark_warmed(self, url: str, run_id: int = 0) -> None:
+        """Отметка об успешном прогреве URL"""
+        if not self.window:
+            return
+        self._recent[url] = (time.monotonic(), run_id)
+        self._recent.move_to_end(url)
+        while len(self._recent) > self.max_urls:
+            self._recent.popitem(last=False)
+
+    def export(self, urls: Iterable[str]) -> Dict[str, float]:
+        """Недавно прогретые URL из списка: url -> сколько секунд назад (для другого процесса)"""
+        now = time.monotonic()
+        ages = {}
+        for url in urls:
+            entry = self._recent.get(url)
+            if entry is not None and now - entry[0] <= self.window:
+                ages[url] = now - entry[0]
+        return ages
+
+    def load(self, ages: Dict[str, float]) -> None:
+        """Отметки из другого процесса (export) - чужие для любого прогрева этого процесса"""
+        if not self.window:
+            return
+        now = time.monotonic()
+        for url, age in ages.items():
+            entry = self._recent.get(url)
+            if entry is None or entry[0] < now - age:
+                self._recent[url] = (now - age, 0)
+                self._recent.move_to_end(url)
+        while len(self._recent) > self.max_urls:
+            self._recent.popitem(last=False)
+
+    def _recently_warmed(self, url: str, run_id: int) -> bool:
+        entry = self._recent.get(url)
+        if entry is None:
+            return False
+        warmed_at, owner = entry
+        if time.monotonic() - warmed_at > self.window:
+            del self._recent[url]
+            return False
+        # Свои же повторы не пропускаем
+        return owner != run_id
+
+    async def run(
+        self,
+        url: str,
+        run_id: int,
+        domain_name: str,
+        fetch: Callable[[], Awaitable[Dict[str, Any]]],
+    ) -> Dict[str, Any]:
+        """
+        Запрос URL через реестр
+
+        Returns:
+            Результат fetch() или {"status": "deduplicated"}, если запрос
+            не понадобился (URL уже в полете или недавно прогрет).
+            Если запрос, к которому присоединились, не удался -
+            {"status": "joined_failed"}: URL не прогрет.
+        """
+        if self.window and self._recently_warmed(url, run_id):
+            warm_deduplicated.inc(domain=domain_name, reason="recent")
+            return {"url": url, "status": "deduplicated", "elapsed": 0.0}
+
+        future = self._inflight.get(url)
+        if future is not None:
+            # Отмена ожидающего не должна отменять чужой запрос
+            owner_result = await asyncio.shield(future)
+            warm_deduplicated.inc(domain=domain_name, reason="joined")
+            if owner_result is not None and owner_result["status"] == "success":
+                return {"url": url, "status": "deduplicated", "elapsed": 0.0}
+            return {
+                "url": url,
+                "status": "joined_failed",
+                # None - чужой прогрев отменен посреди запроса
+                "owner_status": owner_result["status"] if owner_result is not None else None,
+                "elapsed": 0.0,
+            }
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[url] = future
+        result = None
+        try:
+            result = await fetch()
+            if result["status"] == "success":
+                self.mark_warmed(url, run_id)
+            return result
+        finally:
+            del self._inflight[url]
+            # Присоединившиеся получают итог запроса
+            future.set_result(result)
+
+
+# Глобальный экземпляр
+url_flights = URLFlightRegistry()
@@ -0,0 +1,126 @@
+"""
+Варианты кэша для прогрева (устройство, язык, cookies)
+
+Многие сайты и CDN хранят несколько версий одной страницы: мобильную и
+десктопную (Vary: User-Agent), языковые версии (Vary: Accept-Language),
+версии для разных регионов или валют по cookies. Прогрев одним User-Agent
+греет только одну из них. Профиль варианта - набор заголовков и cookies;
+каждый URL домена запрашивается с каждым профилем из его списка вариантов.
+
+Встроенные профили: desktop (по умолчанию) и mobile. Дополнительные задаются
+в WARMER_VARIANT_PROFILES (JSON).
+
+Сжатие - тоже вариант: CDN хранит отдельные объекты для br, gzip и без сжатия.
+По умолчанию запрос прогрева просит те же кодировки, что и браузер
+(BROWSER_ACCEPT_ENCODING); суффикс @кодировка в имени варианта
+(например, "mobile@gzip") задает одну конкретную. Тело ответа прогреву не
+нужно и не распаковывается, так что кодировку не обязательно уметь декодировать.
+"""
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+from app.config import config
+
+logger = logging.getLogger(__name__)
+
+DESKTOP_USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+)
+MOBILE_USER_AGENT = (
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 17_2 like Mac OS X) AppleWebKit/605.1.15 "
+    "(KHTML, like Gecko) Version/17.2 Mobile/15E148 Safari/604.1"
+)
+
+# Accept-Encoding современного браузера (Chrome)
+BROWSER_ACCEPT_ENCODING = "gzip, deflate, br, zstd"
+
+# Суффиксы вариантов сжатия: "<профиль>@<кодировка>"
+ENCODINGS = ("br", "gzip", "deflate", "zstd", "identity")
+
+# Вариант по умолчанию: его ключ дедупликации и валидаторов - просто URL
+DEFAULT_VARIANT = "desktop"
+
+BUILTIN_PROFILES: Dict[str, Dict[str, Any]] = {
+    "desktop": {"headers": {"User-Agent": DESKTOP_USER_AGENT}},
+    "mobile": {"headers": {"User-Agent": MOBILE_USER_AGENT}},
+}
+
+
+def load_profiles() -> Dict[str, Dict[str, Any]]:
+    """Все профили: встроенные и из WARMER_VARIANT_PROFILES"""
+    profiles = dict(BUILTIN_PROFILES)
+    if not config.WARMER_VARIANT_PROFILES:
+        return profiles
+
+    try:
+        extra = json.loads(config.WARMER_VARIANT_PROFILES)
+    except ValueError as e:
+        logger.error(f"Invalid WARMER_VARIANT_PROFILES: {e}")
+        return profiles
+
+    if not isinstance(extra, dict):
+        logger.error("Invalid WARMER_VARIANT_PROFILES: expected JSON object")
+        return profiles
+
+    for name, profile in extra.items():
+        if isinstance(profile, dict):
+            profiles[name] = profile
+        else:
+            logger.error(f"Invalid variant profile {name!r}: expected JSON object")
+    return profiles
+
+
+def is_known_variant(name: str, profiles: Optional[Dict[str, Dict[str, Any]]] = None) -> bool:
+    """Есть ли профиль (и кодировка, если указана) для имени варианта"""
+    profile_name, _, encoding = name.partition("@")
+    if encoding and encoding not in ENCODINGS:
+        return False
+    return profile_name in (profiles if profiles is not None else load_profiles())
+
+
+def resolve_variants(names: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """
+    Профили вариантов для прогрева
+
+    Args:
+        names: Имена профилей (None или пусто - только вариант по умолчанию)
+
+    Returns:
+        [{"name", "headers"}], где headers - заголовки запроса вместе с Cookie
+    """
+    profiles = load_profiles()
+    variants = []
+    for name in names or [DEFAULT_VARIANT]:
+        if not is_known_variant(name, profiles):
+            logger.warning(f"Unknown warming variant {name!r}, skipping")
+            continue
+        profile_name, _, encoding = name.partition("@")
+        profile = profiles[profile_name]
+        headers = {
+            "User-Agent": DESKTOP_USER_AGENT,
+            "Accept-Encoding": BROWSER_ACCEPT_ENCODING,
+            **profile.get("headers", {}),
+        }
+        if encoding:
+            headers["Accept-Encoding"] = encoding
+        cookies = profile.get("cookies")
+        if cookies:
+            # Cookie заголовком запроса: cookies клиента общие для всех вариантов
+            headers["Cookie"] = "; ".join(f"{key}={value}" for key, value in cookies.items())
+        variants.append({"name": name, "headers": headers})
+
+    if not variants:
+        variants.append({
+            "name": DEFAULT_VARIANT,
+            "headers": {"User-Agent": DESKTOP_USER_AGENT, "Accept-Encoding": BROWSER_ACCEPT_ENCODING},
+        })
+    return variants
+
+
+def variant_key(url: str, variant_name: str) -> str:
+    """Ключ URL с учетом варианта (для дедупликации и валидаторов)"""
+    if variant_name == DEFAULT_VARIANT:
+        return url
+    return f"{url}#variant={variant_name}"
@@ -0,0 +1,92 @@
+"""
+Проверка, прогрет ли URL ("warm until hot")
+
+Вместо слепых повторов (каждый URL WARMER_REPEAT_COUNT раз) повторно
+запрашиваются только URL, которые после запроса еще не горячие:
+    - кэш ответил промахом (X-Cache: MISS, Age: 0 и т.п.);
+    - ответ медленнее обычного времени горячего ответа этого URL больше
+      чем в WARMER_HOT_SLOWDOWN раз (и больше чем на MIN_SLOWDOWN_SECONDS);
+    - ответа нет (таймаут, ошибка соединения), в том числе у чужого
+      запроса, к которому присоединился прогрев (app.core.single_flight).
+Проходов - не больше WARMER_REPEAT_COUNT, так что на здоровом сайте второй
+проход почти пустой, а на медленном URL проверяются, пока не станут горячими.
+
+Обычное время горячего ответа (baseline) запоминается по URL с учетом
+варианта: снижается сразу до более быстрого ответа и медленно растет. Если
+у сайта нет заголовков кэша и baseline еще неизвестен, первый ответ
+становится baseline, а URL проверяется еще одним запросом.
+
+Хранилище в памяти процесса, ограничено WARMER_VALIDATORS_MAX_URLS (LRU).
+Процессы прогрева (WARMER_PROCESSES > 1) получают baseline своих URL из
+основного процесса и возвращают уточненный (export / load). У воркеров
+очереди (app.worker) baseline свой в каждом воркере.
+"""
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+from app.config import config
+
+# Разброс времени быстрых ответов (сеть, планировщик) - не признак холодного кэша
+MIN_SLOWDOWN_SECONDS = 0.1
+
+
+class WarmBaselineStore:
+    """Время горячего ответа по URL"""
+
+    def __init__(self, max_urls: Optional[int] = None, slowdown: Optional[float] = None, alpha: float = 0.2):
+        self.max_urls = max_urls or config.WARMER_VALIDATORS_MAX_URLS
+        self.slowdown = slowdown if slowdown is not None else config.WARMER_HOT_SLOWDOWN
+        self.alpha = alpha
+        self._baselines: "OrderedDict[str, float]" = OrderedDict()
+
+    def baseline(self, url: str) -> Optional[float]:
+        return self._baselines.get(url)
+
+    def check(self, url: str, verdict: str, elapsed: float) -> bool:
+        """
+        Горячий ли ответ (verdict - app.core.warmer.cache_verdict)
+
+        Горячие ответы уточняют baseline URL.
+        """
+        if verdict == "miss":
+            return False
+
+        baseline = self._baselines.get(url)
+        if baseline is None:
+            self._observe(url, elapsed)
+            # Без заголовков кэша по одному ответу не понять - нужна проверка
+            return verdict == "hit"
+
+        if elapsed > max(baseline * self.slowdown, baseline + MIN_SLOWDOWN_SECONDS):
+            return False
+        self._observe(url, elapsed)
+        return True
+
+    def export(self, urls: Iterable[str]) -> Dict[str, Optional[float]]:
+        """Baseline по списку URL для другого процесса (None - неизвестен)"""
+        return {url: self._baselines.get(url) for url in urls}
+
+    def load(self, baselines: Dict[str, Optional[float]]) -> None:
+        """Baseline из другого процесса (export) вместо своих"""
+        for url, baseline in baselines.items():
+            if baseline is None:
+                self._baselines.pop(url, None)
+                continue
+            self._baselines[url] = baseline
+            self._baselines.move_to_end(url)
+        while len(self._baselines) > self.max_urls:
+            self._baselines.popitem(last=False)
+
+    def _observe(self, url: str, elapsed: float) -> None:
+        baseline = self._baselines.get(url)
+        if baseline is None or elapsed < baseline:
+            self._baselines[url] = elapsed
+        else:
+            self._baselines[url] = baseline + self.alpha * (elapsed - baseline)
+        self._baselines.move_to_end(url)
+        while len(self._baselines) > self.max_urls:
+            self._baselines.popitem(last=False)
+
+
+# Глобальный экземпляр
+warm_baselines = WarmBaselineStore()
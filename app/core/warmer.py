@@ -2,16 +2,249 @@
 Модуль прогрева сайтов
 """
 import asyncio
+import itertools
 import logging
+import multiprocessing
 import random
-from typing import List, Dict, Any
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional
 from datetime import datetime
 
 import httpx
 from app.config import config
+from app.core.circuit_breaker import circuit_breakers, origin_of, strictest_states
+from app.core.deadline import RunDeadline, plan_run, priority_order, request_times
+from app.core.fetchers import FetchTimeout, create_fetcher
+from app.core.retry import RETRYABLE_ERRORS, RetryBudget, retry_after_seconds, retry_delay
+from app.core.revalidation import validator_store
+from app.core.single_flight import url_flights
+from app.core.variants import DEFAULT_VARIANT, resolve_variants, variant_key
+from app.core.warm_baseline import warm_baselines
+from app.utils.logger import sampled
+from app.utils.metrics import (
+    metrics_registry, warm_requests, warm_request_duration,
+    warm_requests_in_flight, warm_semaphore_wait, warmings_active, warm_bytes, warm_retries,
+    warm_deadline_coverage,
+)
 
 logger = logging.getLogger(__name__)
 
+# Идентификаторы прогревов (для дедупликации: свои повторы не пропускаются)
+_run_ids = itertools.count(1)
+
+
+def cache_verdict(headers: httpx.Headers) -> str:
+    """
+    Попадание в кэш по заголовкам ответа: hit, miss или unknown
+
+    Учитываются заголовки популярных CDN и прокси (X-Cache, CF-Cache-Status,
+    X-Cache-Status, X-Proxy-Cache) и Age > 0.
+    """
+    for name in ("cf-cache-status", "x-cache-status", "x-cache", "x-proxy-cache"):
+        value = headers.get(name)
+        if value:
+            value = value.upper()
+            if "HIT" in value:
+                return "hit"
+            if any(marker in value for marker in ("MISS", "EXPIRED", "BYPASS", "DYNAMIC")):
+                return "miss"
+    age = headers.get("age")
+    if age and age.strip().isdigit():
+        return "hit" if int(age) > 0 else "miss"
+    return "unknown"
+
+
+def _variant_stats(results: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Сводка запросов по вариантам кэша"""
+    variants: Dict[str, Dict[str, Any]] = {}
+    for r in results:
+        if r["status"] in ("deduplicated", "joined_failed", "shed", "skipped"):
+            continue
+        entry = variants.setdefault(
+            r.get("variant", DEFAULT_VARIANT),
+            {"total_requests": 0, "success": 0, "timeout": 0, "error": 0, "total_time": 0.0},
+        )
+        entry["total_requests"] += 1
+        entry[r["status"]] += 1
+        entry["total_time"] += r["elapsed"]
+    return variants
+
+
+def _is_cold(result: Dict[str, Any]) -> bool:
+    """URL не прогрет: ответ не горячий, запрос не удался или не удался чужой запрос, к которому присоединились"""
+    return result.get("hot") is False or result["status"] == "joined_failed"
+
+
+def _deadline_stats(
+    results: List[Dict[str, Any]],
+    deadline: RunDeadline,
+    planned: int,
+) -> Dict[str, Any]:
+    """Сводка прогрева со сроком: сколько пар URL x вариант прогрето до срока"""
+    covered = {
+        (r["url"], r.get("variant", DEFAULT_VARIANT))
+        for r in results
+        if r["status"] in ("success", "deduplicated")
+    }
+    return {
+        "seconds": deadline.seconds,
+        "planned": planned,
+        "covered": len(covered),
+        "skipped": sum(1 for r in results if r["status"] == "skipped"),
+        "repeats_dropped": deadline.repeats_dropped,
+        "delay_scale": deadline.delay_scale,
+        "finished_in_time": not deadline.expired(),
+    }
+
+
+def _partial_stats(
+    results: List[Dict[str, Any]],
+    deadline: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Компактная сводка по результатам запросов (то, что передается между процессами)"""
+    # Время ответа только успешных запросов
+    response_times = [r["elapsed"] for r in results if r["status"] == "success"]
+    # Пропущенные (URL грел другой прогрев, сайт недоступен или вышел срок) - не запросы
+    deduplicated = sum(1 for r in results if r["status"] == "deduplicated")
+    # Присоединились к чужому запросу, а он не удался: запроса не было, URL не прогрет
+    joined_failed = sum(1 for r in results if r["status"] == "joined_failed")
+    shed = sum(1 for r in results if r["status"] == "shed")
+    skipped = sum(1 for r in results if r["status"] == "skipped")
+    # Итог по паре URL x вариант - последний ответ (результаты идут по проходам)
+    last_results = {
+        (r["url"], r.get("variant", DEFAULT_VARIANT)): r
+        for r in results
+        if "hot" in r or r["status"] == "joined_failed"
+    }
+    return {
+        "total_requests": len(results) - deduplicated - joined_failed - shed - skipped,
+        "deduplicated": deduplicated,
+        "joined_failed": joined_failed,
+        "shed": shed,
+        "circuit_opened": sorted({origin_of(r["url"]) for r in results if r.get("circuit_opened")}),
+        "success": sum(1 for r in results if r["status"] == "success"),
+        "timeout": sum(1 for r in results if r["status"] == "timeout"),
+        "error": sum(1 for r in results if r["status"] == "error"),
+        "revalidated": sum(1 for r in results if r.get("status_code") == 304),
+        "retries": sum(r.get("retries", 0) for r in results),
+        # Повтор помог: итоговый ответ без ошибки
+        "retried_success": sum(1 for r in results if r.get("retries") and r.get("status_code", 500) < 400),
+        "retries_denied": sum(1 for r in results if r.get("retry_denied")),
+        # Запросы повторных проходов и URL, так и не ставшие горячими
+        "repeat_requests": sum(1 for r in results if r.get("repeat") and "hot" in r),
+        "still_cold": sum(1 for r in last_results.values() if _is_cold(r)),
+        "bytes_received": sum(r.get("bytes", 0) for r in results),
+        "bytes_saved": sum(r.get("bytes_saved", 0) for r in results),
+        "total_time": sum(r["elapsed"] for r in results),
+        "min_time": min(response_times) if response_times else None,
+        "max_time": max(response_times) if response_times else None,
+        "variants": _variant_stats(results),
+        "deadline": deadline,
+    }
+
+
+def _merge_partial_stats(parts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Слияние сводок нескольких процессов"""
+    mins = [p["min_time"] for p in parts if p["min_time"] is not None]
+    maxs = [p["max_time"] for p in parts if p["max_time"] is not None]
+    variants: Dict[str, Dict[str, Any]] = {}
+    for part in parts:
+        for name, entry in part["variants"].items():
+            merged = variants.setdefault(name, dict.fromkeys(entry, 0))
+            for key, value in entry.items():
+                merged[key] += value
+    deadlines = [p["deadline"] for p in parts if p["deadline"]]
+    deadline = None
+    if deadlines:
+        deadline = {
+            "seconds": max(d["seconds"] for d in deadlines),
+            "planned": sum(d["planned"] for d in deadlines),
+            "covered": sum(d["covered"] for d in deadlines),
+            "skipped": sum(d["skipped"] for d in deadlines),
+            "repeats_dropped": max(d["repeats_dropped"] for d in deadlines),
+            "delay_scale": min(d["delay_scale"] for d in deadlines),
+            "finished_in_time": all(d["finished_in_time"] for d in deadlines),
+        }
+    return {
+        "total_requests": sum(p["total_requests"] for p in parts),
+        "deduplicated": sum(p["deduplicated"] for p in parts),
+        "joined_failed": sum(p["joined_failed"] for p in parts),
+        "shed": sum(p["shed"] for p in parts),
+        "circuit_opened": sorted({origin for p in parts for origin in p["circuit_opened"]}),
+        "success": sum(p["success"] for p in parts),
+        "timeout": sum(p["timeout"] for p in parts),
+        "error": sum(p["error"] for p in parts),
+        "revalidated": sum(p["revalidated"] for p in parts),
+        "retries": sum(p["retries"] for p in parts),
+        "retried_success": sum(p["retried_success"] for p in parts),
+        "retries_denied": sum(p["retries_denied"] for p in parts),
+        "repeat_requests": sum(p["repeat_requests"] for p in parts),
+        "still_cold": sum(p["still_cold"] for p in parts),
+        "bytes_received": sum(p["bytes_received"] for p in parts),
+        "bytes_saved": sum(p["bytes_saved"] for p in parts),
+        "total_time": sum(p["total_time"] for p in parts),
+        "min_time": min(mins) if mins else None,
+        "max_time": max(maxs) if maxs else None,
+        "variants": variants,
+        "deadline": deadline,
+    }
+
+
+def _export_shared_state(urls: List[str], variants: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Состояние прогрева по URL для другого процесса
+
+    Дедупликация, валидаторы, baseline горячего ответа и breaker'ы живут в
+    памяти процесса. Процесс прогрева получает их для своих URL перед
+    прогревом и возвращает обновленными - иначе каждый процесс начинал бы с нуля.
+    """
+    keys = [variant_key(url, variant["name"]) for url in urls for variant in variants]
+    return {
+        "flights": url_flights.export(keys),
+        "validators": validator_store.export(keys),
+        "baselines": warm_baselines.export(keys),
+        "breakers": circuit_breakers.export({origin_of(url) for url in urls}),
+    }
+
+
+def _load_shared_state(state: Dict[str, Any]) -> None:
+    """Состояние из другого процесса (кроме breaker'ов - их итог сводится по всем процессам)"""
+    url_flights.load(state["flights"])
+    validator_store.load(state["validators"])
+    warm_baselines.load(state["baselines"])
+
+
+def _init_shard_process() -> None:
+    """Инициализация процесса прогрева (логирование как в основном процессе)"""
+    from app.utils.logger import setup_logging
+    setup_logging()
+
+
+def _warm_shard(
+    urls: List[str],
+    domain_name: str,
+    settings: Dict[str, Any],
+    variants: List[Dict[str, Any]],
+    fetcher: Optional[str] = None,
+    deadline_seconds: Optional[float] = None,
+    request_seconds: Optional[float] = None,
+    shared: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Прогрев части URL в отдельном процессе со своим event loop и пулом соединений"""
+    if shared is not None:
+        # Порог breaker'а - доля общего: процессы вместе не делают лишних запросов к лежащему сайту
+        circuit_breakers.failure_threshold = shared["breaker_failures"]
+        _load_shared_state(shared)
+        circuit_breakers.load(shared["breakers"])
+    shard_warmer = SiteWarmer(processes=1, **settings)
+    partial = asyncio.run(shard_warmer._warm_partial(
+        urls, domain_name, variants, fetcher, deadline_seconds, request_seconds
+    ))
+    # Метрики запросов и обновленное состояние уходят в основной процесс вместе со сводкой
+    partial["metrics"] = metrics_registry.drain()
+    partial["shared"] = _export_shared_state(urls, variants)
+    return partial
+
 
 class SiteWarmer:
     """Класс для прогрева сайтов"""
@@ -23,141 +256,472 @@ class SiteWarmer:
         max_delay: float = None,
         repeat_count: int = None,
         timeout: int = None,
+        processes: int = None,
+        revalidate: bool = None,
+        verify_hot: bool = None,
     ):
         self.concurrency = concurrency or config.WARMER_CONCURRENCY
-        self.min_delay = min_delay or config.WARMER_MIN_DELAY
-        self.max_delay = max_delay or config.WARMER_MAX_DELAY
+        self.min_delay = min_delay if min_delay is not None else config.WARMER_MIN_DELAY
+        self.max_delay = max_delay if max_delay is not None else config.WARMER_MAX_DELAY
         self.repeat_count = repeat_count or config.WARMER_REPEAT_COUNT
         self.timeout = timeout or config.WARMER_REQUEST_TIMEOUT
+        # Процессы прогрева: > 1 - URL делятся между процессами, у каждого свой event loop
+        self.processes = processes or config.WARMER_PROCESSES
+        # Условные запросы с валидаторами прошлого ответа (см. app.core.revalidation)
+        self.revalidate = revalidate if revalidate is not None else config.WARMER_REVALIDATE
+        # Повторные проходы только по еще не горячим URL (см. app.core.warm_baseline)
+        self.verify_hot = verify_hot if verify_hot is not None else config.WARMER_VERIFY_HOT
+        
+        self._executor: Optional[ProcessPoolExecutor] = None
     
     async def warm_url(
         self,
         url: str,
-        client: httpx.AsyncClient,
+        fetcher,
         semaphore: asyncio.Semaphore,
         domain_name: str = "",
-        chunk_num: int = 0
+        chunk_num: int = 0,
+        run_id: int = 0,
+        variant: Optional[Dict[str, Any]] = None,
+        retry_budget: Optional[RetryBudget] = None,
+        deadline: Optional[RunDeadline] = None
     ) -> Dict[str, Any]:
-        """Прогрев одного URL"""
+        """Прогрев одного URL в одном варианте (если его прямо сейчас не греет другой прогрев)"""
+        variant = variant or resolve_variants()[0]
+        result = await url_flights.run(
+            variant_key(url, variant["name"]), run_id, domain_name,
+            lambda: self._fetch_with_retries(
+                url, fetcher, semaphore, domain_name, chunk_num, variant, retry_budget, deadline
+            ),
+        )
+        result["url"] = url
+        result["variant"] = variant["name"]
+        return result
+    
+    async def _fetch_with_retries(
+        self,
+        url: str,
+        fetcher,
+        semaphore: asyncio.Semaphore,
+        domain_name: str = "",
+        chunk_num: int = 0,
+        variant: Optional[Dict[str, Any]] = None,
+        retry_budget: Optional[RetryBudget] = None,
+        deadline: Optional[RunDeadline] = None
+    ) -> Dict[str, Any]:
+        """Запрос URL с повторами временных сбоев (см. app.core.retry)"""
+        attempt = 0
+        while True:
+            result = await self._fetch_url(url, fetcher, semaphore, domain_name, chunk_num, variant, deadline)
+            delay = retry_delay(result, attempt)
+            if delay is None:
+                break
+            # Повтор не успеет до срока прогрева
+            if deadline is not None and deadline.remaining() < delay:
+                break
+            
+            reason = str(result.get("status_code") or result["status"])
+            if retry_budget is None or not retry_budget.try_acquire():
+                warm_retries.inc(domain=domain_name, reason="budget_exhausted")
+                result["retry_denied"] = True
+                break
+            
+            warm_retries.inc(domain=domain_name, reason=reason)
+            attempt += 1
+            logger.info(
+                "🔁 Retry %d for %s in %.1fs (%s)", attempt, url, delay, reason,
+                extra={"domain": domain_name, "url": url, "attempt": attempt, "reason": reason},
+            )
+            # Ждем вне семафора: слот конкурентности достается другим URL
+            await asyncio.sleep(delay)
+        
+        result["retries"] = attempt
+        return result
+    
+    async def _fetch_url(
+        self,
+        url: str,
+        fetcher,
+        semaphore: asyncio.Semaphore,
+        domain_name: str = "",
+        chunk_num: int = 0,
+        variant: Optional[Dict[str, Any]] = None,
+        deadline: Optional[RunDeadline] = None
+    ) -> Dict[str, Any]:
+        """Запрос URL с заголовками варианта"""
+        variant = variant or resolve_variants()[0]
+        key = variant_key(url, variant["name"])
+        breaker = circuit_breakers.get(url) if circuit_breakers.enabled else None
+        wait_started = asyncio.get_running_loop().time()
         async with semaphore:
+            warm_semaphore_wait.observe(asyncio.get_running_loop().time() - wait_started)
+            # Срок прогрева вышел, пока запрос ждал слот
+            if deadline is not None and deadline.expired():
+                return {"url": url, "status": "skipped", "elapsed": 0.0}
+            # Сайт не отвечает (breaker разомкнут) - запрос не выполняем
+            if breaker is not None and not breaker.allow_request():
+                return {"url": url, "status": "shed", "elapsed": 0.0}
+            
+            warm_requests_in_flight.inc()
             start_time = datetime.utcnow()
+            circuit_opened = False
             
             try:
-                response = await client.get(
-                    url,
-                    timeout=self.timeout,
-                    follow_redirects=True,
-                )
+                headers = dict(variant["headers"])
+                revalidate = self.revalidate and fetcher.conditional
+                if revalidate:
+                    headers.update(validator_store.conditional_headers(key))
+                response = await fetcher.fetch(url, headers, self.timeout)
+                status_code = response["status_code"]
                 
                 elapsed = (datetime.utcnow() - start_time).total_seconds()
+                verdict = cache_verdict(response["headers"])
+                warm_requests.inc(domain=domain_name, status=status_code, cache=verdict, variant=variant["name"])
+                # Ошибки сайта (4xx/5xx) повторным проходом не прогреть
+                hot = warm_baselines.check(key, verdict, elapsed) if status_code < 400 else True
+                warm_request_duration.observe(elapsed, domain=domain_name)
+                if breaker is not None:
+                    # 5xx - сайт (или его origin за CDN) не справляется
+                    if status_code >= 500:
+                        circuit_opened = breaker.record_failure()
+                    else:
+                        breaker.record_success()
                 
-                # Улучшенное логирование с указанием домена и chunk
-                prefix = f"[{domain_name}]" if domain_name else ""
-                chunk_info = f" [Chunk {chunk_num}]" if chunk_num > 0 else ""
-                logger.info(
-                    f"✅{prefix}{chunk_info} Warmed {url} | Status: {response.status_code} | Time: {elapsed:.2f}s"
-                )
+                bytes_received = response["bytes"]
+                bytes_saved = 0
+                if revalidate:
+                    if status_code == 304:
+                        bytes_saved = max(0, validator_store.body_size(key) - bytes_received)
+                    validator_store.update(key, status_code, response["headers"], bytes_received)
+                warm_bytes.inc(bytes_received, domain=domain_name, kind="received")
+                if bytes_saved:
+                    warm_bytes.inc(bytes_saved, domain=domain_name, kind="saved")
+                
+                # Успешные запросы - в лог выборочно (WARMER_LOG_SAMPLE_RATE), все они есть в метриках
+                if logger.isEnabledFor(logging.INFO) and sampled():
+                    logger.info(
+                        "✅%s%s%s Warmed %s | Status: %s | Time: %.2fs",
+                        f"[{domain_name}]" if domain_name else "",
+                        f" [Chunk {chunk_num}]" if chunk_num > 0 else "",
+                        f" [{variant['name']}]" if variant["name"] != DEFAULT_VARIANT else "",
+                        url, status_code, elapsed,
+                        extra={
+                            "domain": domain_name, "url": url, "variant": variant["name"], "chunk": chunk_num,
+                            "status_code": status_code, "elapsed": round(elapsed, 3), "cache": verdict,
+                        },
+                    )
                 
                 return {
                     "url": url,
                     "status": "success",
-                    "status_code": response.status_code,
+                    "status_code": status_code,
                     "elapsed": elapsed,
+                    "bytes": bytes_received,
+                    "bytes_saved": bytes_saved,
+                    "circuit_opened": circuit_opened,
+                    "retry_after": retry_after_seconds(response["headers"]) if status_code == 429 else None,
+                    "cache": verdict,
+                    "hot": hot,
                 }
                 
-            except httpx.TimeoutException:
+            except (httpx.TimeoutException, FetchTimeout) as e:
                 elapsed = (datetime.utcnow() - start_time).total_seconds()
-                logger.warning(f"⏱ Timeout for {url} after {elapsed:.2f}s")
+                warm_requests.inc(domain=domain_name, status="timeout", cache="unknown", variant=variant["name"])
+                logger.warning(
+                    "⏱ Timeout for %s after %.2fs", url, elapsed,
+                    extra={"domain": domain_name, "url": url, "variant": variant["name"], "elapsed": round(elapsed, 3)},
+                )
+                if breaker is not None:
+                    circuit_opened = breaker.record_failure()
                 
                 return {
                     "url": url,
                     "status": "timeout",
                     "elapsed": elapsed,
+                    "circuit_opened": circuit_opened,
+                    # Сайт не принял соединение - запрос не дошел, повтор безопасен
+                    "retryable": isinstance(e, httpx.ConnectTimeout),
+                    # Ответа нет - URL не прогрет, следующий проход запросит его снова
+                    "hot": False,
                 }
                 
             except Exception as e:
                 elapsed = (datetime.utcnow() - start_time).total_seconds()
-                logger.error(f"❌ Error warming {url}: {str(e)}")
+                warm_requests.inc(domain=domain_name, status="error", cache="unknown", variant=variant["name"])
+                logger.error(
+                    "❌ Error warming %s: %s", url, e,
+                    extra={"domain": domain_name, "url": url, "variant": variant["name"], "error": str(e)},
+                )
+                if breaker is not None:
+                    circuit_opened = breaker.record_failure()
                 
                 return {
                     "url": url,
                     "status": "error",
                     "error": str(e),
                     "elapsed": elapsed,
+                    "circuit_opened": circuit_opened,
+                    "retryable": isinstance(e, RETRYABLE_ERRORS),
+                    "hot": False,
                 }
             
             finally:
-                # Случайная задержка между запросами
+                if breaker is not None:
+                    # Прогрев отменен посреди пробного запроса - проба снова доступна
+                    breaker.release()
+                if circuit_opened:
+                    logger.warning(
+                        f"🔌 Circuit opened for {breaker.origin}: {breaker.consecutive_failures} failures in a row, "
+                        f"shedding requests for {breaker.recovery_seconds:.0f}s"
+                    )
+                warm_requests_in_flight.dec()
+                # Случайная задержка между запросами (под срок прогрева - сокращенная)
                 delay = random.uniform(self.min_delay, self.max_delay)
-                await asyncio.sleep(delay)
+                if deadline is not None:
+                    delay = 0.0 if deadline.expired() else delay * deadline.delay_scale
+                if delay > 0:
+                    await asyncio.sleep(delay)
     
     async def warm_chunk(
         self,
         urls: List[str],
-        client: httpx.AsyncClient,
+        fetcher,
         semaphore: asyncio.Semaphore,
         chunk_num: int,
         total_chunks: int,
-        domain_name: str = ""
+        domain_name: str = "",
+        run_id: int = 0,
+        variants: Optional[List[Dict[str, Any]]] = None,
+        retry_budget: Optional[RetryBudget] = None,
+        deadline: Optional[RunDeadline] = None
     ) -> List[Dict[str, Any]]:
-        """Прогрев одного чанка URL"""
+        """Прогрев одного чанка URL во всех вариантах"""
+        variants = variants or resolve_variants()
         start_time = datetime.utcnow()
         prefix = f"[{domain_name}] " if domain_name else ""
-        logger.info(f"📦 {prefix}Chunk {chunk_num}/{total_chunks}: START warming {len(urls)} URLs ({self.repeat_count} repeats)")
+        repeat_count = deadline.repeat_count if deadline is not None else self.repeat_count
+        logger.info(f"📦 {prefix}Chunk {chunk_num}/{total_chunks}: START warming {len(urls)} URLs ({repeat_count} repeats)")
         
         chunk_results = []
         
-        for repeat in range(self.repeat_count):
-            logger.info(f"📦 {prefix}Chunk {chunk_num}/{total_chunks}: repeat {repeat + 1}/{self.repeat_count}")
+        # Пары URL x вариант для очередного прохода
+        pending = [(url, variant) for url in urls for variant in variants]
+        for repeat in range(repeat_count):
+            # Повторный проход начинаем, только если он успевает до срока
+            if repeat > 0 and deadline is not None and not deadline.fits(len(pending)):
+                logger.info(f"⌛ {prefix}Chunk {chunk_num}/{total_chunks}: repeat {repeat + 1} dropped, deadline is near")
+                deadline.repeats_dropped = max(deadline.repeats_dropped, self.repeat_count - repeat)
+                break
+            logger.info(
+                "📦 %sChunk %d/%d: repeat %d/%d (%d requests)",
+                prefix, chunk_num, total_chunks, repeat + 1, repeat_count, len(pending),
+            )
             tasks = [
-                self.warm_url(url, client, semaphore, domain_name, chunk_num)
-                for url in urls
+                self.warm_url(url, fetcher, semaphore, domain_name, chunk_num, run_id, variant, retry_budget, deadline)
+                for url, variant in pending
             ]
             results = await asyncio.gather(*tasks)
+            for result in results:
+                result["repeat"] = repeat
             chunk_results.extend(results)
+            
+            if self.verify_hot:
+                # Следующий проход - только по URL, которые еще не горячие (пропущенные
+                # по сроку и отсеченные breaker не повторяются: их остановил не кэш)
+                pending = [pair for pair, result in zip(pending, results) if _is_cold(result)]
+                if not pending:
+                    break
         
         elapsed = (datetime.utcnow() - start_time).total_seconds()
         logger.info(f"✅ {prefix}Chunk {chunk_num}/{total_chunks} COMPLETED in {elapsed:.1f}s")
         return chunk_results
     
-    async def warm_site(self, urls: List[str], domain_name: str = "") -> Dict[str, Any]:
+    async def warm_site(
+        self,
+        urls: List[str],
+        domain_name: str = "",
+        variants: Optional[List[str]] = None,
+        fetcher: Optional[str] = None,
+        deadline_seconds: Optional[float] = None
+    ) -> Dict[str, Any]:
         """
         Прогрев всех URL сайта с автоматическим разбиением на части
         
         Если URL много (> WARMER_CHUNK_SIZE), разбивает их на части
         и прогревает параллельно для ускорения и предотвращения "остывания"
-        первых страниц.
+        первых страниц. При WARMER_PROCESSES > 1 крупные сайты (от
+        WARMER_PROCESS_MIN_URLS) прогреваются сразу несколькими процессами.
+        
+        variants - имена профилей вариантов кэша (app.core.variants): каждый
+        URL запрашивается в каждом варианте через общий пул соединений.
+        
+        fetcher - способ запроса (app.core.fetchers): None/"http" - httpx,
+        "browser" - навигация headless Chromium.
+        
+        Повторные проходы (до WARMER_REPEAT_COUNT) - только по URL, которые
+        еще не горячие (app.core.warm_baseline), при verify_hot=False - по всем.
+        
+        deadline_seconds - срок прогрева (app.core.deadline): темп подбирается
+        под срок, URL идут по приоритету, не успевшие к сроку пропускаются.
         """
+        profiles = resolve_variants(variants)
+        if deadline_seconds is not None:
+            urls = priority_order(urls, domain_name)
         # Засекаем время начала
         started_at = datetime.utcnow()
         
-        chunk_size = config.WARMER_CHUNK_SIZE
-        total_urls = len(urls)
+        warmings_active.inc()
+        try:
+            if self.processes > 1 and len(urls) >= config.WARMER_PROCESS_MIN_URLS:
+                partial = await self._warm_sharded(urls, domain_name, profiles, fetcher, deadline_seconds)
+            else:
+                partial = await self._warm_partial(urls, domain_name, profiles, fetcher, deadline_seconds)
+        finally:
+            warmings_active.dec()
+        
+        # Засекаем время окончания
+        completed_at = datetime.utcnow()
+        
+        total_requests = partial["total_requests"]
+        avg_time = partial["total_time"] / total_requests if total_requests else 0
+        min_time = partial["min_time"]
+        max_time = partial["max_time"]
+        if total_requests:
+            request_times.observe(domain_name, avg_time)
+        
+        deadline = partial["deadline"]
+        if deadline is not None:
+            coverage = deadline["covered"] / deadline["planned"] if deadline["planned"] else 1.0
+            warm_deadline_coverage.set(coverage, domain=domain_name)
+            deadline = {
+                "seconds": round(deadline["seconds"], 1),
+                "met": deadline["finished_in_time"] and not deadline["skipped"],
+                "coverage": round(coverage, 4),
+                "skipped": deadline["skipped"],
+                "repeats_dropped": deadline["repeats_dropped"],
+                "delay_scale": round(deadline["delay_scale"], 2),
+            }
+        
+        stats = {
+            "started_at": started_at,
+            "completed_at": completed_at,
+            "total_requests": total_requests,
+            "deduplicated": partial["deduplicated"],
+            "joined_failed": partial["joined_failed"],
+            "shed": partial["shed"],
+            "circuit_opened": partial["circuit_opened"],
+            "success": partial["success"],
+            "timeout": partial["timeout"],
+            "error": partial["error"],
+            "revalidated": partial["revalidated"],
+            "retries": partial["retries"],
+            "retried_success": partial["retried_success"],
+            "retries_denied": partial["retries_denied"],
+            "repeat_requests": partial["repeat_requests"],
+            "still_cold": partial["still_cold"],
+            "bytes_received": partial["bytes_received"],
+            "bytes_saved": partial["bytes_saved"],
+            "total_time": round(partial["total_time"], 2),
+            "avg_time": round(avg_time, 2),
+            "min_time": round(min_time, 2) if min_time else None,
+            "max_time": round(max_time, 2) if max_time else None,
+            "variants": {
+                name: {
+                    "total_requests": entry["total_requests"],
+                    "success": entry["success"],
+                    "timeout": entry["timeout"],
+                    "error": entry["error"],
+                    "avg_time": round(entry["total_time"] / entry["total_requests"], 2) if entry["total_requests"] else 0,
+                }
+                for name, entry in partial["variants"].items()
+            },
+            "deadline": deadline,
+        }
         
         logger.info(
-            f"🔥 Starting warming {total_urls} URLs with {self.repeat_count} repeat(s) "
-            f"(chunk size: {chunk_size})"
+            f"✨ Warming completed | "
+            f"Success: {stats['success']} | "
+            f"Timeout: {stats['timeout']} | "
+            f"Error: {stats['error']} | "
+            f"Deduplicated: {stats['deduplicated']} | "
+            f"Shed: {stats['shed']} | "
+            f"Avg time: {avg_time:.2f}s"
         )
+        if deadline is not None:
+            logger.info(
+                f"⌛ Deadline {deadline['seconds']:.0f}s {'met' if deadline['met'] else 'MISSED'} | "
+                f"Coverage: {deadline['coverage']:.1%} | "
+                f"Skipped: {deadline['skipped']} | "
+                f"Repeats dropped: {deadline['repeats_dropped']}"
+            )
+        
+        return stats
+    
+    async def _warm_partial(
+        self,
+        urls: List[str],
+        domain_name: str = "",
+        variants: Optional[List[Dict[str, Any]]] = None,
+        fetcher: Optional[str] = None,
+        deadline_seconds: Optional[float] = None,
+        request_seconds: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """Прогрев URL в текущем event loop, результат - компактная сводка"""
+        variants = variants or resolve_variants()
+        chunk_size = config.WARMER_CHUNK_SIZE
+        total_urls = len(urls)
+        run_id = next(_run_ids)
         
         # Разбиваем на чанки
-        chunks = [urls[i:i + chunk_size] for i in range(0, len(urls), chunk_size)]
-        total_chunks = len(chunks)
+        total_chunks = -(-total_urls // chunk_size)
+        if deadline_seconds is None:
+            chunks = [urls[i:i + chunk_size] for i in range(0, len(urls), chunk_size)]
+        else:
+            # URL отсортированы по приоритету: через один по чанкам, чтобы важные
+            # страницы всех чанков шли первыми
+            chunks = [urls[i::total_chunks] for i in range(total_chunks)]
+        
+        # Создаем отдельный semaphore для КАЖДОГО chunk'а
+        # Это позволит каждому chunk'у работать независимо с полной конкурентностью
+        chunk_concurrency = self.concurrency if total_chunks == 1 else max(3, self.concurrency // total_chunks)
+        
+        deadline = None
+        repeat_count = self.repeat_count
+        if deadline_seconds is not None:
+            request_seconds = request_seconds or request_times.estimate(domain_name)
+            delay_scale, repeat_count = plan_run(
+                deadline_seconds,
+                total_urls * len(variants),
+                self.repeat_count,
+                chunk_concurrency * max(1, total_chunks),
+                request_seconds,
+                (self.min_delay + self.max_delay) / 2,
+            )
+            deadline = RunDeadline(deadline_seconds, chunk_concurrency, request_seconds, delay_scale, repeat_count)
+            deadline.repeats_dropped = self.repeat_count - repeat_count
+            if delay_scale < 1 or repeat_count < self.repeat_count:
+                logger.warning(
+                    f"⌛ [{domain_name}] Deadline {deadline_seconds:.0f}s at risk "
+                    f"(~{request_seconds:.2f}s per request): delays x{delay_scale:.2f}, "
+                    f"{repeat_count}/{self.repeat_count} repeat(s), warming by priority"
+                )
+        # Бюджет повторов - от всех запросов прогрева (URL x варианты x повторы)
+        retry_budget = RetryBudget(total_urls * len(variants) * repeat_count)
+        
+        logger.info(
+            f"🔥 Starting warming {total_urls} URLs with {repeat_count} repeat(s) "
+            f"(chunk size: {chunk_size}, variants: {', '.join(v['name'] for v in variants)})"
+        )
         
         if total_chunks > 1:
             logger.info(f"📦 Split into {total_chunks} chunks for parallel warming")
         
         all_results = []
         
-        # Создаем отдельный semaphore для КАЖДОГО chunk'а
-        # Это позволит каждому chunk'у работать независимо с полной конкурентностью
-        chunk_concurrency = self.concurrency if total_chunks == 1 else max(3, self.concurrency // total_chunks)
         logger.info(f"⚙️ Each chunk will use concurrency: {chunk_concurrency}")
         
-        async with httpx.AsyncClient(
-            headers={
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-            }
-        ) as client:
+        # Один fetcher (пул соединений или вкладок браузера) на все чанки и варианты
+        async with self._create_fetcher(fetcher) as fetcher_instance:
             # Запускаем прогрев всех чанков параллельно
             prefix = f"[{domain_name}] " if domain_name else ""
             logger.info(f"🚀 {prefix}Launching {total_chunks} chunks in PARALLEL...")
@@ -166,11 +730,15 @@ class SiteWarmer:
             chunk_tasks = [
                 self.warm_chunk(
                     chunk, 
-                    client, 
+                    fetcher_instance, 
                     asyncio.Semaphore(chunk_concurrency),  # Отдельный semaphore!
                     i + 1, 
                     total_chunks, 
-                    domain_name
+                    domain_name,
+                    run_id,
+                    variants,
+                    retry_budget,
+                    deadline
                 )
                 for i, chunk in enumerate(chunks)
             ]
@@ -184,44 +752,89 @@ class SiteWarmer:
             for chunk_results in chunks_results:
                 all_results.extend(chunk_results)
         
-        # Засекаем время окончания
-        completed_at = datetime.utcnow()
-        
-        # Подсчет статистики
-        success_count = sum(1 for r in all_results if r["status"] == "success")
-        timeout_count = sum(1 for r in all_results if r["status"] == "timeout")
-        error_count = sum(1 for r in all_results if r["status"] == "error")
-        
-        total_time = sum(r["elapsed"] for r in all_results)
-        avg_time = total_time / len(all_results) if all_results else 0
-        
-        # Время ответа только успешных запросов
-        response_times = [r["elapsed"] for r in all_results if r["status"] == "success"]
-        min_time = min(response_times) if response_times else None
-        max_time = max(response_times) if response_times else None
+        if deadline is None:
+            return _partial_stats(all_results)
+        return _partial_stats(all_results, _deadline_stats(all_results, deadline, total_urls * len(variants)))
+    
+    def _create_fetcher(self, name: Optional[str] = None):
+        """Способ запроса страниц для прогрева"""
+        return create_fetcher(name)
+    
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """Пул процессов прогрева (создается при первом использовании)"""
+        if self._executor is None:
+            # spawn: дочерние процессы не наследуют event loop и соединения родителя
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.processes,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_shard_process,
+            )
+            logger.info(f"Started warming process pool with {self.processes} processes")
+        return self._executor
+    
+    async def _warm_sharded(
+        self,
+        urls: List[str],
+        domain_name: str = "",
+        variants: Optional[List[Dict[str, Any]]] = None,
+        fetcher: Optional[str] = None,
+        deadline_seconds: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        Прогрев URL несколькими процессами
         
-        stats = {
-            "started_at": started_at,
-            "completed_at": completed_at,
-            "total_requests": len(all_results),
-            "success": success_count,
-            "timeout": timeout_count,
-            "error": error_count,
-            "total_time": round(total_time, 2),
-            "avg_time": round(avg_time, 2),
-            "min_time": round(min_time, 2) if min_time else None,
-            "max_time": round(max_time, 2) if max_time else None,
+        URL раскладываются по процессам через один, каждый процесс прогревает свою
+        часть в своем event loop и возвращает только сводку. Общая конкурентность
+        (нагрузка на сайт) делится между процессами и не растет.
+        """
+        shards = [urls[i::self.processes] for i in range(self.processes)]
+        shards = [shard for shard in shards if shard]
+        settings = {
+            "concurrency": max(1, -(-self.concurrency // len(shards))),
+            "min_delay": self.min_delay,
+            "max_delay": self.max_delay,
+            "repeat_count": self.repeat_count,
+            "timeout": self.timeout,
+            "revalidate": self.revalidate,
+            "verify_hot": self.verify_hot,
         }
         
-        logger.info(
-            f"✨ Warming completed | "
-            f"Success: {success_count} | "
-            f"Timeout: {timeout_count} | "
-            f"Error: {error_count} | "
-            f"Avg time: {avg_time:.2f}s"
-        )
+        prefix = f"[{domain_name}] " if domain_name else ""
+        logger.info(f"🧩 {prefix}Sharding {len(urls)} URLs across {len(shards)} processes")
         
-        return stats
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        variants = variants or resolve_variants()
+        # Оценка времени запроса и состояние прогрева (дедупликация, валидаторы,
+        # baseline, breaker'ы) копятся в основном процессе
+        request_seconds = request_times.estimate(domain_name)
+        breaker_failures = -(-circuit_breakers.failure_threshold // len(shards))
+        shared = [
+            dict(_export_shared_state(shard, variants), breaker_failures=breaker_failures)
+            for shard in shards
+        ]
+        parts = await asyncio.gather(*[
+            loop.run_in_executor(
+                executor, _warm_shard, shard, domain_name, settings, variants, fetcher,
+                deadline_seconds, request_seconds, shard_state,
+            )
+            for shard, shard_state in zip(shards, shared)
+        ])
+        breaker_states = []
+        for part in parts:
+            metrics_registry.merge(part.pop("metrics", None))
+            shard_state = part.pop("shared")
+            _load_shared_state(shard_state)
+            breaker_states.append(shard_state["breakers"])
+        circuit_breakers.load(strictest_states(breaker_states))
+        return _merge_partial_stats(parts)
+    
+    def shutdown(self) -> None:
+        """Остановка пула процессов прогрева"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            logger.info("Warming process pool stopped")
 
 
 # Глобальный экземпляр
@@ -3,24 +3,37 @@
 """
 import asyncio
 import logging
-from typing import Dict, Optional, Any
+from typing import Dict, List, Optional, Any
 from datetime import datetime
 
+from app.config import config
 from app.core.warmer import warmer
-from app.core.db import db_manager
+from app.core.db import db_manager, ACTIVE_TASK_STATUSES
+from app.core.history_writer import history_writer
+from app.utils.metrics import warming_queue_depth
 
 logger = logging.getLogger(__name__)
 
 
 class WarmingManager:
-    """Менеджер для параллельного выполнения задач прогрева"""
+    """
+    Менеджер для параллельного выполнения задач прогрева
+    
+    При WARMING_QUEUE_ENABLED прогревы не выполняются в процессе бота:
+    задачи ставятся в очередь в БД (их выполняют воркеры app.worker),
+    а task_info периодически синхронизируется с очередью в sync_queue().
+    """
     
     def __init__(self):
         self.active_tasks: Dict[int, asyncio.Task] = {}  # domain_id -> Task
         self.task_info: Dict[int, Dict[str, Any]] = {}  # domain_id -> info
+        self.queue_enabled = config.WARMING_QUEUE_ENABLED
     
     def is_warming(self, domain_id: int) -> bool:
         """Проверка, идет ли прогрев домена"""
+        if self.queue_enabled:
+            return domain_id in self.task_info
+        
         if domain_id in self.active_tasks:
             task = self.active_tasks[domain_id]
             return not task.done()
@@ -30,10 +43,17 @@ class WarmingManager:
         """Получение количества активных прогревов"""
         # Очищаем завершенные задачи
         self._cleanup_completed_tasks()
+        if self.queue_enabled:
+            return len(self.task_info)
         return len(self.active_tasks)
     
     def _cleanup_completed_tasks(self):
         """Очистка завершенных задач"""
+        if self.queue_enabled:
+            # Состояние очереди обновляется в sync_queue()
+            self.active_tasks.clear()
+            return
+        
         completed = [
             domain_id for domain_id, task in self.active_tasks.items()
             if task.done()
@@ -49,7 +69,9 @@ class WarmingManager:
         domain_name: str,
         urls: list,
         user_id: Optional[int] = None,
-        bot=None
+        bot=None,
+        variants: Optional[List[str]] = None,
+        fetcher: Optional[str] = None
     ) -> bool:
         """
         Запуск прогрева домена в фоновом режиме
@@ -60,6 +82,8 @@ class WarmingManager:
             urls: Список URL для прогрева
             user_id: ID пользователя, запустившего прогрев (для уведомления)
             bot: Экземпляр бота для отправки уведомлений
+            variants: Профили вариантов кэша домена (в режиме очереди воркер берет их из БД)
+            fetcher: Способ запроса ("browser" - headless Chromium), в режиме очереди - из БД
         
         Returns:
             True если прогрев запущен, False если уже идет
@@ -69,9 +93,32 @@ class WarmingManager:
             logger.warning(f"Domain {domain_name} is already being warmed")
             return False
         
+        if self.queue_enabled:
+            # Уведомление отправит sync_queue() по результату из очереди
+            task = await db_manager.enqueue_warming_task(
+                domain_id=domain_id,
+                domain_name=domain_name,
+                urls=urls,
+                warming_type="manual",
+                requested_by=user_id
+            )
+            if task is None:
+                logger.warning(f"Domain {domain_name} already has a queued warming task")
+                return False
+            
+            self.task_info[domain_id] = {
+                "domain_name": domain_name,
+                "start_time": task.created_at,
+                "user_id": user_id,
+                "urls_count": len(urls),
+                "queue_task_id": task.id
+            }
+            logger.info(f"📥 Queued warming task {task.id} for {domain_name} (domain_id={domain_id})")
+            return True
+        
         # Создаем задачу прогрева
         task = asyncio.create_task(
-            self._warm_domain_task(domain_id, domain_name, urls, user_id, bot)
+            self._warm_domain_task(domain_id, domain_name, urls, user_id, bot, variants, fetcher)
         )
         
         self.active_tasks[domain_id] = task
@@ -91,67 +138,27 @@ class WarmingManager:
         domain_name: str,
         urls: list,
         user_id: Optional[int],
-        bot
+        bot,
+        variants: Optional[List[str]] = None,
+        fetcher: Optional[str] = None
     ):
         """Фоновая задача прогрева домена"""
         try:
             logger.info(f"🔥 Warming {domain_name} ({len(urls)} URLs)")
             
             # Выполняем прогрев (передаем имя домена для логирования)
-            stats = await warmer.warm_site(urls, domain_name=domain_name)
+            stats = await warmer.warm_site(urls, domain_name=domain_name, variants=variants, fetcher=fetcher)
             
-            # Сохраняем результаты прогрева в БД
+            # Ставим результат в очередь фоновой записи в БД (не ждем коммита)
             try:
-                await db_manager.save_warming_result(
-                    domain_id=domain_id,
-                    started_at=stats["started_at"],
-                    completed_at=stats["completed_at"],
-                    total_requests=stats["total_requests"],
-                    successful_requests=stats["success"],
-                    failed_requests=stats["error"],
-                    timeout_requests=stats["timeout"],
-                    avg_response_time=stats["avg_time"],
-                    min_response_time=stats["min_time"],
-                    max_response_time=stats["max_time"],
-                    warming_type="manual"
-                )
-                logger.info(f"💾 Saved warming result to database for {domain_name}")
+                await history_writer.submit_warming_result(domain_id, stats, warming_type="manual")
+                logger.info(f"💾 Queued warming result for {domain_name}")
             except Exception as e:
                 logger.error(f"Error saving warming result to DB: {e}", exc_info=True)
             
-            # Формируем отчет
-            success_rate = (stats["success"] / stats["total_requests"] * 100) if stats["total_requests"] > 0 else 0
-            
-            # Определяем эмодзи
-            if success_rate >= 90:
-                status_emoji = "✅"
-            elif success_rate >= 70:
-                status_emoji = "⚠️"
-            else:
-                status_emoji = "❌"
-            
-            message = (
-                f"{status_emoji} <b>Прогрев завершен</b>\n\n"
-                f"🌐 Домен: <b>{domain_name}</b>\n"
-                f"🕒 Время: {datetime.utcnow().strftime('%Y-%m-%d %H:%M UTC')}\n\n"
-                f"📊 <b>Статистика:</b>\n"
-                f"• Всего запросов: <b>{stats['total_requests']}</b>\n"
-                f"• ✅ Успешно: <b>{stats['success']}</b> ({success_rate:.1f}%)\n"
-                f"• ⏱ Таймауты: <b>{stats['timeout']}</b>\n"
-                f"• ❌ Ошибки: <b>{stats['error']}</b>\n"
-                f"• ⏱ Среднее время: <b>{stats['avg_time']:.2f}s</b>"
-            )
-            
             # Отправляем уведомление пользователю, запустившему прогрев
             if bot and user_id:
-                try:
-                    await bot.send_message(
-                        chat_id=user_id,
-                        text=message,
-                        parse_mode="HTML"
-                    )
-                except Exception as e:
-                    logger.error(f"Error sending notification to user {user_id}: {e}")
+                await self._notify_completed(bot, user_id, domain_name, stats)
             
             logger.info(f"✅ Completed warming {domain_name}: {stats}")
             
@@ -160,24 +167,126 @@ class WarmingManager:
             
             # Отправляем уведомление об ошибке
             if bot and user_id:
-                try:
-                    error_message = (
-                        f"❌ <b>Ошибка прогрева</b>\n\n"
-                        f"🌐 Домен: <b>{domain_name}</b>\n"
-                        f"⚠️ Ошибка: {str(e)}"
-                    )
-                    await bot.send_message(
-                        chat_id=user_id,
-                        text=error_message,
-                        parse_mode="HTML"
-                    )
-                except Exception as send_error:
-                    logger.error(f"Error sending error notification: {send_error}")
+                await self._notify_failed(bot, user_id, domain_name, str(e))
         
         finally:
             # Задача завершена, она будет удалена при следующей очистке
             pass
     
+    async def _notify_completed(self, bot, user_id: int, domain_name: str, stats: Dict[str, Any]) -> None:
+        """Уведомление пользователя о завершении прогрева"""
+        success_rate = (stats["success"] / stats["total_requests"] * 100) if stats["total_requests"] > 0 else 0
+        
+        # Определяем эмодзи
+        if success_rate >= 90:
+            status_emoji = "✅"
+        elif success_rate >= 70:
+            status_emoji = "⚠️"
+        else:
+            status_emoji = "❌"
+        
+        message = (
+            f"{status_emoji} <b>Прогрев завершен</b>\n\n"
+            f"🌐 Домен: <b>{domain_name}</b>\n"
+            f"🕒 Время: {datetime.utcnow().strftime('%Y-%m-%d %H:%M UTC')}\n\n"
+            f"📊 <b>Статистика:</b>\n"
+            f"• Всего запросов: <b>{stats['total_requests']}</b>\n"
+            f"• ✅ Успешно: <b>{stats['success']}</b> ({success_rate:.1f}%)\n"
+            f"• ⏱ Таймауты: <b>{stats['timeout']}</b>\n"
+            f"• ❌ Ошибки: <b>{stats['error']}</b>\n"
+            f"• ⏱ Среднее время: <b>{stats['avg_time']:.2f}s</b>"
+        )
+        if stats.get("deduplicated"):
+            message += f"\n• 🔁 Уже прогреты другим прогревом: <b>{stats['deduplicated']}</b>"
+        shed = stats.get("shed")
+        if shed:
+            message += f"\n• 🔌 Сайт не отвечает, пропущено запросов: <b>{shed}</b>"
+        if stats.get("retried_success"):
+            message += f"\n• 🔄 Успешно после повтора: <b>{stats['retried_success']}</b>"
+        if stats.get("still_cold"):
+            message += f"\n• 🧊 Не прогрелись после проверок: <b>{stats['still_cold']}</b>"
+        if stats.get("bytes_saved"):
+            message += (
+                f"\n• ♻️ Ревалидировано (304): <b>{stats['revalidated']}</b>, "
+                f"сэкономлено {stats['bytes_saved'] / 1024 / 1024:.1f} МБ"
+            )
+        variants = stats.get("variants") or {}
+        if len(variants) > 1:
+            message += "\n\n🧬 <b>По вариантам:</b>"
+            for name, variant in variants.items():
+                message += (
+                    f"\n• {name}: ✅ {variant['success']}/{variant['total_requests']}, "
+                    f"⏱ {variant['avg_time']:.2f}s"
+                )
+        
+        try:
+            await bot.send_message(
+                chat_id=user_id,
+                text=message,
+                parse_mode="HTML"
+            )
+        except Exception as e:
+            logger.error(f"Error sending notification to user {user_id}: {e}")
+    
+    async def _notify_failed(self, bot, user_id: int, domain_name: str, error: str) -> None:
+        """Уведомление пользователя об ошибке прогрева"""
+        try:
+            error_message = (
+                f"❌ <b>Ошибка прогрева</b>\n\n"
+                f"🌐 Домен: <b>{domain_name}</b>\n"
+                f"⚠️ Ошибка: {error}"
+            )
+            await bot.send_message(
+                chat_id=user_id,
+                text=error_message,
+                parse_mode="HTML"
+            )
+        except Exception as send_error:
+            logger.error(f"Error sending error notification: {send_error}")
+    
+    async def sync_queue(self, bot=None) -> list:
+        """
+        Синхронизация с очередью прогревов в БД (режим WARMING_QUEUE_ENABLED)
+        
+        Обновляет task_info по незавершенным задачам и отправляет уведомления
+        о разовых прогревах, которые завершили воркеры.
+        
+        Returns:
+            Завершенные задачи автопрогрева (уведомления по ним отправляет планировщик)
+        """
+        abandoned = await db_manager.fail_abandoned_warming_tasks(config.WORKER_MAX_ATTEMPTS)
+        if abandoned:
+            logger.warning(f"⚠️ {abandoned} warming task(s) failed: worker lease expired")
+        
+        active = await db_manager.get_active_warming_tasks()
+        self.task_info = {
+            task.domain_id: {
+                "domain_name": task.domain_name,
+                "start_time": task.started_at or task.created_at,
+                "user_id": task.requested_by,
+                "urls_count": len(task.urls),
+                "queue_task_id": task.id,
+                "status": task.status,
+            }
+            for task in active
+        }
+        for status in ACTIVE_TASK_STATUSES:
+            warming_queue_depth.set(sum(1 for task in active if task.status == status), status=status)
+        
+        finished = await db_manager.get_unnotified_warming_tasks()
+        scheduled = []
+        for task in finished:
+            if task.warming_type != "manual":
+                scheduled.append(task)
+            elif bot and task.requested_by:
+                if task.status == "done":
+                    await self._notify_completed(bot, task.requested_by, task.domain_name, task.result)
+                else:
+                    await self._notify_failed(bot, task.requested_by, task.domain_name, task.error or "unknown error")
+        
+        await db_manager.mark_warming_tasks_notified([task.id for task in finished])
+        return scheduled
+    
     async def stop_warming(self, domain_id: int) -> bool:
         """
         Остановка прогрева домена
@@ -188,6 +297,14 @@ class WarmingManager:
         Returns:
             True если прогрев был остановлен, False если не был запущен
         """
+        if self.queue_enabled:
+            # Воркер увидит отмену при следующем продлении аренды
+            cancelled = await db_manager.cancel_warming_tasks(domain_id)
+            self.task_info.pop(domain_id, None)
+            if cancelled:
+                logger.info(f"⏹ Cancelled queued warming for domain_id={domain_id}")
+            return cancelled > 0
+        
         if domain_id not in self.active_tasks:
             return False
         
@@ -221,7 +338,7 @@ class WarmingManager:
         return info
     
     async def stop_all(self):
-        """Остановка всех прогревов"""
+        """Остановка всех прогревов (задачи в очереди БД не трогаем - их выполняют воркеры)"""
         logger.info("Stopping all warming tasks...")
         
         for domain_id in list(self.active_tasks.keys()):
@@ -6,19 +6,36 @@ import logging
 import signal
 import sys
 
-from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.memory import MemoryStorage
-from aiogram.types import BotCommand, BotCommandScopeDefault
+# Первым: точка отсчета для отчета о времени запуска
+from app.utils.startup import startup_report
 
-from app.config import config
-from app.core.db import db_manager
-from app.core.scheduler import warming_scheduler
+with startup_report.stage("import aiogram"):
+    from aiogram import Bot, Dispatcher
+    from aiogram.fsm.storage.memory import MemoryStorage
+    from aiogram.types import BotCommand, BotCommandScopeDefault
+
+with startup_report.stage("import app.core.db"):
+    from app.config import config
+    from app.core.db import db_manager
+with startup_report.stage("import app.core.history_writer"):
+    from app.core.history_writer import history_writer
+# Планировщик первым загружает прогрев: warming_manager, warmer, логирование
+with startup_report.stage("import app.core.scheduler"):
+    from app.core.scheduler import warming_scheduler
+with startup_report.stage("import app.utils.graph"):
+    from app.utils.graph import graph_generator
+with startup_report.stage("import app.utils.event_loop"):
+    from app.utils.event_loop import install_event_loop_policy, loop_watchdog, report_event_loop
+# Уже загружены импортами выше - отдельный этап показал бы 0 с
 from app.core.warming_manager import warming_manager
+from app.core.warmer import warmer
 from app.utils.logger import setup_logging
+from app.utils.metrics import metrics_server
 
 # Импорт обработчиков
-from app.bot.handlers import start, add_domain, domains, help, status, diagnostics, admin
-from app.bot.middlewares import UserRegistrationMiddleware
+with startup_report.stage("import app.bot.handlers"):
+    from app.bot.handlers import start, add_domain, domains, help, status, diagnostics, admin
+    from app.bot.middlewares import UserRegistrationMiddleware
 
 logger = logging.getLogger(__name__)
 
@@ -31,12 +48,16 @@ class SiteHeaterApp:
         self.dp: Dispatcher = None
         self.shutdown_event = asyncio.Event()
     
-    async def run_migrations(self):
-        """Автоматический запуск миграций Alembic"""
+    def run_migrations(self):
+        """
+        Автоматический запуск миграций Alembic
+        
+        Синхронный: выполняется в отдельном потоке (env.py запускает свой event loop).
+        Alembic импортируется только здесь, чтобы не замедлять импорт приложения.
+        """
         try:
             from alembic.config import Config
             from alembic import command
-            import os
             
             # Получаем путь к alembic.ini
             alembic_cfg = Config("/app/alembic.ini")
@@ -68,6 +89,9 @@ class SiteHeaterApp:
                 BotCommand(command="add_client", description="👥 Добавить клиента"),
                 BotCommand(command="clients", description="👥 Управление клиентами"),
                 BotCommand(command="status", description="📊 Статус прогревов"),
+                BotCommand(command="load_plan", description="📐 План нагрузки"),
+                BotCommand(command="variants", description="🧬 Варианты кэша"),
+                BotCommand(command="render", description="🧭 Прогрев рендерингом"),
                 BotCommand(command="restore_backup", description="💾 Восстановить БД"),
             ]
             
@@ -93,18 +117,35 @@ class SiteHeaterApp:
             sys.exit(1)
         
         # Запуск миграций
-        await asyncio.to_thread(self.run_migrations)
+        with startup_report.stage("alembic migrations"):
+            await asyncio.to_thread(self.run_migrations)
         
         # Инициализация базы данных
         try:
-            await db_manager.init_db()
+            with startup_report.stage("database init"):
+                await db_manager.init_db()
             logger.info("✅ Database initialized")
         except Exception as e:
             logger.error(f"❌ Database initialization error: {e}", exc_info=True)
             sys.exit(1)
         
+        # Фоновая запись результатов прогрева (до запуска планировщика)
+        history_writer.start()
+        
+        # Эндпоинт метрик Prometheus
+        if config.METRICS_ENABLED:
+            try:
+                await metrics_server.start(config.METRICS_HOST, config.METRICS_PORT)
+            except Exception as e:
+                logger.error(f"❌ Metrics server start error: {e}")
+        
+        # Задержка event loop и стеки кода, который его блокирует
+        if config.METRICS_ENABLED or config.LOOP_BLOCK_THRESHOLD_MS > 0:
+            await loop_watchdog.start()
+        
         # Установка команд бота
-        await self.setup_bot_commands()
+        with startup_report.stage("bot commands"):
+            await self.setup_bot_commands()
         
         # Логирование конфигурации уведомлений
         if config.SEND_WARMING_NOTIFICATIONS:
@@ -119,14 +160,18 @@ class SiteHeaterApp:
         try:
             # Устанавливаем экземпляр бота в планировщик для отправки уведомлений
             warming_scheduler.set_bot(self.bot)
-            warming_scheduler.start()
-            await warming_scheduler.reload_jobs()
+            with startup_report.stage("scheduler start"):
+                warming_scheduler.start()
+                await warming_scheduler.reload_jobs()
             logger.info("✅ Scheduler started")
         except Exception as e:
             logger.error(f"❌ Scheduler start error: {e}", exc_info=True)
             sys.exit(1)
         
         logger.info("✨ SiteHeater started successfully!")
+        
+        # Сразу после on_startup aiogram начинает опрос Telegram
+        startup_report.mark_ready(config.STARTUP_TARGET_SECONDS)
     
     async def on_shutdown(self):
         """Действия при остановке"""
@@ -146,6 +191,26 @@ class SiteHeaterApp:
         except Exception as e:
             logger.error(f"Error stopping scheduler: {e}")
         
+        # Остановка пулов процессов (отрисовка графиков, прогрев)
+        graph_generator.shutdown()
+        warmer.shutdown()
+        
+        # Запись оставшихся в очереди результатов (до закрытия БД)
+        try:
+            await history_writer.stop()
+            logger.info("✅ History writer flushed")
+        except Exception as e:
+            logger.error(f"Error flushing history writer: {e}")
+        
+        # Запись накопленных last_activity пользователей
+        try:
+            await db_manager.flush_user_activity()
+        except Exception as e:
+            logger.error(f"Error flushing user activity: {e}")
+        
+        await loop_watchdog.stop()
+        await metrics_server.stop()
+        
         # Закрытие соединения с БД
         try:
             await db_manager.close()
@@ -173,9 +238,6 @@ class SiteHeaterApp:
     
     async def run(self):
         """Запуск бота"""
-        # Настройка логирования
-        setup_logging()
-        
         # Создание бота и диспетчера
         self.bot = Bot(token=config.TELEGRAM_BOT_TOKEN)
         self.dp = Dispatcher(storage=MemoryStorage())
@@ -199,8 +261,12 @@ class SiteHeaterApp:
             await self.bot.session.close()
 
 
-async def main():
-    """Точка входа"""
+async def main(event_loop: str = "asyncio"):
+    """Точка входа (event_loop - результат install_event_loop_policy)"""
+    # Настройка логирования
+    setup_logging()
+    report_event_loop(event_loop)
+    
     app = SiteHeaterApp()
     
     # Обработка сигналов для graceful shutdown
@@ -218,5 +284,5 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    asyncio.run(main(install_event_loop_policy()))
 
@@ -4,8 +4,8 @@
 from datetime import datetime
 from typing import List, Optional
 
-from sqlalchemy import String, Integer, BigInteger, Boolean, DateTime, ForeignKey, Text, Float
-from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
+from sqlalchemy import String, Integer, BigInteger, Boolean, DateTime, ForeignKey, Text, Float, JSON, UniqueConstraint, Index
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship, declared_attr
 
 
 class Base(DeclarativeBase):
@@ -24,6 +24,10 @@ class Domain(Base):
     user_id: Mapped[int] = mapped_column(Integer, nullable=False, index=True)  # Админ, который добавил домен
     client_id: Mapped[Optional[int]] = mapped_column(BigInteger, ForeignKey("users.id", ondelete="SET NULL"), nullable=True, index=True)  # Клиент, которому принадлежит домен
     url_group: Mapped[int] = mapped_column(Integer, default=3, nullable=False)  # 1=главная, 2=основные, 3=все
+    warming_variants: Mapped[Optional[list]] = mapped_column(JSON, nullable=True)  # Профили вариантов кэша (None = desktop)
+    render_warming: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)  # Прогрев через headless-браузер
+    asset_urls: Mapped[Optional[list]] = mapped_column(JSON, nullable=True)  # Статика для прогрева (CSS, JS, изображения)
+    assets_discovered_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
     
     # Relationships
     urls: Mapped[List["URL"]] = relationship("URL", back_populates="domain", cascade="all, delete-orphan")
@@ -61,6 +65,7 @@ class Job(Base):
     active_url_group: Mapped[int] = mapped_column(Integer, default=3, nullable=False)  # Группа URL для автопрогрева
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
     last_run: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    next_run: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)  # Плановый запуск (для восстановления расписания после рестарта)
     
     # Relationships
     domain: Mapped["Domain"] = relationship("Domain", back_populates="jobs")
@@ -107,9 +112,14 @@ class PendingClient(Base):
 class WarmingHistory(Base):
     """Модель истории прогревов для статистики"""
     __tablename__ = "warming_history"
+    __table_args__ = (
+        # Все выборки истории идут по домену + диапазону started_at.
+        # Отдельный индекс по domain_id не нужен: его покрывает левый префикс составного
+        Index("ix_warming_history_domain_started", "domain_id", "started_at"),
+    )
     
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    domain_id: Mapped[int] = mapped_column(Integer, ForeignKey("domains.id", ondelete="CASCADE"), nullable=False, index=True)
+    domain_id: Mapped[int] = mapped_column(Integer, ForeignKey("domains.id", ondelete="CASCADE"), nullable=False)
     
     # Временные метки
     started_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, index=True)
@@ -135,3 +145,105 @@ class WarmingHistory(Base):
     def __repr__(self) -> str:
         return f"<WarmingHistory(id={self.id}, domain_id={self.domain_id}, avg_time={self.avg_response_time}s)>"
 
+
+
+class WarmingRollupMixin:
+    """
+    Общие поля агрегатов истории прогревов
+
+    Одна строка = один домен за один интервал (час или сутки).
+    Агрегаты поддерживаются инкрементально при сохранении результата
+    прогрева и пересчитываются периодической задачей компактизации,
+    поэтому долгие периоды статистики не требуют чтения сырых записей.
+    """
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    domain_id: Mapped[int] = mapped_column(Integer, ForeignKey("domains.id", ondelete="CASCADE"), nullable=False)
+    bucket_start: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+    # Количество прогревов и запросов за интервал
+    warmings_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    total_requests: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    successful_requests: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    failed_requests: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    timeout_requests: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+    # Время ответа (в секундах): сумма средних по прогревам, минимум/максимум и скетч квантилей
+    response_time_sum: Mapped[float] = mapped_column(Float, default=0.0, nullable=False)
+    min_response_time: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    max_response_time: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    latency_sketch: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)
+
+    @declared_attr.directive
+    def __table_args__(cls):
+        return (UniqueConstraint("domain_id", "bucket_start", name=f"uq_{cls.__tablename__}_domain_bucket"),)
+
+    # Совместимость с WarmingHistory для графиков и статистики
+    @property
+    def started_at(self) -> datetime:
+        return self.bucket_start
+
+    @property
+    def avg_response_time(self) -> float:
+        return self.response_time_sum / self.warmings_count if self.warmings_count else 0.0
+
+
+class WarmingHistoryHourly(WarmingRollupMixin, Base):
+    """Часовые агрегаты истории прогревов"""
+    __tablename__ = "warming_history_hourly"
+
+    def __repr__(self) -> str:
+        return f"<WarmingHistoryHourly(domain_id={self.domain_id}, bucket={self.bucket_start}, warmings={self.warmings_count})>"
+
+
+class WarmingHistoryDaily(WarmingRollupMixin, Base):
+    """Дневные агрегаты истории прогревов"""
+    __tablename__ = "warming_history_daily"
+
+    def __repr__(self) -> str:
+        return f"<WarmingHistoryDaily(domain_id={self.domain_id}, bucket={self.bucket_start}, warmings={self.warmings_count})>"
+
+
+class WarmingTask(Base):
+    """
+    Задача прогрева в очереди БД (для отдельных процессов-воркеров)
+
+    Бот ставит задачу, воркер забирает ее через SELECT ... FOR UPDATE SKIP LOCKED
+    и продлевает аренду (lease_expires_at) пока работает. Задача с истекшей
+    арендой (воркер упал) снова доступна другим воркерам.
+    """
+    __tablename__ = "warming_tasks"
+    __table_args__ = (
+        Index("ix_warming_tasks_status_available", "status", "available_at"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    domain_id: Mapped[int] = mapped_column(Integer, ForeignKey("domains.id", ondelete="CASCADE"), nullable=False, index=True)
+    job_id: Mapped[Optional[int]] = mapped_column(Integer, ForeignKey("jobs.id", ondelete="SET NULL"), nullable=True)
+    domain_name: Mapped[str] = mapped_column(String(255), nullable=False)
+    urls: Mapped[list] = mapped_column(JSON, nullable=False)
+
+    # Тип прогрева: "manual" (разовый) или "scheduled" (автоматический)
+    warming_type: Mapped[str] = mapped_column(String(50), default="manual", nullable=False)
+    requested_by: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True)  # Кому отправить уведомление
+
+    # pending -> running -> done / failed / cancelled
+    status: Mapped[str] = mapped_column(String(20), default="pending", nullable=False)
+    attempts: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    worker_id: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    available_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)  # Не раньше этого времени
+    started_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    lease_expires_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    completed_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    # Срок автопрогрева (app.core.deadline), None - без срока
+    deadline_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+
+    # Статистика прогрева (SiteWarmer.warm_site) или текст ошибки
+    result: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)
+    error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    notified: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<WarmingTask(id={self.id}, domain_id={self.domain_id}, status={self.status}, worker={self.worker_id})>"
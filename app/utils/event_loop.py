@@ -0,0 +1,151 @@
+"""
+Event loop: выбор реализации и сторожевой поток
+
+Бот, планировщик, прогрев и диагностика работают в одном event loop, поэтому
+любой синхронный вызов (matplotlib, BeautifulSoup, subprocess, тяжелый
+цикл) останавливает всех сразу.
+
+EVENT_LOOP=uvloop - loop на libuv (pip install uvloop): быстрее переключает
+задачи и работает с сокетами. Без установленного пакета остается asyncio.
+
+LoopWatchdog замеряет задержку loop (насколько позже запланированного
+просыпается таймер) в метрику event_loop_lag. При LOOP_BLOCK_THRESHOLD_MS > 0
+отдельный поток следит за тактами loop: если такт опаздывает больше чем на
+порог, loop занят синхронным кодом прямо сейчас - поток снимает стек потока
+loop (sys._current_frames) и пишет его в лог. Функция, на которой стоял loop,
+уходит в метрику event_loop_blocked.
+"""
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+
+from app.config import config
+from app.utils.metrics import event_loop_blocked, event_loop_lag
+
+logger = logging.getLogger(__name__)
+
+# Код приложения - по нему подписывается блокировка в метрике
+_APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def install_event_loop_policy() -> str:
+    """
+    Политика event loop по EVENT_LOOP (вызывается до asyncio.run)
+
+    Логирование в этот момент еще не настроено, поэтому результат выбора
+    пишется в лог позже - report_event_loop() из main().
+
+    Returns:
+        Имя используемой реализации
+    """
+    if config.EVENT_LOOP != "uvloop":
+        return "asyncio"
+    try:
+        import uvloop
+    except ImportError:
+        return "asyncio"
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return "uvloop"
+
+
+def report_event_loop(implementation: str) -> None:
+    """Предупреждение, если EVENT_LOOP=uvloop не удалось включить (после setup_logging)"""
+    if config.EVENT_LOOP == "uvloop" and implementation != "uvloop":
+        logger.warning("EVENT_LOOP=uvloop, but uvloop is not installed (pip install uvloop), using asyncio")
+
+
+def _blocking_function(frame) -> str:
+    """Самая глубокая функция приложения в стеке (иначе - самая глубокая вообще)"""
+    innermost = None
+    while frame is not None:
+        code = frame.f_code
+        if innermost is None:
+            innermost = code
+        if code.co_filename.startswith(_APP_DIR):
+            return f"{os.path.relpath(code.co_filename, os.path.dirname(_APP_DIR))}:{code.co_name}"
+        frame = frame.f_back
+    return f"{os.path.basename(innermost.co_filename)}:{innermost.co_name}" if innermost else "unknown"
+
+
+class LoopWatchdog:
+    """Задержка event loop и стеки блокирующего кода"""
+
+    def __init__(self, interval: float = 0.5, block_threshold_ms: Optional[int] = None):
+        self.interval = interval
+        threshold_ms = block_threshold_ms if block_threshold_ms is not None else config.LOOP_BLOCK_THRESHOLD_MS
+        self.block_threshold = threshold_ms / 1000
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._loop_thread_id: Optional[int] = None
+        # Время последнего такта loop (time.monotonic)
+        self._beat = 0.0
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        if self.block_threshold > 0:
+            # Такты чаще порога: иначе короткая блокировка между тактами не видна
+            self.interval = min(self.interval, self.block_threshold / 2)
+        self._beat = time.monotonic()
+        self._task = asyncio.create_task(self._heartbeat())
+
+        if self.block_threshold > 0:
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+            self._thread.start()
+            logger.info(
+                f"🐶 Event loop watchdog started ({type(asyncio.get_running_loop()).__module__}, "
+                f"block threshold {self.block_threshold * 1000:.0f}ms)"
+            )
+
+    async def _heartbeat(self) -> None:
+        """Насколько позже запланированного просыпается таймер - столько loop был занят"""
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            event_loop_lag.observe(max(0.0, loop.time() - expected))
+            self._beat = time.monotonic()
+
+    def _watch(self) -> None:
+        """Поток: такт опаздывает больше порога - снимаем стек потока loop"""
+        reported_beat = None
+        check_every = min(self.block_threshold / 2, self.interval)
+        while not self._stopped.wait(check_every):
+            beat = self._beat
+            blocked_for = time.monotonic() - beat - self.interval
+            if blocked_for < self.block_threshold or beat == reported_beat:
+                continue
+            # Одна запись на одну блокировку
+            reported_beat = beat
+
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            function = _blocking_function(frame)
+            event_loop_blocked.inc(function=function)
+            logger.warning(
+                "🐢 Event loop blocked for %.0fms+ in %s:\n%s",
+                blocked_for * 1000, function, "".join(traceback.format_stack(frame)),
+                extra={"blocked_ms": round(blocked_for * 1000), "function": function},
+            )
+
+    async def stop(self) -> None:
+        if self._thread is not None:
+            self._stopped.set()
+            self._thread.join(timeout=1)
+            self._thread = None
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+# Глобальный экземпляр
+loop_watchdog = LoopWatchdog()
@@ -1,29 +1,224 @@
 """
 Генерация графиков для статистики прогрева
 """
+import asyncio
 import io
 import logging
-from datetime import datetime, timedelta
-from typing import List, Optional
-
-import matplotlib
-matplotlib.use('Agg')  # Для серверного использования без GUI
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
-from matplotlib.figure import Figure
+import multiprocessing
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Hashable, List, Optional, Sequence
 
+from app.config import config
 from app.models.domain import WarmingHistory
 
 logger = logging.getLogger(__name__)
 
 
+def lttb_indices(xs: Sequence[float], ys: Sequence[float], threshold: int) -> List[int]:
+    """
+    Прореживание ряда алгоритмом Largest-Triangle-Three-Buckets
+
+    Оставляет threshold точек (первую, последнюю и по одной на корзину),
+    выбирая в каждой корзине точку с наибольшей площадью треугольника -
+    пики и провалы сохраняются, а отрисовка занимает постоянное время.
+
+    Returns:
+        Индексы выбранных точек по возрастанию
+    """
+    n = len(xs)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+
+    indices = [0]
+    bucket_size = (n - 2) / (threshold - 2)
+    a = 0
+
+    for i in range(threshold - 2):
+        # Среднее следующей корзины - третья вершина треугольника
+        next_start = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+        avg_x = sum(xs[next_start:next_end]) / (next_end - next_start)
+        avg_y = sum(ys[next_start:next_end]) / (next_end - next_start)
+
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+
+        best_area = -1.0
+        best_index = start
+        for j in range(start, end):
+            area = abs(
+                (xs[a] - avg_x) * (ys[j] - ys[a])
+                - (xs[a] - xs[j]) * (avg_y - ys[a])
+            )
+            if area > best_area:
+                best_area = area
+                best_index = j
+
+        indices.append(best_index)
+        a = best_index
+
+    indices.append(n - 1)
+    return indices
+
+
 class GraphGenerator:
-    """Генератор графиков статистики"""
-    
+    """
+    Генератор графиков статистики
+
+    Matplotlib работает в отдельном процессе (GRAPH_RENDER_WORKERS), поэтому
+    отрисовка не блокирует event loop бота и прогревов. Точки прореживаются
+    до GRAPH_MAX_POINTS, готовые PNG кэшируются по ключу вызывающей стороны.
+    """
+
     def __init__(self):
-        # Настройки для красивых графиков
-        plt.style.use('seaborn-v0_8-darkgrid')
-        
+        self.max_points = config.GRAPH_MAX_POINTS
+        self.workers = config.GRAPH_RENDER_WORKERS
+        self.cache_size = config.GRAPH_CACHE_SIZE
+        self.cache_ttl = config.GRAPH_CACHE_TTL
+
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._cache: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key -> (expires_at, value)
+
+    # === Подготовка данных ===
+
+    def prepare_data(self, history: List[WarmingHistory], domain_name: str) -> Dict[str, Any]:
+        """
+        Подготовка точек для отрисовки
+
+        Сводка (среднее, минимум, максимум) считается по всем точкам,
+        а на график уходит прореженный ряд. Точка часового или дневного
+        агрегата - это warmings_count прогревов: столько же весит и в сводке.
+        """
+        timestamps = [h.started_at for h in history]
+        avg_times = [h.avg_response_time for h in history]
+        success_rates = [
+            (h.successful_requests / h.total_requests * 100) if h.total_requests > 0 else 0
+            for h in history
+        ]
+        # Сырая запись - один прогрев, агрегат - warmings_count прогревов (всегда > 0)
+        weights = [getattr(h, "warmings_count", 1) for h in history]
+        measurements = sum(weights)
+
+        summary = {
+            "measurements": measurements,
+            "mean_time": sum(t * w for t, w in zip(avg_times, weights)) / measurements,
+            "min_time": min(avg_times),
+            "max_time": max(avg_times),
+            "mean_success": sum(r * w for r, w in zip(success_rates, weights)) / measurements,
+            "min_success": min(success_rates),
+            "max_success": max(success_rates),
+        }
+
+        if len(history) > self.max_points:
+            xs = [ts.timestamp() for ts in timestamps]
+            # Прореживаем по времени ответа - самой "рваной" из двух кривых
+            keep = lttb_indices(xs, avg_times, self.max_points)
+            timestamps = [timestamps[i] for i in keep]
+            avg_times = [avg_times[i] for i in keep]
+            success_rates = [success_rates[i] for i in keep]
+
+        return {
+            "domain_name": domain_name,
+            "timestamps": timestamps,
+            "avg_times": avg_times,
+            "success_rates": success_rates,
+            "summary": summary,
+        }
+
+    # === Кэш готовых графиков ===
+
+    def get_cached(self, key: Hashable) -> Optional[Any]:
+        """Получение значения из кэша графиков"""
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._cache[key]
+            return None
+
+        self._cache.move_to_end(key)
+        return value
+
+    def put_cached(self, key: Hashable, value: Any) -> None:
+        """Сохранение значения в кэш графиков (LRU + TTL)"""
+        self._cache[key] = (time.monotonic() + self.cache_ttl, value)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    # === Отрисовка ===
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """Пул процессов отрисовки (создается при первом графике)"""
+        if self._executor is None:
+            # spawn: не наследуем потоки и соединения основного процесса
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            logger.info(f"Started graph render pool with {self.workers} worker(s)")
+        return self._executor
+
+    async def render(self, kind: str, history: List[WarmingHistory], domain_name: str) -> Optional[bytes]:
+        """
+        Асинхронная отрисовка графика вне event loop
+
+        Args:
+            kind: "response_time", "success_rate" или "combined"
+            history: История прогревов (сырые записи или агрегаты)
+            domain_name: Имя домена
+
+        Returns:
+            PNG в байтах или None при ошибке
+        """
+        try:
+            if not history:
+                return None
+
+            data = self.prepare_data(history, domain_name)
+            started = time.perf_counter()
+
+            if self.workers > 0:
+                from app.utils import graph_render
+                loop = asyncio.get_running_loop()
+                png = await loop.run_in_executor(self._get_executor(), graph_render.render, kind, data)
+            else:
+                png = await asyncio.to_thread(self._render_local, kind, data)
+
+            logger.info(
+                f"Generated {kind} graph for {domain_name} "
+                f"({len(data['timestamps'])}/{len(history)} points, {time.perf_counter() - started:.2f}s)"
+            )
+            return png
+
+        except Exception as e:
+            logger.error(f"Error generating {kind} graph: {e}", exc_info=True)
+            return None
+
+    def _render_local(self, kind: str, data: Dict[str, Any]) -> bytes:
+        """Отрисовка в текущем процессе"""
+        from app.utils import graph_render
+        return graph_render.render(kind, data)
+
+    def _render_sync(self, kind: str, history: List[WarmingHistory], domain_name: str) -> Optional[io.BytesIO]:
+        """Синхронная отрисовка (для скриптов и обратной совместимости)"""
+        try:
+            if not history:
+                logger.warning("No history data to generate graph")
+                return None
+
+            buf = io.BytesIO(self._render_local(kind, self.prepare_data(history, domain_name)))
+            logger.info(f"Generated {kind} graph for {domain_name}")
+            return buf
+
+        except Exception as e:
+            logger.error(f"Error generating {kind} graph: {e}", exc_info=True)
+            return None
+
     def generate_response_time_graph(
         self,
         history: List[WarmingHistory],
@@ -31,261 +226,61 @@ class GraphGenerator:
         period: str = "24h"
     ) -> Optional[io.BytesIO]:
         """
-        Генерация графика времени ответа сайта
-        
+        Генерация графика времени ответа сайта (синхронно)
+
         Args:
             history: История прогревов
             domain_name: Имя домена
             period: Период ("24h", "7d", "30d")
-        
+
         Returns:
             BytesIO с изображением графика или None при ошибке
         """
-        try:
-            if not history:
-                logger.warning("No history data to generate graph")
-                return None
-            
-            # Извлекаем данные
-            timestamps = [h.started_at for h in history]
-            avg_times = [h.avg_response_time for h in history]
-            
-            # Создаем фигуру
-            fig, ax = plt.subplots(figsize=(12, 6))
-            
-            # Рисуем линию среднего времени ответа
-            ax.plot(timestamps, avg_times, marker='o', linestyle='-', 
-                   linewidth=2, markersize=6, color='#2E86AB', label='Среднее время')
-            
-            # Добавляем заливку под графиком
-            ax.fill_between(timestamps, avg_times, alpha=0.3, color='#2E86AB')
-            
-            # Рисуем горизонтальную линию среднего значения
-            mean_time = sum(avg_times) / len(avg_times)
-            ax.axhline(y=mean_time, color='red', linestyle='--', 
-                      linewidth=1, alpha=0.7, label=f'Среднее: {mean_time:.2f}s')
-            
-            # Настройки осей
-            ax.set_xlabel('Время', fontsize=12, fontweight='bold')
-            ax.set_ylabel('Время ответа (сек)', fontsize=12, fontweight='bold')
-            ax.set_title(f'📊 Скорость ответа сайта {domain_name}', 
-                        fontsize=14, fontweight='bold', pad=20)
-            
-            # Форматирование оси X (времени)
-            if len(timestamps) > 20:
-                ax.xaxis.set_major_locator(mdates.AutoDateLocator())
-            ax.xaxis.set_major_formatter(mdates.DateFormatter('%d.%m %H:%M'))
-            plt.xticks(rotation=45, ha='right')
-            
-            # Сетка
-            ax.grid(True, alpha=0.3, linestyle='--')
-            ax.legend(loc='upper left', fontsize=10)
-            
-            # Добавляем информацию о статистике
-            info_text = (
-                f"Измерений: {len(history)}\n"
-                f"Мин: {min(avg_times):.2f}s\n"
-                f"Макс: {max(avg_times):.2f}s\n"
-                f"Средн: {mean_time:.2f}s"
-            )
-            ax.text(0.98, 0.98, info_text, transform=ax.transAxes,
-                   fontsize=9, verticalalignment='top', horizontalalignment='right',
-                   bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.8))
-            
-            # Автоматическая подгонка
-            plt.tight_layout()
-            
-            # Сохраняем в BytesIO
-            buf = io.BytesIO()
-            plt.savefig(buf, format='png', dpi=100, bbox_inches='tight')
-            buf.seek(0)
-            
-            # Закрываем фигуру для освобождения памяти
-            plt.close(fig)
-            
-            logger.info(f"Generated response time graph for {domain_name}")
-            return buf
-            
-        except Exception as e:
-            logger.error(f"Error generating graph: {e}", exc_info=True)
-            return None
-    
+        return self._render_sync("response_time", history, domain_name)
+
     def generate_success_rate_graph(
         self,
         history: List[WarmingHistory],
         domain_name: str
     ) -> Optional[io.BytesIO]:
         """
-        Генерация графика процента успешности запросов
-        
+        Генерация графика процента успешности запросов (синхронно)
+
         Args:
             history: История прогревов
             domain_name: Имя домена
-        
+
         Returns:
             BytesIO с изображением графика или None при ошибке
         """
-        try:
-            if not history:
-                return None
-            
-            # Извлекаем данные
-            timestamps = [h.started_at for h in history]
-            success_rates = [
-                (h.successful_requests / h.total_requests * 100) if h.total_requests > 0 else 0
-                for h in history
-            ]
-            
-            # Создаем фигуру
-            fig, ax = plt.subplots(figsize=(12, 6))
-            
-            # Рисуем линию успешности
-            colors = ['green' if rate >= 90 else 'orange' if rate >= 70 else 'red' 
-                     for rate in success_rates]
-            
-            ax.plot(timestamps, success_rates, marker='o', linestyle='-',
-                   linewidth=2, markersize=6, color='#06A77D', label='Успешность')
-            
-            # Раскрашиваем точки по цветам
-            ax.scatter(timestamps, success_rates, c=colors, s=50, zorder=5)
-            
-            # Добавляем заливку
-            ax.fill_between(timestamps, success_rates, alpha=0.3, color='#06A77D')
-            
-            # Горизонтальные линии уровней
-            ax.axhline(y=90, color='green', linestyle='--', linewidth=1, alpha=0.5, label='90% (отлично)')
-            ax.axhline(y=70, color='orange', linestyle='--', linewidth=1, alpha=0.5, label='70% (норма)')
-            
-            # Настройки осей
-            ax.set_xlabel('Время', fontsize=12, fontweight='bold')
-            ax.set_ylabel('Успешность (%)', fontsize=12, fontweight='bold')
-            ax.set_title(f'✅ Успешность запросов для {domain_name}',
-                        fontsize=14, fontweight='bold', pad=20)
-            ax.set_ylim(0, 105)
-            
-            # Форматирование оси X
-            if len(timestamps) > 20:
-                ax.xaxis.set_major_locator(mdates.AutoDateLocator())
-            ax.xaxis.set_major_formatter(mdates.DateFormatter('%d.%m %H:%M'))
-            plt.xticks(rotation=45, ha='right')
-            
-            # Сетка и легенда
-            ax.grid(True, alpha=0.3, linestyle='--')
-            ax.legend(loc='lower left', fontsize=10)
-            
-            # Статистика
-            avg_success = sum(success_rates) / len(success_rates)
-            info_text = (
-                f"Измерений: {len(history)}\n"
-                f"Мин: {min(success_rates):.1f}%\n"
-                f"Макс: {max(success_rates):.1f}%\n"
-                f"Средн: {avg_success:.1f}%"
-            )
-            ax.text(0.98, 0.98, info_text, transform=ax.transAxes,
-                   fontsize=9, verticalalignment='top', horizontalalignment='right',
-                   bbox=dict(boxstyle='round', facecolor='lightgreen', alpha=0.8))
-            
-            plt.tight_layout()
-            
-            # Сохраняем
-            buf = io.BytesIO()
-            plt.savefig(buf, format='png', dpi=100, bbox_inches='tight')
-            buf.seek(0)
-            plt.close(fig)
-            
-            logger.info(f"Generated success rate graph for {domain_name}")
-            return buf
-            
-        except Exception as e:
-            logger.error(f"Error generating success rate graph: {e}", exc_info=True)
-            return None
-    
+        return self._render_sync("success_rate", history, domain_name)
+
     def generate_combined_graph(
         self,
         history: List[WarmingHistory],
         domain_name: str
     ) -> Optional[io.BytesIO]:
         """
-        Генерация комбинированного графика (время + успешность)
-        
+        Генерация комбинированного графика (время + успешность) (синхронно)
+
+        В обработчиках бота используйте render("combined", ...) - он не блокирует event loop.
+
         Args:
             history: История прогревов
             domain_name: Имя домена
-        
+
         Returns:
             BytesIO с изображением графика или None при ошибке
         """
-        try:
-            if not history:
-                return None
-            
-            # Извлекаем данные
-            timestamps = [h.started_at for h in history]
-            avg_times = [h.avg_response_time for h in history]
-            success_rates = [
-                (h.successful_requests / h.total_requests * 100) if h.total_requests > 0 else 0
-                for h in history
-            ]
-            
-            # Создаем фигуру с двумя подграфиками
-            fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(12, 10))
-            
-            # === График 1: Время ответа ===
-            ax1.plot(timestamps, avg_times, marker='o', linestyle='-',
-                    linewidth=2, markersize=5, color='#2E86AB', label='Среднее время')
-            ax1.fill_between(timestamps, avg_times, alpha=0.3, color='#2E86AB')
-            
-            mean_time = sum(avg_times) / len(avg_times)
-            ax1.axhline(y=mean_time, color='red', linestyle='--',
-                       linewidth=1, alpha=0.7, label=f'Среднее: {mean_time:.2f}s')
-            
-            ax1.set_ylabel('Время ответа (сек)', fontsize=11, fontweight='bold')
-            ax1.set_title(f'📊 Статистика прогрева для {domain_name}',
-                         fontsize=14, fontweight='bold', pad=15)
-            ax1.grid(True, alpha=0.3, linestyle='--')
-            ax1.legend(loc='upper left', fontsize=9)
-            
-            # === График 2: Успешность ===
-            colors = ['green' if rate >= 90 else 'orange' if rate >= 70 else 'red'
-                     for rate in success_rates]
-            
-            ax2.plot(timestamps, success_rates, marker='o', linestyle='-',
-                    linewidth=2, markersize=5, color='#06A77D', label='Успешность')
-            ax2.scatter(timestamps, success_rates, c=colors, s=40, zorder=5)
-            ax2.fill_between(timestamps, success_rates, alpha=0.3, color='#06A77D')
-            
-            ax2.axhline(y=90, color='green', linestyle='--', linewidth=1, alpha=0.5)
-            ax2.axhline(y=70, color='orange', linestyle='--', linewidth=1, alpha=0.5)
-            
-            ax2.set_xlabel('Время', fontsize=11, fontweight='bold')
-            ax2.set_ylabel('Успешность (%)', fontsize=11, fontweight='bold')
-            ax2.set_ylim(0, 105)
-            ax2.grid(True, alpha=0.3, linestyle='--')
-            ax2.legend(loc='lower left', fontsize=9)
-            
-            # Форматирование оси X для обоих графиков
-            for ax in [ax1, ax2]:
-                if len(timestamps) > 20:
-                    ax.xaxis.set_major_locator(mdates.AutoDateLocator())
-                ax.xaxis.set_major_formatter(mdates.DateFormatter('%d.%m %H:%M'))
-                plt.setp(ax.xaxis.get_majorticklabels(), rotation=45, ha='right')
-            
-            plt.tight_layout()
-            
-            # Сохраняем
-            buf = io.BytesIO()
-            plt.savefig(buf, format='png', dpi=100, bbox_inches='tight')
-            buf.seek(0)
-            plt.close(fig)
-            
-            logger.info(f"Generated combined graph for {domain_name}")
-            return buf
-            
-        except Exception as e:
-            logger.error(f"Error generating combined graph: {e}", exc_info=True)
-            return None
+        return self._render_sync("combined", history, domain_name)
+
+    def shutdown(self) -> None:
+        """Остановка пула процессов отрисовки"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            logger.info("Graph render pool stopped")
 
 
 # Глобальный экземпляр
 graph_generator = GraphGenerator()
-
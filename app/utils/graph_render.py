@@ -0,0 +1,220 @@
+"""
+Отрисовка графиков статистики (выполняется в рабочем процессе)
+
+Модуль намеренно не зависит от моделей БД и pyplot: на вход приходят
+готовые списки точек, на выходе - PNG в байтах. Figure с Agg-холстом
+создается один раз на поток и переиспользуется между вызовами: без пула
+процессов (GRAPH_RENDER_WORKERS=0) рендеры идут параллельно в потоках
+asyncio.to_thread, и общая фигура перерисовывалась бы двумя потоками сразу.
+"""
+import io
+import threading
+from typing import Any, Dict, Tuple
+
+import matplotlib
+matplotlib.use('Agg')  # Для серверного использования без GUI
+import matplotlib.dates as mdates
+import matplotlib.style
+from matplotlib.artist import setp
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+# Настройки для красивых графиков
+matplotlib.style.use('seaborn-v0_8-darkgrid')
+
+# Переиспользуемые фигуры потока: figures[тип графика]
+_local = threading.local()
+
+FIGURE_SIZES: Dict[str, Tuple[int, int]] = {
+    "response_time": (12, 6),
+    "success_rate": (12, 6),
+    "combined": (12, 10),
+}
+
+
+def _get_figure(kind: str) -> Figure:
+    """Фигура для типа графика (создается один раз на поток)"""
+    figures: Dict[str, Figure] = getattr(_local, "figures", None)
+    if figures is None:
+        figures = _local.figures = {}
+    fig = figures.get(kind)
+    if fig is None:
+        fig = Figure(figsize=FIGURE_SIZES[kind])
+        FigureCanvasAgg(fig)
+        figures[kind] = fig
+    else:
+        fig.clear()
+    return fig
+
+
+def _to_png(fig: Figure) -> bytes:
+    """Сохранение фигуры в PNG"""
+    fig.tight_layout()
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', dpi=100, bbox_inches='tight')
+    return buf.getvalue()
+
+
+def _format_time_axis(ax, points_count: int) -> None:
+    """Форматирование оси X (времени)"""
+    if points_count > 20:
+        ax.xaxis.set_major_locator(mdates.AutoDateLocator())
+    ax.xaxis.set_major_formatter(mdates.DateFormatter('%d.%m %H:%M'))
+    setp(ax.xaxis.get_majorticklabels(), rotation=45, ha='right')
+
+
+def _success_colors(success_rates):
+    return ['green' if rate >= 90 else 'orange' if rate >= 70 else 'red' for rate in success_rates]
+
+
+def render_response_time(data: Dict[str, Any]) -> bytes:
+    """График времени ответа сайта"""
+    timestamps = data["timestamps"]
+    avg_times = data["avg_times"]
+    summary = data["summary"]
+
+    fig = _get_figure("response_time")
+    ax = fig.subplots()
+
+    # Рисуем линию среднего времени ответа
+    ax.plot(timestamps, avg_times, marker='o', linestyle='-',
+            linewidth=2, markersize=6, color='#2E86AB', label='Среднее время')
+
+    # Добавляем заливку под графиком
+    ax.fill_between(timestamps, avg_times, alpha=0.3, color='#2E86AB')
+
+    # Рисуем горизонтальную линию среднего значения
+    ax.axhline(y=summary["mean_time"], color='red', linestyle='--',
+               linewidth=1, alpha=0.7, label=f'Среднее: {summary["mean_time"]:.2f}s')
+
+    # Настройки осей
+    ax.set_xlabel('Время', fontsize=12, fontweight='bold')
+    ax.set_ylabel('Время ответа (сек)', fontsize=12, fontweight='bold')
+    ax.set_title(f'📊 Скорость ответа сайта {data["domain_name"]}',
+                 fontsize=14, fontweight='bold', pad=20)
+
+    _format_time_axis(ax, len(timestamps))
+
+    # Сетка
+    ax.grid(True, alpha=0.3, linestyle='--')
+    ax.legend(loc='upper left', fontsize=10)
+
+    # Добавляем информацию о статистике
+    info_text = (
+        f"Измерений: {summary['measurements']}\n"
+        f"Мин: {summary['min_time']:.2f}s\n"
+        f"Макс: {summary['max_time']:.2f}s\n"
+        f"Средн: {summary['mean_time']:.2f}s"
+    )
+    ax.text(0.98, 0.98, info_text, transform=ax.transAxes,
+            fontsize=9, verticalalignment='top', horizontalalignment='right',
+            bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.8))
+
+    return _to_png(fig)
+
+
+def render_success_rate(data: Dict[str, Any]) -> bytes:
+    """График процента успешности запросов"""
+    timestamps = data["timestamps"]
+    success_rates = data["success_rates"]
+    summary = data["summary"]
+
+    fig = _get_figure("success_rate")
+    ax = fig.subplots()
+
+    ax.plot(timestamps, success_rates, marker='o', linestyle='-',
+            linewidth=2, markersize=6, color='#06A77D', label='Успешность')
+
+    # Раскрашиваем точки по цветам
+    ax.scatter(timestamps, success_rates, c=_success_colors(success_rates), s=50, zorder=5)
+
+    # Добавляем заливку
+    ax.fill_between(timestamps, success_rates, alpha=0.3, color='#06A77D')
+
+    # Горизонтальные линии уровней
+    ax.axhline(y=90, color='green', linestyle='--', linewidth=1, alpha=0.5, label='90% (отлично)')
+    ax.axhline(y=70, color='orange', linestyle='--', linewidth=1, alpha=0.5, label='70% (норма)')
+
+    # Настройки осей
+    ax.set_xlabel('Время', fontsize=12, fontweight='bold')
+    ax.set_ylabel('Успешность (%)', fontsize=12, fontweight='bold')
+    ax.set_title(f'✅ Успешность запросов для {data["domain_name"]}',
+                 fontsize=14, fontweight='bold', pad=20)
+    ax.set_ylim(0, 105)
+
+    _format_time_axis(ax, len(timestamps))
+
+    # Сетка и легенда
+    ax.grid(True, alpha=0.3, linestyle='--')
+    ax.legend(loc='lower left', fontsize=10)
+
+    # Статистика
+    info_text = (
+        f"Измерений: {summary['measurements']}\n"
+        f"Мин: {summary['min_success']:.1f}%\n"
+        f"Макс: {summary['max_success']:.1f}%\n"
+        f"Средн: {summary['mean_success']:.1f}%"
+    )
+    ax.text(0.98, 0.98, info_text, transform=ax.transAxes,
+            fontsize=9, verticalalignment='top', horizontalalignment='right',
+            bbox=dict(boxstyle='round', facecolor='lightgreen', alpha=0.8))
+
+    return _to_png(fig)
+
+
+def render_combined(data: Dict[str, Any]) -> bytes:
+    """Комбинированный график (время + успешность)"""
+    timestamps = data["timestamps"]
+    avg_times = data["avg_times"]
+    success_rates = data["success_rates"]
+    summary = data["summary"]
+
+    fig = _get_figure("combined")
+    ax1, ax2 = fig.subplots(2, 1)
+
+    # === График 1: Время ответа ===
+    ax1.plot(timestamps, avg_times, marker='o', linestyle='-',
+             linewidth=2, markersize=5, color='#2E86AB', label='Среднее время')
+    ax1.fill_between(timestamps, avg_times, alpha=0.3, color='#2E86AB')
+
+    ax1.axhline(y=summary["mean_time"], color='red', linestyle='--',
+                linewidth=1, alpha=0.7, label=f'Среднее: {summary["mean_time"]:.2f}s')
+
+    ax1.set_ylabel('Время ответа (сек)', fontsize=11, fontweight='bold')
+    ax1.set_title(f'📊 Статистика прогрева для {data["domain_name"]}',
+                  fontsize=14, fontweight='bold', pad=15)
+    ax1.grid(True, alpha=0.3, linestyle='--')
+    ax1.legend(loc='upper left', fontsize=9)
+
+    # === График 2: Успешность ===
+    ax2.plot(timestamps, success_rates, marker='o', linestyle='-',
+             linewidth=2, markersize=5, color='#06A77D', label='Успешность')
+    ax2.scatter(timestamps, success_rates, c=_success_colors(success_rates), s=40, zorder=5)
+    ax2.fill_between(timestamps, success_rates, alpha=0.3, color='#06A77D')
+
+    ax2.axhline(y=90, color='green', linestyle='--', linewidth=1, alpha=0.5)
+    ax2.axhline(y=70, color='orange', linestyle='--', linewidth=1, alpha=0.5)
+
+    ax2.set_xlabel('Время', fontsize=11, fontweight='bold')
+    ax2.set_ylabel('Успешность (%)', fontsize=11, fontweight='bold')
+    ax2.set_ylim(0, 105)
+    ax2.grid(True, alpha=0.3, linestyle='--')
+    ax2.legend(loc='lower left', fontsize=9)
+
+    # Форматирование оси X для обоих графиков
+    for ax in (ax1, ax2):
+        _format_time_axis(ax, len(timestamps))
+
+    return _to_png(fig)
+
+
+RENDERERS = {
+    "response_time": render_response_time,
+    "success_rate": render_success_rate,
+    "combined": render_combined,
+}
+
+
+def render(kind: str, data: Dict[str, Any]) -> bytes:
+    """Точка входа для пула процессов"""
+    return RENDERERS[kind](data)
@@ -0,0 +1,90 @@
+"""
+Компактный скетч распределения времени ответа для агрегатов истории
+"""
+import math
+from typing import Dict, Optional
+
+
+class LatencySketch:
+    """
+    Логарифмическая гистограмма (по мотивам DDSketch)
+
+    Значение v попадает в корзину ceil(log(v) / log(GAMMA)), поэтому
+    относительная ошибка квантилей не превышает (GAMMA - 1) / (GAMMA + 1) ≈ 2.5%.
+    Скетчи складываются простым сложением счетчиков, что позволяет
+    сливать часовые агрегаты в дневные без потери точности.
+    """
+
+    GAMMA = 1.05
+    MIN_VALUE = 0.001  # Всё, что быстрее 1 мс, считаем одной корзиной
+
+    def __init__(self, buckets: Optional[Dict[int, int]] = None, zero_count: int = 0):
+        self.buckets: Dict[int, int] = dict(buckets or {})
+        self.zero_count = zero_count
+        self._log_gamma = math.log(self.GAMMA)
+
+    @property
+    def count(self) -> int:
+        """Количество значений в скетче"""
+        return self.zero_count + sum(self.buckets.values())
+
+    def add(self, value: Optional[float], count: int = 1) -> None:
+        """Добавление значения (в секундах)"""
+        if value is None or count <= 0:
+            return
+
+        if value <= self.MIN_VALUE:
+            self.zero_count += count
+            return
+
+        index = math.ceil(math.log(value) / self._log_gamma)
+        self.buckets[index] = self.buckets.get(index, 0) + count
+
+    def merge(self, other: "LatencySketch") -> None:
+        """Слияние с другим скетчем"""
+        self.zero_count += other.zero_count
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Оценка квантиля
+
+        Args:
+            q: Квантиль от 0 до 1 (например, 0.95)
+
+        Returns:
+            Оценка значения в секундах или None для пустого скетча
+        """
+        total = self.count
+        if total == 0:
+            return None
+
+        rank = q * (total - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if rank < seen:
+                # Середина корзины (GAMMA^(i-1), GAMMA^i] в смысле относительной ошибки
+                return 2 * self.GAMMA ** index / (self.GAMMA + 1)
+
+        return 2 * self.GAMMA ** max(self.buckets) / (self.GAMMA + 1)
+
+    def to_dict(self) -> Dict[str, object]:
+        """Сериализация для JSON-колонки"""
+        return {
+            "zero": self.zero_count,
+            "buckets": {str(index): count for index, count in self.buckets.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, object]]) -> "LatencySketch":
+        """Восстановление из JSON-колонки"""
+        if not data:
+            return cls()
+
+        buckets = {int(index): int(count) for index, count in (data.get("buckets") or {}).items()}
+        return cls(buckets=buckets, zero_count=int(data.get("zero", 0)))
@@ -1,29 +1,119 @@
 """
 Настройка логирования
+
+LOG_FORMAT=text - обычные строки, LOG_FORMAT=json - одна JSON-запись на
+строку: время, уровень, logger, сообщение и поля из extra (domain, url,
+status_code, elapsed...), чтобы логи можно было фильтровать без разбора текста.
+
+При LOG_QUEUE=true (по умолчанию) запись в stdout идет в отдельном потоке
+(QueueHandler + QueueListener): вызов logger.* в event loop только кладет
+запись в очередь, форматирование и I/O происходят вне его. Поэтому сообщения
+на горячем пути пишутся с ленивым форматированием (logger.info("%s", ...)),
+а не f-строкой.
+
+Логи отдельных запросов прогрева выборочные: успешный запрос попадает в лог
+с вероятностью WARMER_LOG_SAMPLE_RATE, ошибки и таймауты - всегда. Полная
+картина по запросам - в метриках (app.utils.metrics).
 """
+import atexit
+import json
 import logging
+import queue
+import random
 import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
 from app.config import config
 
+# Атрибуты LogRecord; все остальное в записи - поля из extra
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+_listener: Optional[QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Запись лога одной JSON-строкой"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    QueueHandler без форматирования в вызывающем потоке
+
+    Стандартный prepare() форматирует сообщение сразу (для передачи между
+    процессами). Очередь здесь в памяти процесса, так что запись передается
+    как есть и форматируется в потоке QueueListener.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def sampled(rate: Optional[float] = None) -> bool:
+    """Попадает ли запись в выборку (WARMER_LOG_SAMPLE_RATE)"""
+    rate = rate if rate is not None else config.WARMER_LOG_SAMPLE_RATE
+    return rate >= 1 or random.random() < rate
+
+
+def _stop_listener() -> None:
+    """Остановка потока записи (оставшиеся в очереди записи дописываются)"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
 
 def setup_logging():
     """Настройка логирования"""
+    global _listener
+    
     # Основной logger
     logger = logging.getLogger()
     logger.setLevel(getattr(logging, config.LOG_LEVEL.upper(), logging.INFO))
     
     # Formatter
-    formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
+    if config.LOG_FORMAT == "json":
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter(
+            '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        )
     
     # Console handler
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(logging.DEBUG)
     console_handler.setFormatter(formatter)
     
-    logger.addHandler(console_handler)
+    if config.LOG_QUEUE:
+        # Запись в stdout - в отдельном потоке, event loop не ждет I/O
+        _stop_listener()
+        log_queue = queue.SimpleQueue()
+        _listener = QueueListener(log_queue, console_handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_stop_listener)
+        logger.addHandler(DeferredQueueHandler(log_queue))
+    else:
+        logger.addHandler(console_handler)
     
     # Уменьшаем уровень логирования для сторонних библиотек
     logging.getLogger("httpx").setLevel(logging.WARNING)
@@ -32,4 +122,3 @@ def setup_logging():
     logging.getLogger("apscheduler").setLevel(logging.INFO)
     
     return logger
-
@@ -0,0 +1,377 @@
+"""
+Метрики Prometheus (текстовый формат экспозиции 0.0.4)
+
+Счетчики, gauge и гистограммы с метками хранятся в памяти процесса и
+отдаются по HTTP на /metrics (METRICS_ENABLED, METRICS_PORT). Реализация
+своя и минимальная - только то, что нужно прогревщику, без дополнительных
+зависимостей.
+
+Процессы прогрева (WARMER_PROCESSES > 1) копят метрики у себя и передают
+приращения в основной процесс вместе со сводкой (drain/merge).
+"""
+import bisect
+import logging
+import math
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Корзины по умолчанию (секунды): от быстрых запросов к БД до медленных страниц
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+class _Metric:
+    """Базовая метрика с метками"""
+
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: expected labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """Монотонный счетчик"""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        # Метрика без меток видна сразу (со значением 0)
+        self._values: Dict[Tuple[str, ...], float] = {} if self.labelnames else {(): 0.0}
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(self._values.items())
+        ]
+
+    def drain(self) -> Dict[Tuple[str, ...], float]:
+        values, self._values = self._values, {}
+        return values
+
+    def merge(self, values: Dict[Tuple[str, ...], float]) -> None:
+        for key, value in values.items():
+            self._values[key] = self._values.get(key, 0.0) + value
+
+
+class Gauge(_Metric):
+    """Текущее значение (или функция, вызываемая при сборе метрик)"""
+
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {} if self.labelnames else {(): 0.0}
+        self._function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float, **labels: Any) -> None:
+        self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """Значение вычисляется при каждом сборе (только для gauge без меток)"""
+        self._function = function
+
+    def samples(self) -> List[str]:
+        if self._function is not None:
+            try:
+                return [f"{self.name} {_format_value(float(self._function()))}"]
+            except Exception as e:
+                logger.debug(f"Gauge {self.name} callback failed: {e}")
+                return []
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(self._values.items())
+        ]
+
+
+class Histogram(_Metric):
+    """Гистограмма с фиксированными корзинами"""
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [счетчики по корзинам (+Inf последней), сумма]
+        self._values: Dict[Tuple[str, ...], List[Any]] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        state = self._values.get(key)
+        if state is None:
+            state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+        state[0][bisect.bisect_left(self.buckets, value)] += 1
+        state[1] += value
+
+    def samples(self) -> List[str]:
+        lines = []
+        for key, (counts, total) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+    def drain(self) -> Dict[Tuple[str, ...], List[Any]]:
+        values, self._values = self._values, {}
+        return values
+
+    def merge(self, values: Dict[Tuple[str, ...], List[Any]]) -> None:
+        for key, (counts, total) in values.items():
+            state = self._values.get(key)
+            if state is None:
+                self._values[key] = [list(counts), total]
+                continue
+            state[0] = [a + b for a, b in zip(state[0], counts)]
+            state[1] += total
+
+
+class MetricsRegistry:
+    """Реестр метрик процесса"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> Any:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """Все метрики в текстовом формате Prometheus"""
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+    def drain(self) -> Dict[str, Any]:
+        """Приращения счетчиков и гистограмм с обнулением (для передачи в другой процесс)"""
+        return {
+            name: metric.drain()
+            for name, metric in self._metrics.items()
+            if isinstance(metric, (Counter, Histogram))
+        }
+
+    def merge(self, snapshot: Optional[Dict[str, Any]]) -> None:
+        """Добавление приращений, полученных из drain() другого процесса"""
+        for name, values in (snapshot or {}).items():
+            metric = self._metrics.get(name)
+            if isinstance(metric, (Counter, Histogram)):
+                metric.merge(values)
+
+
+class MetricsServer:
+    """
+    HTTP-сервер /metrics
+
+    Задержку event loop замеряет app.utils.event_loop.LoopWatchdog.
+    """
+
+    def __init__(self, registry: MetricsRegistry):
+        self.registry = registry
+        self._runner = None
+
+    async def start(self, host: str, port: int) -> None:
+        from aiohttp import web
+
+        async def handle(request: web.Request) -> web.Response:
+            return web.Response(
+                text=self.registry.render(),
+                headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+            )
+
+        app = web.Application()
+        app.router.add_get("/metrics", handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+
+        logger.info(f"📈 Metrics available at http://{host}:{port}/metrics")
+
+    async def stop(self) -> None:
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+            logger.info("Metrics server stopped")
+
+
+# Глобальный экземпляр
+metrics_registry = MetricsRegistry()
+
+# Прогрев
+warm_requests = metrics_registry.counter(
+    "siteheater_warm_requests_total",
+    "Warming requests by domain, HTTP status (or timeout/error), cache verdict and cache variant",
+    ("domain", "status", "cache", "variant"),
+)
+warm_request_duration = metrics_registry.histogram(
+    "siteheater_warm_request_duration_seconds",
+    "Warming request latency",
+    ("domain",),
+)
+warm_retries = metrics_registry.counter(
+    "siteheater_warm_retries_total",
+    "Warming request retries by reason (HTTP status or error), and retries denied by the run budget",
+    ("domain", "reason"),
+)
+warm_circuit_open = metrics_registry.gauge(
+    "siteheater_warm_circuit_open",
+    "Circuit breaker state by origin (1 = open or half-open, requests are shed)",
+    ("origin",),
+)
+warm_deadline_coverage = metrics_registry.gauge(
+    "siteheater_warm_deadline_coverage",
+    "Share of URL x variant pairs warmed within the deadline in the last run",
+    ("domain",),
+)
+warm_bytes = metrics_registry.counter(
+    "siteheater_warm_bytes_total",
+    "Response bytes received, and bytes saved by 304 revalidation",
+    ("domain", "kind"),
+)
+warm_deduplicated = metrics_registry.counter(
+    "siteheater_warm_deduplicated_total",
+    "Warming requests not sent: URL already in flight (joined) or warmed recently by another run (recent)",
+    ("domain", "reason"),
+)
+warm_requests_in_flight = metrics_registry.gauge(
+    "siteheater_warm_requests_in_flight",
+    "Warming requests currently waiting for a response",
+)
+warm_semaphore_wait = metrics_registry.histogram(
+    "siteheater_warm_semaphore_wait_seconds",
+    "Time a warming request waited for a concurrency slot",
+)
+warmings_active = metrics_registry.gauge(
+    "siteheater_warmings_active",
+    "Domains being warmed by this process",
+)
+
+# Очереди
+warming_queue_depth = metrics_registry.gauge(
+    "siteheater_warming_queue_depth",
+    "Warming tasks in the database queue by status",
+    ("status",),
+)
+history_writer_queue_depth = metrics_registry.gauge(
+    "siteheater_history_writer_queue_depth",
+    "Results waiting to be written to the database",
+)
+
+# Планировщик
+scheduler_lag = metrics_registry.histogram(
+    "siteheater_scheduler_lag_seconds",
+    "Actual job start minus planned start",
+    ("job",),
+    buckets=(0.01, 0.1, 0.5, 1.0, 5.0, 15.0, 60.0, 300.0, 900.0),
+)
+scheduler_run_duration = metrics_registry.histogram(
+    "siteheater_scheduler_run_duration_seconds",
+    "Scheduled job run time",
+    ("job",),
+    buckets=(1.0, 10.0, 30.0, 60.0, 300.0, 600.0, 1800.0, 3600.0, 7200.0),
+)
+scheduler_skipped_runs = metrics_registry.counter(
+    "siteheater_scheduler_skipped_runs_total",
+    "Scheduled runs that did not start (overlap: previous run still going, queued: task already queued, misfire: too late)",
+    ("job", "reason"),
+)
+scheduler_duty_cycle = metrics_registry.gauge(
+    "siteheater_scheduler_duty_cycle",
+    "Average warming duration divided by the scheduled interval",
+    ("domain",),
+)
+scheduler_interval = metrics_registry.gauge(
+    "siteheater_scheduler_interval_seconds",
+    "Current warming interval (may be stretched from the configured one)",
+    ("domain",),
+)
+
+# База данных
+db_query_duration = metrics_registry.histogram(
+    "siteheater_db_query_duration_seconds",
+    "Database query time by statement type",
+    ("operation",),
+)
+
+# Event loop
+event_loop_lag = metrics_registry.histogram(
+    "siteheater_event_loop_lag_seconds",
+    "Event loop timer lag (time the loop was blocked)",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0),
+)
+event_loop_blocked = metrics_registry.counter(
+    "siteheater_event_loop_blocked_total",
+    "Event loop blocks longer than LOOP_BLOCK_THRESHOLD_MS by blocking function",
+    ("function",),
+)
+
+metrics_server = MetricsServer(metrics_registry)
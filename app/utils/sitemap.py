@@ -1,16 +1,52 @@
 """
 Утилиты для работы с sitemap и краулинга
 """
+import asyncio
 import logging
-from typing import List, Set
+from collections import Counter
+from typing import Iterable, List, Optional, Set
 from urllib.parse import urljoin, urlparse
 import xml.etree.ElementTree as ET
 
 import httpx
-from bs4 import BeautifulSoup
+
+from app.config import config
 
 logger = logging.getLogger(__name__)
 
+# CDN SaaS-платформ, с которых сайты отдают статику
+CDN_HOSTS = {
+    "cdn.shopify.com",
+    "static.tildacdn.com",
+    "thb.tildacdn.com",
+    "static.wixstatic.com",
+    "static.parastorage.com",
+    "images.squarespace-cdn.com",
+    "assets.squarespace.com",
+    "cdn.jsdelivr.net",
+}
+
+# Типы preload, которые считаются критичной статикой
+PRELOAD_TYPES = {"style", "script", "image", "font"}
+
+
+def _base_host(host: str) -> str:
+    return host[4:] if host.startswith("www.") else host
+
+
+def _is_asset_host(host: str, site_host: str, extra_hosts: Iterable[str] = ()) -> bool:
+    """Статика сайта: свой домен и его поддомены или известный CDN"""
+    if not host:
+        return False
+    base = _base_host(site_host)
+    return (
+        host == site_host
+        or host == base
+        or host.endswith(f".{base}")
+        or host in CDN_HOSTS
+        or host in extra_hosts
+    )
+
 
 class SitemapParser:
     """Парсер sitemap и краулер"""
@@ -119,6 +155,8 @@ class SitemapParser:
                         
                         # Парсим HTML только если не достигли максимальной глубины
                         if depth < max_depth:
+                            # bs4 нужен только краулеру - не грузим его при старте бота
+                            from bs4 import BeautifulSoup
                             soup = BeautifulSoup(response.text, 'html.parser')
                             
                             # Ищем ссылки
@@ -145,6 +183,117 @@ class SitemapParser:
         logger.info(f"✅ Crawled {len(urls)} pages from {domain}")
         return urls
     
+    def _extract_assets(self, html: str, page_url: str, site_host: str, extra_hosts: Iterable[str] = ()) -> List[str]:
+        """
+        Критичная статика страницы: стили, скрипты, preload и первые изображения
+        
+        Берутся только ресурсы с домена сайта и известных CDN (счетчики,
+        виджеты и реклама сторонних сервисов сайту не принадлежат).
+        """
+        from bs4 import BeautifulSoup
+        soup = BeautifulSoup(html, 'html.parser')
+        
+        candidates = []
+        for link in soup.find_all('link', href=True):
+            rel = {value.lower() for value in link.get('rel', [])}
+            if 'stylesheet' in rel or 'modulepreload' in rel:
+                candidates.append(link['href'])
+            elif 'preload' in rel and link.get('as', '').lower() in PRELOAD_TYPES:
+                candidates.append(link['href'])
+        
+        for script in soup.find_all('script', src=True):
+            candidates.append(script['src'])
+        
+        # Верхние изображения страницы (hero, логотип, первые карточки)
+        images = 0
+        for img in soup.find_all('img'):
+            if images >= config.WARMER_ASSET_IMAGES_PER_PAGE:
+                break
+            src = img.get('src') or img.get('data-src')
+            # data: - плейсхолдер ленивой загрузки, настоящий адрес в data-src
+            if src and src.startswith('data:'):
+                src = img.get('data-src')
+            if src:
+                candidates.append(src)
+                images += 1
+        
+        assets = []
+        for candidate in candidates:
+            candidate = candidate.strip()
+            if not candidate or candidate.startswith(('data:', 'blob:', 'javascript:')):
+                continue
+            absolute_url = urljoin(page_url, candidate).split('#', 1)[0]
+            parsed_url = urlparse(absolute_url)
+            if parsed_url.scheme in ('http', 'https') and _is_asset_host(parsed_url.netloc, site_host, extra_hosts):
+                assets.append(absolute_url)
+        return assets
+    
+    async def discover_assets(
+        self,
+        domain: str,
+        page_urls: List[str],
+        sample_size: Optional[int] = None,
+        max_assets: Optional[int] = None,
+    ) -> List[str]:
+        """
+        Обнаружение статики домена по выборке страниц
+        
+        Страницы одного сайта используют одни и те же бандлы и стили, поэтому
+        достаточно выборки: главная и страницы, равномерно взятые из списка.
+        Результат без повторов, сначала ресурсы, которые встречаются на
+        большем числе страниц.
+        
+        Args:
+            domain: Домен
+            page_urls: Страницы домена (лучше основные - группа 2)
+            sample_size: Сколько страниц загрузить (WARMER_ASSET_SAMPLE_PAGES)
+            max_assets: Ограничение результата (WARMER_ASSET_MAX_URLS)
+        """
+        sample_size = sample_size or config.WARMER_ASSET_SAMPLE_PAGES
+        max_assets = max_assets or config.WARMER_ASSET_MAX_URLS
+        extra_hosts = {host.strip() for host in config.WARMER_ASSET_HOSTS.split(",") if host.strip()}
+        
+        if not domain.startswith(('http://', 'https://')):
+            domain = f"https://{domain}"
+        site_host = urlparse(domain).netloc
+        
+        pages = sorted(set(page_urls))
+        if len(pages) > sample_size:
+            step = len(pages) / sample_size
+            pages = [pages[int(i * step)] for i in range(sample_size)]
+        if domain not in pages and f"{domain}/" not in pages:
+            pages = [f"{domain}/"] + pages[:sample_size - 1]
+        
+        logger.info(f"🧱 Discovering assets for {domain} on {len(pages)} pages")
+        
+        references: Counter = Counter()
+        semaphore = asyncio.Semaphore(5)
+        
+        async with httpx.AsyncClient(
+            timeout=self.timeout,
+            follow_redirects=True,
+            headers={
+                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+            }
+        ) as client:
+            async def scan(page_url: str) -> None:
+                async with semaphore:
+                    try:
+                        response = await client.get(page_url)
+                    except Exception as e:
+                        logger.debug(f"Error fetching {page_url} for assets: {e}")
+                        return
+                if response.status_code != 200 or "html" not in response.headers.get("content-type", "html"):
+                    return
+                # Ресурс считается один раз на страницу
+                references.update(set(self._extract_assets(response.text, str(response.url), site_host, extra_hosts)))
+            
+            await asyncio.gather(*[scan(page_url) for page_url in pages])
+        
+        assets = [url for url, _ in sorted(references.items(), key=lambda item: (-item[1], item[0]))][:max_assets]
+        logger.info(f"✅ Found {len(assets)} unique assets for {domain} ({len(references)} before limit)")
+        return assets
+    
     async def discover_urls(self, domain: str) -> List[str]:
         """Полное обнаружение URL (sitemap + краулинг)"""
         logger.info(f"🔍 Discovering URLs for {domain}")
@@ -0,0 +1,73 @@
+"""
+Замер времени запуска бота
+
+Модуль импортируется первым в app.main и не тянет зависимостей, поэтому
+точка отсчета - практически начало процесса. Стадии (импорты модулей,
+миграции, инициализация БД, ...) замеряются через stage(), итоговый отчет
+пишется в лог, когда бот готов к первому опросу Telegram.
+
+Подробный профиль импортов: python -X importtime -m app.main
+"""
+import logging
+import sys
+import time
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Тяжелые зависимости, которые должны грузиться лениво (только при первом использовании)
+LAZY_MODULES = ("matplotlib", "bs4", "alembic")
+
+
+class StartupReport:
+    """Отчет о времени запуска"""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.stages: List[Tuple[str, float]] = []
+        self.ready_at: Optional[float] = None
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Замер стадии запуска"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages.append((name, time.perf_counter() - started))
+
+    @property
+    def elapsed(self) -> float:
+        """Время от старта процесса до готовности (или до текущего момента)"""
+        return (self.ready_at or time.perf_counter()) - self.started_at
+
+    def mark_ready(self, target_seconds: float) -> None:
+        """
+        Отметка готовности к первому опросу и запись отчета в лог
+
+        Args:
+            target_seconds: Целевое время запуска; превышение - предупреждение
+        """
+        if self.ready_at is not None:
+            return
+        self.ready_at = time.perf_counter()
+
+        lines = [f"⏱ Startup report: ready to poll in {self.elapsed:.2f}s"]
+        for name, duration in sorted(self.stages, key=lambda s: s[1], reverse=True):
+            lines.append(f"  {duration:7.3f}s  {name}")
+
+        loaded = [name for name in LAZY_MODULES if name in sys.modules]
+        if loaded:
+            lines.append(f"  ⚠️ Heavy modules loaded at startup: {', '.join(loaded)}")
+
+        logger.info("\n".join(lines))
+
+        if target_seconds and self.elapsed > target_seconds:
+            logger.warning(
+                f"⚠️ Startup took {self.elapsed:.2f}s, target is {target_seconds:.2f}s"
+            )
+
+
+# Глобальный экземпляр
+startup_report = StartupReport()
@@ -0,0 +1,203 @@
+"""
+Воркер прогрева (отдельный процесс)
+
+Запуск: python -m app.worker
+
+При WARMING_QUEUE_ENABLED=true бот только ставит задачи в таблицу warming_tasks,
+а прогрев выполняют воркеры. Их можно запускать сколько угодно - на разных
+ядрах или хостах: задачи захватываются через SELECT ... FOR UPDATE SKIP LOCKED,
+воркер продлевает аренду задачи, пока прогревает домен. Если воркер упал,
+аренда истекает и задачу забирает другой.
+
+Состояние прогрева между запусками (окно дедупликации, валидаторы для 304,
+baseline горячего ответа, circuit breaker'ы) живет в памяти воркера. Домен,
+попавший на другой воркер, начинает с пустого состояния: запросы идут без
+валидаторов, первый ответ становится baseline, а у лежащего сайта свой
+breaker в каждом воркере. Чем меньше воркеров (и чем больше задач у каждого,
+WORKER_CONCURRENCY), тем полнее это состояние.
+"""
+import asyncio
+import logging
+import os
+import signal
+import socket
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from app.config import config
+from app.core.db import db_manager
+from app.core.history_writer import history_writer
+from app.core.warmer import warmer
+from app.models.domain import WarmingTask
+from app.utils.event_loop import install_event_loop_policy, loop_watchdog, report_event_loop
+from app.utils.logger import setup_logging
+from app.utils.metrics import metrics_server
+
+logger = logging.getLogger(__name__)
+
+
+def _serialize_stats(stats: Dict[str, Any]) -> Dict[str, Any]:
+    """Статистика прогрева для JSON-колонки"""
+    return {
+        key: value.isoformat() if isinstance(value, datetime) else value
+        for key, value in stats.items()
+    }
+
+
+class WarmingWorker:
+    """Воркер, выполняющий задачи прогрева из очереди в БД"""
+
+    def __init__(self, worker_id: Optional[str] = None, concurrency: Optional[int] = None):
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.concurrency = concurrency or config.WORKER_CONCURRENCY
+        self.poll_interval = config.WORKER_POLL_SECONDS
+        self.lease_seconds = config.WORKER_LEASE_SECONDS
+        self.max_attempts = config.WORKER_MAX_ATTEMPTS
+        self.retry_delay = config.WORKER_RETRY_DELAY_SECONDS
+
+        self.running: Dict[int, asyncio.Task] = {}  # task_id -> Task
+        self._stop = asyncio.Event()
+
+    def stop(self) -> None:
+        """Штатная остановка: новые задачи не берем, текущие возвращаем в очередь"""
+        logger.info(f"🛑 Worker {self.worker_id} stopping...")
+        self._stop.set()
+
+    async def run(self) -> None:
+        """Основной цикл: захват задач, пока есть свободные слоты"""
+        logger.info(
+            f"🚀 Warming worker {self.worker_id} started "
+            f"(concurrency: {self.concurrency}, lease: {self.lease_seconds}s)"
+        )
+
+        while not self._stop.is_set():
+            if len(self.running) < self.concurrency:
+                try:
+                    task = await db_manager.claim_warming_task(
+                        self.worker_id, self.lease_seconds, self.max_attempts
+                    )
+                except Exception as e:
+                    logger.error(f"Error claiming warming task: {e}")
+                    task = None
+
+                if task:
+                    self.running[task.id] = asyncio.create_task(self._execute(task))
+                    # Сразу пробуем взять следующую задачу
+                    continue
+
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+        # Прерываем текущие прогревы - они вернутся в очередь
+        for task in list(self.running.values()):
+            task.cancel()
+        await asyncio.gather(*self.running.values(), return_exceptions=True)
+
+        logger.info(f"👋 Worker {self.worker_id} stopped")
+
+    async def _heartbeat(self, task_id: int, warm_task: asyncio.Task) -> None:
+        """Продление аренды; при потере аренды (отмена из бота) прогрев прерывается"""
+        interval = max(1, self.lease_seconds // 3)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                owned = await db_manager.renew_warming_task_lease(task_id, self.worker_id, self.lease_seconds)
+            except Exception as e:
+                # БД временно недоступна - пробуем до истечения аренды
+                logger.warning(f"Failed to renew lease for task {task_id}: {e}")
+                continue
+
+            if not owned:
+                logger.warning(f"⏹ Task {task_id} was cancelled or taken over, stopping warming")
+                warm_task.cancel()
+                return
+
+    async def _execute(self, task: WarmingTask) -> None:
+        """Выполнение одной задачи"""
+        logger.info(
+            f"🔥 [{self.worker_id}] Task {task.id}: warming {task.domain_name} "
+            f"({len(task.urls)} URLs, {task.warming_type}, attempt {task.attempts})"
+        )
+
+        heartbeat = None
+        try:
+            # Варианты кэша и способ запроса - текущие настройки домена (могли измениться после постановки).
+            # Внутри try: сбой БД здесь тоже освобождает слот воркера и помечает задачу неудачной
+            options = await db_manager.get_domain_warming_options(task.domain_id)
+            deadline_seconds = None
+            if task.deadline_at is not None:
+                # Задача, простоявшая в очереди до срока, ничего не греет - следующий запуск уже скоро
+                deadline_seconds = max(0.0, (task.deadline_at - datetime.utcnow()).total_seconds())
+            warm_task = asyncio.create_task(
+                warmer.warm_site(task.urls, domain_name=task.domain_name, deadline_seconds=deadline_seconds, **options)
+            )
+            heartbeat = asyncio.create_task(self._heartbeat(task.id, warm_task))
+
+            stats = await warm_task
+        except asyncio.CancelledError:
+            if self._stop.is_set():
+                try:
+                    await db_manager.release_warming_task(task.id, self.worker_id)
+                    logger.info(f"↩️ Task {task.id} returned to queue")
+                except Exception as e:
+                    logger.error(f"Error releasing task {task.id}: {e}")
+            return
+        except Exception as e:
+            logger.error(f"❌ Task {task.id} failed: {e}", exc_info=True)
+            try:
+                await db_manager.fail_warming_task(
+                    task.id, self.worker_id, str(e), self.max_attempts, self.retry_delay
+                )
+            except Exception as db_error:
+                logger.error(f"Error marking task {task.id} as failed: {db_error}")
+            return
+        finally:
+            if heartbeat is not None:
+                heartbeat.cancel()
+            self.running.pop(task.id, None)
+
+        try:
+            await history_writer.submit_warming_result(task.domain_id, stats, warming_type=task.warming_type)
+            if task.job_id:
+                await db_manager.update_job_last_run(task.job_id)
+
+            if await db_manager.complete_warming_task(task.id, self.worker_id, _serialize_stats(stats)):
+                logger.info(f"✅ Task {task.id} completed for {task.domain_name}")
+            else:
+                logger.warning(f"Task {task.id} finished after its lease was lost, result not recorded")
+        except Exception as e:
+            logger.error(f"Error recording result of task {task.id}: {e}", exc_info=True)
+
+
+async def main(event_loop: str = "asyncio"):
+    """Точка входа воркера (event_loop - результат install_event_loop_policy)"""
+    setup_logging()
+    report_event_loop(event_loop)
+
+    await db_manager.init_db()
+    history_writer.start()
+    if config.METRICS_ENABLED:
+        await metrics_server.start(config.METRICS_HOST, config.METRICS_PORT)
+    if config.METRICS_ENABLED or config.LOOP_BLOCK_THRESHOLD_MS > 0:
+        await loop_watchdog.start()
+
+    worker = WarmingWorker()
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker.stop)
+
+    try:
+        await worker.run()
+    finally:
+        warmer.shutdown()
+        await loop_watchdog.stop()
+        await metrics_server.stop()
+        await history_writer.stop()
+        await db_manager.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(install_event_loop_policy()))
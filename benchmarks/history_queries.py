@@ -0,0 +1,209 @@
+"""
+Бенчмарк хранения истории прогревов
+
+Создает в отдельной схеме три варианта таблицы warming_history, заполняет
+каждый одинаковой историей (по умолчанию: год, 200 доменов, прогрев каждые 5 минут)
+и измеряет выборки, которые делает get_warming_history_by_period:
+
+    single      - отдельные индексы по domain_id и started_at (как было)
+    composite   - составной индекс (domain_id, started_at)
+    partitioned - помесячные партиции + составной индекс
+
+Запуск (лучше на отдельной базе - ~21 млн строк на вариант):
+    python -m benchmarks.history_queries --database-url postgresql+asyncpg://...
+    python -m benchmarks.history_queries --days 30 --domains 50 --json
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from app.config import config
+from app.core import partitions
+
+SCHEMA = "siteheater_bench"
+VARIANTS = ("single", "composite", "partitioned")
+PERIODS = {"24h": timedelta(hours=24), "7d": timedelta(days=7), "30d": timedelta(days=30)}
+
+COLUMNS_SQL = """
+    id BIGSERIAL,
+    domain_id INTEGER NOT NULL,
+    started_at TIMESTAMP NOT NULL,
+    completed_at TIMESTAMP NOT NULL,
+    total_requests INTEGER NOT NULL,
+    successful_requests INTEGER NOT NULL,
+    failed_requests INTEGER NOT NULL,
+    timeout_requests INTEGER NOT NULL,
+    avg_response_time DOUBLE PRECISION NOT NULL,
+    min_response_time DOUBLE PRECISION,
+    max_response_time DOUBLE PRECISION,
+    warming_type VARCHAR(50) NOT NULL
+"""
+
+
+def _table(variant: str) -> str:
+    return f"{SCHEMA}.history_{variant}"
+
+
+async def create_variant(engine: AsyncEngine, variant: str, start: datetime, end: datetime) -> None:
+    """Создание таблицы варианта и индексов"""
+    table = _table(variant)
+
+    async with engine.begin() as conn:
+        await conn.execute(text(f"DROP TABLE IF EXISTS {table} CASCADE"))
+
+        if variant == "partitioned":
+            await conn.execute(text(
+                f"CREATE TABLE {table} ({COLUMNS_SQL}, PRIMARY KEY (id, started_at)) "
+                f"PARTITION BY RANGE (started_at)"
+            ))
+            for month in partitions.months_between(start, end):
+                upper = partitions.add_months(month, 1)
+                await conn.execute(text(
+                    f"CREATE TABLE {table}_p{month:%Y%m} PARTITION OF {table} "
+                    f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{upper:%Y-%m-%d}')"
+                ))
+        else:
+            await conn.execute(text(f"CREATE TABLE {table} ({COLUMNS_SQL}, PRIMARY KEY (id))"))
+
+        if variant == "single":
+            await conn.execute(text(f"CREATE INDEX ON {table} (domain_id)"))
+            await conn.execute(text(f"CREATE INDEX ON {table} (started_at)"))
+        else:
+            await conn.execute(text(f"CREATE INDEX ON {table} (domain_id, started_at)"))
+            await conn.execute(text(f"CREATE INDEX ON {table} (started_at)"))
+
+
+async def seed_variant(engine: AsyncEngine, variant: str, domains: int, start: datetime,
+                       end: datetime, interval_minutes: int) -> int:
+    """
+    Заполнение истории на стороне PostgreSQL (generate_series)
+
+    Строки вставляются в порядке времени, как при реальной работе,
+    поэтому записи одного домена физически разбросаны по таблице.
+    """
+    table = _table(variant)
+
+    async with engine.begin() as conn:
+        await conn.execute(text(
+            f"INSERT INTO {table} (domain_id, started_at, completed_at, total_requests, "
+            f"successful_requests, failed_requests, timeout_requests, avg_response_time, "
+            f"min_response_time, max_response_time, warming_type) "
+            f"SELECT d, ts, ts + interval '40 seconds', 200, 190, 6, 4, "
+            f"0.3 + random() * 2, 0.1, 3.0 + random() * 5, 'scheduled' "
+            f"FROM generate_series(CAST(:start AS timestamp), CAST(:end AS timestamp), "
+            f"make_interval(mins => :step)) AS ts "
+            f"CROSS JOIN generate_series(1, :domains) AS d"
+        ), {"start": start, "end": end, "step": interval_minutes, "domains": domains})
+        await conn.execute(text(f"ANALYZE {table}"))
+        return await conn.scalar(text(f"SELECT count(*) FROM {table}"))
+
+
+async def measure_variant(engine: AsyncEngine, variant: str, domains: int, end: datetime,
+                          iterations: int) -> Dict[str, Dict[str, float]]:
+    """Время выборки истории домена за период (мс): p50 / p95 / max"""
+    table = _table(variant)
+    results = {}
+
+    async with engine.connect() as conn:
+        for period_name, period in PERIODS.items():
+            timings: List[float] = []
+            for _ in range(iterations):
+                domain_id = random.randint(1, domains)
+                started = time.perf_counter()
+                await conn.execute(text(
+                    f"SELECT * FROM {table} WHERE domain_id = :domain_id "
+                    f"AND started_at >= :start AND started_at <= :end ORDER BY started_at"
+                ), {"domain_id": domain_id, "start": end - period, "end": end})
+                timings.append((time.perf_counter() - started) * 1000)
+
+            timings.sort()
+            results[period_name] = {
+                "p50_ms": round(statistics.median(timings), 2),
+                "p95_ms": round(timings[int(len(timings) * 0.95) - 1], 2),
+                "max_ms": round(timings[-1], 2),
+            }
+
+    return results
+
+
+async def run(args: argparse.Namespace) -> Dict[str, object]:
+    engine = create_async_engine(args.database_url)
+    end = datetime.utcnow().replace(second=0, microsecond=0)
+    start = end - timedelta(days=args.days)
+    report: Dict[str, object] = {
+        "domains": args.domains,
+        "days": args.days,
+        "interval_minutes": args.interval_minutes,
+        "variants": {},
+    }
+
+    try:
+        async with engine.begin() as conn:
+            await conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {SCHEMA}"))
+
+        for variant in args.variants:
+            await create_variant(engine, variant, start, end)
+
+            seed_started = time.perf_counter()
+            rows = await seed_variant(engine, variant, args.domains, start, end, args.interval_minutes)
+            seed_seconds = time.perf_counter() - seed_started
+
+            report["variants"][variant] = {
+                "rows": rows,
+                "seed_seconds": round(seed_seconds, 1),
+                "queries": await measure_variant(engine, variant, args.domains, end, args.iterations),
+            }
+
+            if not args.keep:
+                async with engine.begin() as conn:
+                    await conn.execute(text(f"DROP TABLE IF EXISTS {_table(variant)} CASCADE"))
+    finally:
+        await engine.dispose()
+
+    return report
+
+
+def print_report(report: Dict[str, object]) -> None:
+    print(
+        f"History benchmark: {report['domains']} domains, {report['days']} days, "
+        f"every {report['interval_minutes']}m"
+    )
+    for variant, data in report["variants"].items():
+        print(f"\n{variant}: {data['rows']} rows (seeded in {data['seed_seconds']}s)")
+        for period_name, timing in data["queries"].items():
+            print(
+                f"  {period_name:>4}: p50 {timing['p50_ms']:8.2f} ms | "
+                f"p95 {timing['p95_ms']:8.2f} ms | max {timing['max_ms']:8.2f} ms"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк выборок warming_history")
+    parser.add_argument("--database-url", default=config.DATABASE_URL)
+    parser.add_argument("--domains", type=int, default=200)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--interval-minutes", type=int, default=5)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--variants", nargs="+", choices=VARIANTS, default=list(VARIANTS))
+    parser.add_argument("--keep", action="store_true", help="Не удалять таблицы после замеров")
+    parser.add_argument("--json", action="store_true", help="Вывод в JSON")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Метрики для бенчмарков: задержка event loop, пиковая память, перцентили
+"""
+import asyncio
+import resource
+import sys
+import time
+from typing import Dict, List, Optional, Sequence
+
+
+def percentile(values: Sequence[float], q: float) -> Optional[float]:
+    """Перцентиль (q от 0 до 100) по ближайшему рангу"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def peak_rss_mb() -> float:
+    """Пиковый RSS текущего процесса в МБ"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux отдает килобайты, macOS - байты
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+class LoopLagMonitor:
+    """
+    Замер задержки event loop
+
+    Фоновая задача засыпает на interval и измеряет, насколько позже она
+    проснулась. Задержка - время, на которое loop был занят синхронной работой.
+    """
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - expected))
+
+    async def __aenter__(self) -> "LoopLagMonitor":
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    def summary(self) -> Dict[str, Optional[float]]:
+        """p50/p99/max задержки в миллисекундах"""
+        def ms(value: Optional[float]) -> Optional[float]:
+            return round(value * 1000, 2) if value is not None else None
+
+        return {
+            "loop_lag_p50_ms": ms(percentile(self.samples, 50)),
+            "loop_lag_p99_ms": ms(percentile(self.samples, 99)),
+            "loop_lag_max_ms": ms(max(self.samples) if self.samples else None),
+        }
+
+
+class Stopwatch:
+    """Секундомер (context manager): время и CPU текущего процесса"""
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.cpu_seconds = 0.0
+
+    def __enter__(self) -> "Stopwatch":
+        self._started = time.perf_counter()
+        self._cpu_started = time.process_time()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.seconds = time.perf_counter() - self._started
+        self.cpu_seconds = time.process_time() - self._cpu_started
@@ -0,0 +1,258 @@
+"""
+Локальный HTTP-сервер, подменяющий сайт клиента в бенчмарках
+
+Имитирует кэш сайта: первый запрос страницы (или запрос после истечения
+TTL) отвечает с холодной задержкой, повторные - с теплой. Часть ответов
+может быть 429 или зависать дольше таймаута клиента. Каждая страница
+содержит ссылки на дочерние (/p/N -> /p/N*fanout+1 ...), есть /sitemap.xml -
+по сайту можно пройти краулером. На Accept-Encoding с gzip страница
+отдается сжатой (Vary: Accept-Encoding), и кэш у сжатой и несжатой версий
+раздельный, как у CDN.
+
+Запускается в нескольких процессах на одном порту (SO_REUSEPORT), чтобы
+сам сервер не упирался в одно ядро раньше прогревщика. Кэш у каждого
+процесса свой (как у разных узлов CDN).
+
+    python -m benchmarks.mock_origin --port 8099 --server-processes 4 --cold-latency-ms 300 --warm-latency-ms 20 --ttl 60
+"""
+import argparse
+import asyncio
+import gzip
+import multiprocessing
+import random
+import socket
+import time
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+
+# Заголовок со временем, которое сервер "потратил" на ответ (для расчета накладных расходов клиента)
+ORIGIN_LATENCY_HEADER = "X-Origin-Latency-Ms"
+
+
+def _make_app(behavior: Dict[str, Any]) -> web.Application:
+    fanout = behavior["fanout"]
+    ttl = behavior["ttl"]
+    rng = random.Random(behavior["seed"])
+    cached_at: Dict[str, float] = {}  # path + кодировка -> время "кэширования"
+    compressed: Dict[str, bytes] = {}  # path -> gzip-тело
+    # Сжимается примерно как обычный HTML (в разы, но не в сотни раз)
+    words = [
+        "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(2, 10)))
+        for _ in range(500)
+    ]
+    padding = " ".join(rng.choice(words) for _ in range(behavior["body_size"] // 6)).encode()[:behavior["body_size"]]
+
+    def page_body(path: str) -> bytes:
+        try:
+            page = int(path.rsplit("/", 1)[-1]) if path.startswith("/p/") else 0
+        except ValueError:
+            page = 0
+        links = "".join(
+            f'<a href="/p/{page * fanout + i}">page {page * fanout + i}</a>'
+            for i in range(1, fanout + 1)
+        )
+        return b"<html><body>" + links.encode() + b"<!--" + padding + b"--></body></html>"
+
+    async def handle(request: web.Request) -> web.Response:
+        path = request.path
+
+        if behavior["rate_timeout"] and rng.random() < behavior["rate_timeout"]:
+            await asyncio.sleep(behavior["hang_seconds"])
+        if behavior["rate_429"] and rng.random() < behavior["rate_429"]:
+            return web.Response(status=429, headers={"Retry-After": "1", ORIGIN_LATENCY_HEADER: "0"})
+
+        encoding = "gzip" if "gzip" in request.headers.get("Accept-Encoding", "") else "identity"
+        cache_key = f"{path}|{encoding}"
+        now = time.monotonic()
+        hit = cache_key in cached_at and (not ttl or now - cached_at[cache_key] < ttl)
+        latency_ms = behavior["warm_latency_ms"] if hit else behavior["cold_latency_ms"]
+        if not hit:
+            cached_at[cache_key] = now
+        if latency_ms:
+            await asyncio.sleep(latency_ms / 1000)
+
+        headers = {
+            ORIGIN_LATENCY_HEADER: str(latency_ms),
+            "X-Cache": "HIT" if hit else "MISS",
+            "ETag": f'"{path}"' if encoding == "identity" else f'"{path}-{encoding}"',
+            "Vary": "Accept-Encoding",
+        }
+        # Ревалидация: кэш свежий - 304 без тела
+        if hit and request.headers.get("If-None-Match") == headers["ETag"]:
+            return web.Response(status=304, headers=headers)
+        body = page_body(path)
+        if encoding == "gzip":
+            if path not in compressed:
+                compressed[path] = gzip.compress(body, compresslevel=6)
+            body = compressed[path]
+            headers["Content-Encoding"] = "gzip"
+        return web.Response(body=body, content_type="text/html", headers=headers)
+
+    async def sitemap(request: web.Request) -> web.Response:
+        base = f"{request.scheme}://{request.host}"
+        locs = "".join(f"<url><loc>{base}/p/{i}</loc></url>" for i in range(behavior["sitemap_size"]))
+        return web.Response(
+            text=f'<?xml version="1.0"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{locs}</urlset>',
+            content_type="application/xml",
+        )
+
+    app = web.Application()
+    app.router.add_get("/sitemap.xml", sitemap)
+    app.router.add_get("/{tail:.*}", handle)
+    return app
+
+
+def _serve(host: str, port: int, behavior: Dict[str, Any]) -> None:
+    """Процесс сервера"""
+    async def run() -> None:
+        runner = web.AppRunner(_make_app(behavior), access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, host, port, reuse_port=True, backlog=4096)
+        await site.start()
+        await asyncio.Event().wait()
+
+    asyncio.run(run())
+
+
+def _wait_port(host: str, port: int, timeout: float = 10.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"Mock origin did not start on {host}:{port}")
+
+
+class MockOrigin:
+    """Мок-сервер в отдельных процессах (context manager)"""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 8099,
+        processes: int = 1,
+        body_size: int = 8192,
+        cold_latency_ms: float = 0,
+        warm_latency_ms: float = 0,
+        ttl: float = 0,
+        rate_429: float = 0,
+        rate_timeout: float = 0,
+        hang_seconds: float = 60,
+        fanout: int = 10,
+        sitemap_size: int = 0,
+        seed: int = 0,
+    ):
+        """
+        Args:
+            cold_latency_ms: Задержка ответа при промахе кэша
+            warm_latency_ms: Задержка ответа из кэша
+            ttl: Время жизни кэша страницы в секундах (0 = вечно)
+            rate_429: Доля ответов 429
+            rate_timeout: Доля запросов, зависающих на hang_seconds
+            fanout: Ссылок на дочерние страницы на каждой странице
+            sitemap_size: URL в /sitemap.xml (0 = пустой sitemap)
+        """
+        self.host = host
+        self.port = port
+        self.processes = processes
+        self.behavior = {
+            "body_size": body_size,
+            "cold_latency_ms": cold_latency_ms,
+            "warm_latency_ms": warm_latency_ms,
+            "ttl": ttl,
+            "rate_429": rate_429,
+            "rate_timeout": rate_timeout,
+            "hang_seconds": hang_seconds,
+            "fanout": fanout,
+            "sitemap_size": sitemap_size,
+            "seed": seed,
+        }
+        self._procs: List[multiprocessing.Process] = []
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def urls(self, count: int) -> List[str]:
+        """Список уникальных URL сайта"""
+        return [f"{self.base_url}/p/{i}" for i in range(count)]
+
+    def start(self) -> "MockOrigin":
+        ctx = multiprocessing.get_context("spawn")
+        for i in range(self.processes):
+            behavior = dict(self.behavior, seed=self.behavior["seed"] + i)
+            proc = ctx.Process(
+                target=_serve,
+                args=(self.host, self.port, behavior),
+                daemon=True,
+            )
+            proc.start()
+            self._procs.append(proc)
+        _wait_port(self.host, self.port)
+        return self
+
+    def stop(self) -> None:
+        for proc in self._procs:
+            proc.terminate()
+        for proc in self._procs:
+            proc.join(timeout=5)
+        self._procs = []
+
+    def __enter__(self) -> "MockOrigin":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def add_origin_arguments(parser: argparse.ArgumentParser) -> None:
+    """Общие параметры мок-сервера для CLI бенчмарков"""
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--server-processes", type=int, default=1)
+    parser.add_argument("--body-size", type=int, default=8192)
+    parser.add_argument("--cold-latency-ms", type=float, default=0)
+    parser.add_argument("--warm-latency-ms", type=float, default=0)
+    parser.add_argument("--ttl", type=float, default=0)
+    parser.add_argument("--rate-429", type=float, default=0)
+    parser.add_argument("--rate-timeout", type=float, default=0)
+    parser.add_argument("--hang-seconds", type=float, default=60)
+
+
+def origin_from_args(args: argparse.Namespace, **overrides: Any) -> MockOrigin:
+    """MockOrigin по параметрам из add_origin_arguments"""
+    params = dict(
+        port=args.port,
+        processes=args.server_processes,
+        body_size=args.body_size,
+        cold_latency_ms=args.cold_latency_ms,
+        warm_latency_ms=args.warm_latency_ms,
+        ttl=args.ttl,
+        rate_429=args.rate_429,
+        rate_timeout=args.rate_timeout,
+        hang_seconds=args.hang_seconds,
+    )
+    params.update(overrides)
+    return MockOrigin(**params)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Мок-сервер сайта для бенчмарков")
+    parser.add_argument("--host", default="127.0.0.1")
+    add_origin_arguments(parser)
+    parser.add_argument("--sitemap-size", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    with origin_from_args(args, host=args.host, sitemap_size=args.sitemap_size) as origin:
+        print(f"Mock origin on {origin.base_url} ({origin.processes} processes), Ctrl+C to stop")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
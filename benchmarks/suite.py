@@ -0,0 +1,437 @@
+"""
+Набор нагрузочных бенчмарков SiteHeater
+
+Сценарии (каждый в отдельном процессе - пиковая память не смешивается):
+
+    warm     - SiteWarmer.warm_site против мок-сервера с холодным/теплым кэшем
+    encoding - CPU прогрева на 10k запросов: сжатое тело без распаковки
+               (как в SiteWarmer) против распаковки, как делал httpx.get
+    crawl    - SitemapParser.crawl_site по сайту-дереву мок-сервера
+    grouper  - URLGrouper.group_urls / get_group_stats на синтетических URL
+    reports  - ReportGenerator.generate_admin_report / generate_hourly_admin_report
+               на данных в памяти (с имитацией задержки БД на каждый запрос)
+
+Для каждого сценария: время, пропускная способность, p99 накладных расходов
+клиента (время запроса минус задержка, которую выставил сервер), задержка
+event loop и пиковый RSS. Результат - JSON, прогоны сравниваются через --compare.
+
+    python -m benchmarks.suite --output bench.json
+    python -m benchmarks.suite --scenarios warm --warm-urls 100000 --cold-latency-ms 200 --warm-latency-ms 10
+    python -m benchmarks.suite --compare bench.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import random
+import subprocess
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional
+
+from benchmarks.metrics import LoopLagMonitor, Stopwatch, peak_rss_mb, percentile
+from benchmarks.mock_origin import ORIGIN_LATENCY_HEADER, add_origin_arguments, origin_from_args
+
+SCENARIOS = ("warm", "encoding", "crawl", "grouper", "reports")
+
+# Метрики, где больше - лучше (для --compare)
+HIGHER_IS_BETTER = {
+    "rps", "raw_rps", "decoded_rps", "cpu_ms_saved_per_10k",
+    "pages_per_second", "urls_per_second", "reports_per_second",
+}
+
+
+# === warm ===
+
+class _RecordingFetcher:
+    """Обертка fetcher'а прогрева, которая записывает накладные расходы каждого запроса"""
+
+    def __init__(self, fetcher, samples: List[float]):
+        self._fetcher = fetcher
+        self._samples = samples
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._fetcher, name)
+
+    async def fetch(self, url: str, headers, timeout: float) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        response = await self._fetcher.fetch(url, headers, timeout)
+        origin_seconds = float(response["headers"].get(ORIGIN_LATENCY_HEADER, 0)) / 1000
+        self._samples.append(loop.time() - started - origin_seconds)
+        return response
+
+
+async def scenario_warm(params: Dict[str, Any]) -> Dict[str, Any]:
+    from app.core.warmer import SiteWarmer
+
+    class RecordingWarmer(SiteWarmer):
+        samples: List[float] = []
+
+        async def warm_url(self, url, fetcher, *args, **kwargs):
+            return await super().warm_url(url, _RecordingFetcher(fetcher, self.samples), *args, **kwargs)
+
+    warmer = RecordingWarmer(
+        concurrency=params["concurrency"],
+        min_delay=0,
+        max_delay=0,
+        repeat_count=params["repeat"],
+        timeout=params["timeout"],
+        processes=params["processes"],
+        revalidate=params["revalidate"],
+        verify_hot=params["verify_hot"],
+    )
+    urls = [f"{params['base_url']}/p/{i}" for i in range(params["urls"])]
+
+    try:
+        async with LoopLagMonitor() as lag:
+            with Stopwatch() as watch:
+                stats = await warmer.warm_site(urls, domain_name="bench")
+    finally:
+        warmer.shutdown()
+
+    overhead = RecordingWarmer.samples
+    return {
+        "urls": len(urls),
+        "requests": stats["total_requests"],
+        "success": stats["success"],
+        "timeout": stats["timeout"],
+        "error": stats["error"],
+        "revalidated": stats["revalidated"],
+        "repeat_requests": stats["repeat_requests"],
+        "still_cold": stats["still_cold"],
+        "bytes_received": stats["bytes_received"],
+        "bytes_saved": stats["bytes_saved"],
+        "seconds": round(watch.seconds, 2),
+        "rps": round(stats["total_requests"] / watch.seconds, 1),
+        # CPU основного процесса (дочерние процессы прогрева не учитываются)
+        "cpu_ms_per_10k": round(watch.cpu_seconds / stats["total_requests"] * 10000 * 1000, 1) if stats["total_requests"] else None,
+        # В режиме нескольких процессов запросы идут в дочерних процессах и здесь не видны
+        "overhead_p50_ms": round(percentile(overhead, 50) * 1000, 2) if overhead else None,
+        "overhead_p99_ms": round(percentile(overhead, 99) * 1000, 2) if overhead else None,
+        **lag.summary(),
+    }
+
+
+# === encoding ===
+
+async def scenario_encoding(params: Dict[str, Any]) -> Dict[str, Any]:
+    from app.core.fetchers import HttpxFetcher
+    from app.core.warmer import SiteWarmer
+
+    class DecodingFetcher(HttpxFetcher):
+        """Чтение тела с распаковкой (поведение client.get)"""
+
+        async def _discard_body(self, response) -> None:
+            await response.aread()
+
+    class DecodingWarmer(SiteWarmer):
+        def _create_fetcher(self, name=None):
+            return DecodingFetcher()
+
+    urls = [f"{params['base_url']}/p/{i}" for i in range(params["urls"])]
+    variant = f"desktop@{params['encoding']}"
+    settings = dict(concurrency=params["concurrency"], min_delay=0, max_delay=0, repeat_count=1, processes=1)
+
+    # Первый проход прогревает кэш мок-сервера: дальше оба режима получают одинаковые ответы
+    await SiteWarmer(**settings).warm_site(urls, domain_name="bench", variants=[variant])
+
+    result: Dict[str, Any] = {"urls": len(urls), "encoding": params["encoding"]}
+    for mode, warmer_class in (("raw", SiteWarmer), ("decoded", DecodingWarmer)):
+        with Stopwatch() as watch:
+            stats = await warmer_class(**settings).warm_site(urls, domain_name="bench", variants=[variant])
+        requests = stats["total_requests"] or 1
+        result[f"{mode}_cpu_ms_per_10k"] = round(watch.cpu_seconds / requests * 10000 * 1000, 1)
+        result[f"{mode}_rps"] = round(requests / watch.seconds, 1)
+        result[f"{mode}_bytes_per_request"] = round(stats["bytes_received"] / requests)
+
+    result["cpu_ms_saved_per_10k"] = round(result["decoded_cpu_ms_per_10k"] - result["raw_cpu_ms_per_10k"], 1)
+    return result
+
+
+# === crawl ===
+
+async def scenario_crawl(params: Dict[str, Any]) -> Dict[str, Any]:
+    from app.utils.sitemap import SitemapParser
+
+    parser = SitemapParser(timeout=params["timeout"])
+    async with LoopLagMonitor() as lag:
+        with Stopwatch() as watch:
+            urls = await parser.crawl_site(params["base_url"], max_depth=params["depth"], max_pages=params["pages"])
+
+    return {
+        "pages": len(urls),
+        "seconds": round(watch.seconds, 2),
+        "pages_per_second": round(len(urls) / watch.seconds, 1) if watch.seconds else None,
+        **lag.summary(),
+    }
+
+
+# === grouper ===
+
+def _synthetic_urls(domain: str, count: int, seed: int = 0) -> List[str]:
+    """URL интернет-магазина: главная, категории, блог, товары"""
+    rng = random.Random(seed)
+    patterns = (
+        "/collections/{a}", "/collections/{a}/products/{b}", "/products/{b}",
+        "/blogs/news/{b}", "/pages/{a}", "/catalog/{a}/{b}", "/search?q={b}",
+    )
+    urls = [f"https://{domain}/"]
+    for i in range(count - 1):
+        path = rng.choice(patterns).format(a=f"cat-{rng.randrange(200)}", b=f"item-{i}")
+        urls.append(f"https://{domain}{path}")
+    return urls
+
+
+async def scenario_grouper(params: Dict[str, Any]) -> Dict[str, Any]:
+    from app.utils.url_grouper import url_grouper
+
+    domain = "bench.example.com"
+    urls = _synthetic_urls(domain, params["urls"])
+
+    async with LoopLagMonitor() as lag:
+        # Отдаем управление, чтобы монитор успел начать замер
+        await asyncio.sleep(0.05)
+        with Stopwatch() as watch:
+            groups = url_grouper.group_urls(urls, domain)
+            url_grouper.get_group_stats(urls, domain)
+        await asyncio.sleep(0.05)
+
+    return {
+        "urls": len(urls),
+        "group_sizes": {str(group): len(items) for group, items in groups.items()},
+        "seconds": round(watch.seconds, 3),
+        "urls_per_second": round(2 * len(urls) / watch.seconds, 1) if watch.seconds else None,
+        **lag.summary(),
+    }
+
+
+# === reports ===
+
+class _InMemoryReportData:
+    """Источник данных для ReportGenerator вместо БД (с задержкой на каждый запрос)"""
+
+    def __init__(self, domains: int, urls_per_domain: int, interval_minutes: int, latency_ms: float):
+        self.latency = latency_ms / 1000
+        self.queries = 0
+        now = datetime.utcnow()
+        rng = random.Random(0)
+
+        self.domains = []
+        self.jobs = []
+        self.history: Dict[int, List[SimpleNamespace]] = {}
+        for domain_id in range(1, domains + 1):
+            name = f"shop{domain_id}.example.com"
+            self.domains.append(SimpleNamespace(
+                id=domain_id,
+                name=name,
+                urls=[SimpleNamespace(url=url) for url in _synthetic_urls(name, urls_per_domain, seed=domain_id)],
+            ))
+            self.jobs.append(SimpleNamespace(domain_id=domain_id, active_url_group=rng.choice((1, 2, 3))))
+            self.history[domain_id] = [
+                SimpleNamespace(
+                    started_at=now - timedelta(minutes=interval_minutes * i),
+                    total_requests=urls_per_domain,
+                    successful_requests=urls_per_domain - rng.randrange(5),
+                    failed_requests=rng.randrange(3),
+                    timeout_requests=rng.randrange(2),
+                    avg_response_time=rng.uniform(0.2, 3.0),
+                )
+                for i in range(24 * 60 // interval_minutes)
+            ]
+
+    async def _query(self) -> None:
+        self.queries += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    async def get_all_domains(self, user_id: Optional[int] = None):
+        await self._query()
+        return self.domains
+
+    async def get_active_jobs(self):
+        await self._query()
+        return self.jobs
+
+    async def get_warming_history_by_period(self, domain_id: int, start_date: datetime, end_date: datetime):
+        await self._query()
+        return [h for h in self.history.get(domain_id, []) if start_date <= h.started_at <= end_date]
+
+
+async def scenario_reports(params: Dict[str, Any]) -> Dict[str, Any]:
+    from app.core import reports
+
+    data = _InMemoryReportData(
+        domains=params["domains"],
+        urls_per_domain=params["urls_per_domain"],
+        interval_minutes=params["interval_minutes"],
+        latency_ms=params["db_latency_ms"],
+    )
+    reports.db_manager = data
+    generator = reports.ReportGenerator()
+
+    async with LoopLagMonitor() as lag:
+        with Stopwatch() as watch:
+            daily = await generator.generate_admin_report()
+            hourly = await generator.generate_hourly_admin_report()
+
+    return {
+        "domains": params["domains"],
+        "db_queries": data.queries,
+        "report_chars": len(daily) + len(hourly),
+        "seconds": round(watch.seconds, 3),
+        "reports_per_second": round(2 / watch.seconds, 2) if watch.seconds else None,
+        **lag.summary(),
+    }
+
+
+SCENARIO_FUNCTIONS: Dict[str, Callable] = {
+    "warm": scenario_warm,
+    "encoding": scenario_encoding,
+    "crawl": scenario_crawl,
+    "grouper": scenario_grouper,
+    "reports": scenario_reports,
+}
+
+
+def _run_scenario(name: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Выполнение сценария в дочернем процессе"""
+    logging.basicConfig(level=logging.WARNING)
+    result = asyncio.run(SCENARIO_FUNCTIONS[name](params))
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+def run_isolated(name: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Сценарий в свежем процессе (своя пиковая память)"""
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(_run_scenario, name, params).result()
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    report: Dict[str, Any] = {
+        "meta": {
+            "started_at": datetime.utcnow().isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "scenarios": {},
+    }
+
+    for name in args.scenarios:
+        if name == "warm":
+            params = {
+                "urls": args.warm_urls,
+                "concurrency": args.concurrency,
+                "repeat": args.repeat,
+                "timeout": args.timeout,
+                "processes": args.warm_processes,
+                "revalidate": args.revalidate,
+                "verify_hot": not args.blind_repeats,
+            }
+            with origin_from_args(args) as origin:
+                result = run_isolated(name, dict(params, base_url=origin.base_url))
+        elif name == "encoding":
+            params = {"urls": args.warm_urls, "concurrency": args.concurrency, "encoding": args.encoding}
+            # Только накладные расходы клиента: без задержек и ошибок сервера
+            with origin_from_args(args, cold_latency_ms=0, warm_latency_ms=0, rate_429=0, rate_timeout=0) as origin:
+                result = run_isolated(name, dict(params, base_url=origin.base_url))
+        elif name == "crawl":
+            params = {"pages": args.crawl_pages, "depth": args.crawl_depth, "timeout": args.timeout}
+            with origin_from_args(args, rate_429=0, rate_timeout=0) as origin:
+                result = run_isolated(name, dict(params, base_url=origin.base_url))
+        elif name == "grouper":
+            params = {"urls": args.grouper_urls}
+            result = run_isolated(name, params)
+        else:
+            params = {
+                "domains": args.report_domains,
+                "urls_per_domain": args.report_urls,
+                "interval_minutes": 5,
+                "db_latency_ms": args.db_latency_ms,
+            }
+            result = run_isolated(name, params)
+
+        result["params"] = params
+        report["scenarios"][name] = result
+        print(f"✓ {name}: {json.dumps({k: v for k, v in result.items() if k != 'params'})}", file=sys.stderr)
+
+    return report
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    """Сравнение двух прогонов по числовым метрикам"""
+    print(f"Baseline {baseline['meta'].get('commit')} → current {current['meta'].get('commit')}")
+    for name, metrics in current["scenarios"].items():
+        base_metrics = baseline["scenarios"].get(name)
+        if not base_metrics:
+            continue
+        print(f"\n{name}:")
+        for key, value in metrics.items():
+            base_value = base_metrics.get(key)
+            if not isinstance(value, (int, float)) or not isinstance(base_value, (int, float)) or not base_value:
+                continue
+            change = (value - base_value) / base_value * 100
+            better = change > 0 if key in HIGHER_IS_BETTER else change < 0
+            marker = "✅" if better else ("⚠️" if abs(change) >= 10 else "  ")
+            print(f"  {marker} {key:<20} {base_value:>12} → {value:<12} ({change:+.1f}%)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Нагрузочные бенчмарки SiteHeater")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    add_origin_arguments(parser)
+    parser.add_argument("--timeout", type=int, default=30)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=2, help="Повторы warm_site (1-й холодный, далее теплые)")
+    parser.add_argument("--warm-urls", type=int, default=10000)
+    parser.add_argument("--warm-processes", type=int, default=1)
+    parser.add_argument("--revalidate", action="store_true", help="Условные запросы (ETag) в warm")
+    parser.add_argument("--blind-repeats", action="store_true", help="Повторы всех URL в warm (без проверки, горячий ли URL)")
+    parser.add_argument("--encoding", default="gzip", help="Кодировка ответа в encoding (Accept-Encoding)")
+    parser.add_argument("--crawl-pages", type=int, default=2000)
+    parser.add_argument("--crawl-depth", type=int, default=5)
+    parser.add_argument("--grouper-urls", type=int, default=1000000)
+    parser.add_argument("--report-domains", type=int, default=200)
+    parser.add_argument("--report-urls", type=int, default=1000)
+    parser.add_argument("--db-latency-ms", type=float, default=1.0, help="Имитация задержки БД на запрос")
+    parser.add_argument("--output", help="Сохранить результат в JSON-файл")
+    parser.add_argument("--compare", help="Сравнить с сохраненным прогоном")
+    args = parser.parse_args()
+
+    # Логи по каждому URL сами по себе съедают CPU - в бенчмарке они не нужны
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    # Каждый вариант греет те же URL - окно дедупликации исказило бы замеры
+    os.environ.setdefault("WARMER_DEDUP_WINDOW_SECONDS", "0")
+
+    report = run(args)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare(report, json.load(f))
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
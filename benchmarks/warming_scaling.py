@@ -0,0 +1,116 @@
+"""
+Бенчмарк масштабирования прогрева по процессам (WARMER_PROCESSES)
+
+Поднимает локальный мок-сервер и прогревает один и тот же набор URL
+с разным числом процессов SiteWarmer. Задержки между запросами выключены,
+общая конкурентность одинакова для всех вариантов - меняется только то,
+сколько ядер разбирают TLS/HTTP/логирование.
+
+    python -m benchmarks.warming_scaling --urls 20000 --processes 1 2 4
+    python -m benchmarks.warming_scaling --json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Dict, List
+
+from benchmarks.mock_origin import add_origin_arguments, origin_from_args
+
+
+async def measure(urls: List[str], processes: int, concurrency: int) -> Dict[str, float]:
+    """Прогрев URL заданным числом процессов"""
+    # Импорт здесь: app.config читает окружение, которое main() задает для бенчмарка
+    from app.core.warmer import SiteWarmer
+
+    warmer = SiteWarmer(
+        concurrency=concurrency,
+        min_delay=0,
+        max_delay=0,
+        repeat_count=1,
+        timeout=30,
+        processes=processes,
+    )
+    try:
+        if processes > 1:
+            # Прогреваем пул, чтобы не мерить запуск процессов
+            await warmer.warm_site(urls[:processes * 2], domain_name="bench")
+
+        started = time.perf_counter()
+        stats = await warmer.warm_site(urls, domain_name="bench")
+        elapsed = time.perf_counter() - started
+    finally:
+        warmer.shutdown()
+
+    return {
+        "processes": processes,
+        "seconds": round(elapsed, 2),
+        "requests": stats["total_requests"],
+        "success": stats["success"],
+        "rps": round(stats["total_requests"] / elapsed, 1),
+    }
+
+
+async def run(args: argparse.Namespace) -> Dict[str, object]:
+    report: Dict[str, object] = {
+        "urls": args.urls,
+        "concurrency": args.concurrency,
+        "cpu_count": os.cpu_count(),
+        "results": [],
+    }
+
+    with origin_from_args(args) as origin:
+        urls = origin.urls(args.urls)
+        for processes in args.processes:
+            report["results"].append(await measure(urls, processes, args.concurrency))
+
+    baseline = report["results"][0]["rps"] if report["results"] else 0
+    for result in report["results"]:
+        result["speedup"] = round(result["rps"] / baseline, 2) if baseline else None
+
+    return report
+
+
+def print_report(report: Dict[str, object]) -> None:
+    print(
+        f"Warming scaling: {report['urls']} URLs, concurrency {report['concurrency']}, "
+        f"{report['cpu_count']} CPUs"
+    )
+    for result in report["results"]:
+        print(
+            f"  {result['processes']:>2} proc: {result['seconds']:7.2f}s | "
+            f"{result['rps']:9.1f} req/s | x{result['speedup']} | "
+            f"ok {result['success']}/{result['requests']}"
+        )
+
+
+def main() -> None:
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="Бенчмарк прогрева в нескольких процессах")
+    parser.add_argument("--urls", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--processes", type=int, nargs="+",
+                        default=sorted({1, 2, 4, cpus} & set(range(1, cpus + 1))))
+    add_origin_arguments(parser)
+    parser.set_defaults(server_processes=cpus)
+    parser.add_argument("--json", action="store_true", help="Вывод в JSON")
+    args = parser.parse_args()
+
+    # Логи по каждому URL сами по себе съедают CPU - в бенчмарке они не нужны
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    # Каждый вариант греет те же URL - окно дедупликации исказило бы замеры
+    os.environ.setdefault("WARMER_DEDUP_WINDOW_SECONDS", "0")
+    logging.basicConfig(level=logging.WARNING)
+
+    report = asyncio.run(run(args))
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Тесты circuit breaker прогрева (app.core.circuit_breaker)
+"""
+import pytest
+
+from app.core import circuit_breaker
+from app.core.circuit_breaker import (
+    CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitBreakerRegistry, origin_of, strictest_states,
+)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", clock)
+    return clock
+
+
+def _breaker(threshold=3, recovery=30):
+    return CircuitBreaker("https://example.com", threshold, recovery)
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = _breaker()
+
+    assert breaker.record_failure() is False
+    assert breaker.record_failure() is False
+    assert breaker.record_failure() is True
+
+    assert breaker.state == OPEN
+    assert breaker.allow_request() is False
+
+
+def test_success_resets_failure_streak(clock):
+    breaker = _breaker()
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+
+    assert breaker.state == CLOSED
+    assert breaker.consecutive_failures == 1
+
+
+def test_half_open_allows_a_single_probe(clock):
+    breaker = _breaker()
+    for _ in range(3):
+        breaker.record_failure()
+
+    clock.now += 29
+    assert breaker.allow_request() is False
+
+    clock.now += 1
+    assert breaker.allow_request() is True
+    assert breaker.state == HALF_OPEN
+    # Пока проба в полете - остальные запросы отсекаются
+    assert breaker.allow_request() is False
+
+
+def test_successful_probe_closes(clock):
+    breaker = _breaker()
+    for _ in range(3):
+        breaker.record_failure()
+    clock.now += 30
+    breaker.allow_request()
+
+    breaker.record_success()
+
+    assert breaker.state == CLOSED
+    assert breaker.allow_request() is True
+
+
+def test_failed_probe_reopens_without_new_trip(clock):
+    breaker = _breaker()
+    for _ in range(3):
+        breaker.record_failure()
+    clock.now += 30
+    breaker.allow_request()
+
+    assert breaker.record_failure() is False
+    assert breaker.state == OPEN
+    assert breaker.trips == 1
+    clock.now += 29
+    assert breaker.allow_request() is False
+
+
+def test_released_probe_can_be_retried(clock):
+    breaker = _breaker()
+    for _ in range(3):
+        breaker.record_failure()
+    clock.now += 30
+    breaker.allow_request()
+
+    breaker.release()
+
+    assert breaker.allow_request() is True
+
+
+def test_registry_groups_by_origin_and_can_be_disabled():
+    registry = CircuitBreakerRegistry(failure_threshold=2, recovery_seconds=10)
+
+    assert registry.get("https://example.com/a") is registry.get("https://example.com/b?x=1")
+    assert registry.get("https://example.com/") is not registry.get("http://example.com/")
+    assert origin_of("https://example.com:8443/path") == "https://example.com:8443"
+    assert not CircuitBreakerRegistry(failure_threshold=0).enabled
+
+
+def test_state_survives_export_and_load(clock):
+    parent = CircuitBreakerRegistry(failure_threshold=4, recovery_seconds=30)
+    breaker = parent.get("https://example.com/")
+    for _ in range(4):
+        breaker.record_failure()
+    clock.now += 10
+
+    shard = CircuitBreakerRegistry(failure_threshold=2, recovery_seconds=30)
+    shard.load(parent.export(["https://example.com"]))
+    restored = shard.get("https://example.com/")
+
+    assert restored.state == OPEN
+    assert restored.failure_threshold == 2
+    clock.now += 19
+    assert restored.allow_request() is False
+    clock.now += 1
+    assert restored.allow_request() is True
+
+
+def test_strictest_state_wins():
+    closed = {"https://a.example": (CLOSED, 1, None), "https://b.example": (CLOSED, 0, None)}
+    opened = {"https://a.example": (OPEN, 5, 3.0), "https://b.example": (CLOSED, 2, None)}
+    reopened = {"https://a.example": (OPEN, 6, 1.0)}
+
+    merged = strictest_states([closed, opened, reopened])
+
+    assert merged["https://a.example"] == (OPEN, 6, 1.0)
+    assert merged["https://b.example"] == (CLOSED, 2, None)
@@ -0,0 +1,82 @@
+"""
+Тесты подготовки данных графиков (app.utils.graph)
+"""
+import math
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from app.utils.graph import GraphGenerator, lttb_indices
+
+
+def test_lttb_keeps_short_series_untouched():
+    xs = list(range(5))
+    assert lttb_indices(xs, xs, 10) == [0, 1, 2, 3, 4]
+    assert lttb_indices(xs, xs, 2) == [0, 1, 2, 3, 4]
+
+
+def test_lttb_returns_threshold_sorted_indices_with_endpoints():
+    xs = list(range(1000))
+    ys = [math.sin(x / 20) for x in xs]
+
+    indices = lttb_indices(xs, ys, 50)
+
+    assert len(indices) == 50
+    assert indices[0] == 0 and indices[-1] == 999
+    assert indices == sorted(set(indices))
+
+
+def test_lttb_keeps_spikes():
+    xs = list(range(500))
+    ys = [0.0] * 500
+    ys[123] = 10.0
+    ys[377] = -10.0
+
+    indices = lttb_indices(xs, ys, 20)
+
+    assert 123 in indices
+    assert 377 in indices
+
+
+def _point(hour, avg_time, successful, warmings=None):
+    point = SimpleNamespace(
+        started_at=datetime(2026, 1, 1) + timedelta(hours=hour),
+        avg_response_time=avg_time,
+        successful_requests=successful,
+        total_requests=10,
+    )
+    if warmings is not None:
+        point.warmings_count = warmings
+    return point
+
+
+def test_summary_of_raw_history_counts_each_warming():
+    history = [_point(0, 1.0, 10), _point(1, 3.0, 5)]
+
+    summary = GraphGenerator().prepare_data(history, "example.com")["summary"]
+
+    assert summary["measurements"] == 2
+    assert summary["mean_time"] == 2.0
+    assert summary["mean_success"] == 75.0
+
+
+def test_summary_of_rollups_is_weighted_by_warmings():
+    history = [_point(0, 1.0, 10, warmings=9), _point(1, 3.0, 0, warmings=1)]
+
+    summary = GraphGenerator().prepare_data(history, "example.com")["summary"]
+
+    assert summary["measurements"] == 10
+    assert math.isclose(summary["mean_time"], 1.2)
+    assert math.isclose(summary["mean_success"], 90.0)
+    assert summary["min_time"] == 1.0 and summary["max_time"] == 3.0
+
+
+def test_long_series_is_downsampled_but_summarized_in_full():
+    generator = GraphGenerator()
+    generator.max_points = 20
+    history = [_point(hour, 1.0 + hour % 7, 10) for hour in range(200)]
+
+    data = generator.prepare_data(history, "example.com")
+
+    assert len(data["timestamps"]) == 20
+    assert len(data["avg_times"]) == len(data["success_rates"]) == 20
+    assert data["summary"]["measurements"] == 200
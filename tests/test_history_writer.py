@@ -0,0 +1,124 @@
+"""
+Тесты записи истории (app.core.history_writer): отделение отвергнутых
+записей и дозапись отложенного на диск
+"""
+import asyncio
+import json
+import os
+
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from app.core.history_writer import HistoryWriter
+
+KIND = "test"
+
+
+class FakeTable:
+    """Обработчик пакета: пакет целиком в одной транзакции, как save_warming_results_batch"""
+
+    def __init__(self, bad_ids=(), down=False):
+        self.bad_ids = set(bad_ids)
+        self.down = down
+        self.rows = []
+        self.calls = 0
+
+    async def __call__(self, rows):
+        self.calls += 1
+        if self.down:
+            raise OperationalError("INSERT", {}, ConnectionError("connection refused"))
+        if any(row["id"] in self.bad_ids for row in rows):
+            raise IntegrityError("INSERT", {}, Exception("foreign key violation"))
+        self.rows.extend(rows)
+
+
+def _writer(tmp_path, table, batch_size=100):
+    writer = HistoryWriter(batch_size=batch_size, spill_path=str(tmp_path / "spill.jsonl"))
+    writer.spill_retry_interval = 0
+    writer.register_handler(KIND, table)
+    return writer
+
+
+def _rows(count):
+    return [{"id": i} for i in range(count)]
+
+
+def _read_ids(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line)["row"]["id"] for line in f if line.strip()]
+
+
+def test_write_isolates_rejected_rows(tmp_path):
+    table = FakeTable(bad_ids={3, 11})
+    writer = _writer(tmp_path, table)
+
+    failed = asyncio.run(writer._write(KIND, _rows(16)))
+
+    assert failed == []
+    assert sorted(row["id"] for row in table.rows) == [i for i in range(16) if i not in (3, 11)]
+    assert sorted(_read_ids(writer.rejected_path)) == [3, 11]
+    # Деление пополам, а не построчная запись
+    assert table.calls < 16
+
+
+def test_write_returns_rows_on_transient_error(tmp_path):
+    writer = _writer(tmp_path, FakeTable(down=True))
+
+    failed = asyncio.run(writer._write(KIND, _rows(5)))
+
+    assert failed == _rows(5)
+    assert not os.path.exists(writer.rejected_path)
+
+
+def test_flush_spills_only_failed_rows_and_replay_writes_them(tmp_path):
+    table = FakeTable(down=True)
+    writer = _writer(tmp_path, table)
+
+    async def scenario():
+        written = await writer._flush([(KIND, row) for row in _rows(10)])
+        assert not written
+        assert _read_ids(writer.spill_path) == list(range(10))
+
+        # БД вернулась, но запись 3 она отвергает
+        table.down = False
+        table.bad_ids = {3}
+        await writer._replay_spill()
+
+    asyncio.run(scenario())
+
+    assert sorted(row["id"] for row in table.rows) == [i for i in range(10) if i != 3]
+    assert not os.path.exists(writer.spill_path)
+    assert _read_ids(writer.rejected_path) == [3]
+
+
+def test_replay_continues_after_a_failing_chunk(tmp_path):
+    class FlakyTable(FakeTable):
+        async def __call__(self, rows):
+            # Пакет с записью 2 не пишется (БД отвечает ошибкой), остальные - да
+            if any(row["id"] == 2 for row in rows):
+                raise OperationalError("INSERT", {}, TimeoutError("statement timeout"))
+            await super().__call__(rows)
+
+    table = FlakyTable()
+    writer = _writer(tmp_path, table, batch_size=2)
+    writer._append_spill(KIND, _rows(6))
+
+    asyncio.run(writer._replay_spill())
+
+    assert sorted(row["id"] for row in table.rows) == [0, 1, 4, 5]
+    assert _read_ids(writer.spill_path) == [2, 3]
+
+
+def test_replay_survives_spill_removal_error(tmp_path, monkeypatch):
+    table = FakeTable()
+    writer = _writer(tmp_path, table)
+    writer._append_spill(KIND, _rows(3))
+
+    def read_only(path):
+        raise PermissionError(30, "Read-only file system", path)
+
+    monkeypatch.setattr(os, "remove", read_only)
+    asyncio.run(writer._replay_spill())
+
+    assert len(table.rows) == 3
+    # Файл не удален и не дописан повторно
+    assert _read_ids(writer.spill_path) == [0, 1, 2]
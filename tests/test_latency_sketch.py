@@ -0,0 +1,70 @@
+"""
+Тесты скетча времени ответа (app.utils.latency_sketch)
+"""
+import random
+
+from app.utils.latency_sketch import LatencySketch
+
+# Гарантия скетча: (GAMMA - 1) / (GAMMA + 1)
+RELATIVE_ERROR = (LatencySketch.GAMMA - 1) / (LatencySketch.GAMMA + 1)
+
+
+def _exact_quantile(values, q):
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+
+def test_empty_sketch_has_no_quantiles():
+    assert LatencySketch().quantile(0.5) is None
+
+
+def test_quantiles_within_relative_error():
+    rng = random.Random(1)
+    values = [rng.lognormvariate(0, 1) for _ in range(5000)]
+    sketch = LatencySketch()
+    for value in values:
+        sketch.add(value)
+
+    assert sketch.count == len(values)
+    for q in (0.5, 0.9, 0.95, 0.99):
+        exact = _exact_quantile(values, q)
+        assert abs(sketch.quantile(q) - exact) <= exact * RELATIVE_ERROR * 1.001
+
+
+def test_tiny_values_go_to_zero_bucket():
+    sketch = LatencySketch()
+    sketch.add(0.0001, count=3)
+    sketch.add(None)
+    sketch.add(1.0, count=0)
+
+    assert sketch.zero_count == 3
+    assert sketch.count == 3
+    assert sketch.quantile(0.99) == 0.0
+
+
+def test_merge_equals_adding_everything_to_one_sketch():
+    hourly = [LatencySketch() for _ in range(3)]
+    combined = LatencySketch()
+    for i, sketch in enumerate(hourly):
+        for value in (0.1 * (i + 1), 0.5, 2.0 + i):
+            sketch.add(value)
+            combined.add(value)
+
+    daily = LatencySketch()
+    for sketch in hourly:
+        daily.merge(sketch)
+
+    assert daily.buckets == combined.buckets
+    assert daily.zero_count == combined.zero_count
+
+
+def test_json_round_trip():
+    sketch = LatencySketch()
+    for value in (0.0005, 0.2, 0.2, 3.5):
+        sketch.add(value)
+
+    restored = LatencySketch.from_dict(sketch.to_dict())
+
+    assert restored.buckets == sketch.buckets
+    assert restored.zero_count == sketch.zero_count
+    assert LatencySketch.from_dict(None).count == 0
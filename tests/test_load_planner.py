@@ -0,0 +1,68 @@
+"""
+Тесты планировщика нагрузки (app.core.load_planner)
+"""
+import pytest
+
+from app.core.load_planner import plan_offsets, render_curve
+
+
+def _domain(domain_id, interval=3600, duration=600, load=10, offset=None):
+    return {"domain_id": domain_id, "interval": interval, "duration": duration, "load": load, "offset": offset}
+
+
+def test_empty_plan():
+    plan = plan_offsets([])
+
+    assert plan["offsets"] == {}
+    assert plan["planned_peak"] == 0
+
+
+def test_identical_domains_are_spread_apart():
+    items = [_domain(i, offset=0) for i in range(4)]
+
+    plan = plan_offsets(items, slot_seconds=60)
+
+    # Все стартуют вместе - пик 4x; 4 прогрева по 10 минут помещаются в час без наложения
+    assert plan["current_peak"] == 40
+    assert plan["planned_peak"] == 10
+    offsets = sorted(plan["offsets"].values())
+    assert all(later - earlier >= 600 for earlier, later in zip(offsets, offsets[1:]))
+
+
+def test_offsets_stay_inside_each_interval():
+    items = [_domain(1, interval=1800), _domain(2, interval=3600, duration=1200, load=5), _domain(3, interval=900, duration=60)]
+
+    plan = plan_offsets(items, slot_seconds=30)
+
+    for item in items:
+        assert 0 <= plan["offsets"][item["domain_id"]] < item["interval"]
+    # Горизонт - НОК интервалов
+    assert plan["horizon_seconds"] == 3600
+    assert plan["current_peak"] is None
+
+
+def test_average_load_does_not_depend_on_offsets():
+    items = [_domain(1, duration=900, load=8, offset=0), _domain(2, duration=1800, load=4, offset=0)]
+
+    plan = plan_offsets(items, slot_seconds=60)
+
+    assert sum(plan["planned"]) == pytest.approx(sum(plan["current"]))
+    assert plan["planned_peak"] <= plan["current_peak"]
+
+
+def test_horizon_is_capped_for_coprime_intervals():
+    items = [_domain(1, interval=61 * 60, duration=60), _domain(2, interval=59 * 60, duration=60)]
+
+    plan = plan_offsets(items, slot_seconds=60, max_horizon_seconds=6 * 3600)
+
+    assert plan["horizon_seconds"] <= 6 * 3600
+    assert plan["horizon_seconds"] % (61 * 60) == 0
+
+
+def test_render_curve_scales_bars_to_peak():
+    lines = render_curve([0, 5, 10, 5], slot_seconds=900, rows=4, width=10).splitlines()
+
+    assert len(lines) == 4
+    assert lines[0].startswith("00:00")
+    assert lines[2] == "00:30 ██████████ 10"
+    assert render_curve([], slot_seconds=60) == ""
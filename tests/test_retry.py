@@ -0,0 +1,82 @@
+"""
+Тесты повторов прогрева (app.core.retry)
+"""
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import httpx
+import pytest
+
+from app.config import config
+from app.core.retry import RetryBudget, backoff_delay, retry_after_seconds, retry_delay
+
+
+@pytest.fixture
+def retry_config(monkeypatch):
+    monkeypatch.setattr(config, "WARMER_RETRY_ATTEMPTS", 2)
+    monkeypatch.setattr(config, "WARMER_RETRY_BASE_DELAY", 0.5)
+    monkeypatch.setattr(config, "WARMER_RETRY_MAX_DELAY", 10.0)
+
+
+def test_budget_is_a_percentage_of_planned_requests():
+    budget = RetryBudget(planned_requests=95, percent=10)
+
+    assert budget.limit == 10
+    assert all(budget.try_acquire() for _ in range(10))
+    assert budget.try_acquire() is False
+    assert budget.try_acquire() is False
+    assert (budget.used, budget.denied) == (10, 2)
+
+
+def test_zero_percent_budget_denies_every_retry():
+    budget = RetryBudget(planned_requests=1000, percent=0)
+
+    assert budget.limit == 0
+    assert budget.try_acquire() is False
+
+
+def test_backoff_uses_full_jitter_under_the_cap():
+    for attempt in range(10):
+        delay = backoff_delay(attempt, base=0.5, cap=4.0)
+        assert 0 <= delay <= min(4.0, 0.5 * 2 ** attempt)
+
+
+@pytest.mark.parametrize("result", [
+    {"status": "success", "status_code": 503},
+    {"status": "error", "retryable": True},
+    {"status": "timeout", "retryable": True},
+])
+def test_transient_failures_are_retried(retry_config, result):
+    assert retry_delay(result, attempt=0) is not None
+    # Попытки кончились
+    assert retry_delay(result, attempt=2) is None
+
+
+@pytest.mark.parametrize("result", [
+    {"status": "success", "status_code": 200},
+    {"status": "success", "status_code": 404},
+    {"status": "success", "status_code": 500},
+    {"status": "timeout", "retryable": False},
+    {"status": "error", "retryable": False},
+    {"status": "success", "status_code": 429, "retry_after": None},
+])
+def test_other_results_are_not_retried(retry_config, result):
+    assert retry_delay(result, attempt=0) is None
+
+
+def test_429_honours_retry_after_up_to_max_delay(retry_config):
+    assert retry_delay({"status": "success", "status_code": 429, "retry_after": 3.0}, attempt=0) == 3.0
+    assert retry_delay({"status": "success", "status_code": 429, "retry_after": 60.0}, attempt=0) is None
+
+
+def test_retry_after_parsing():
+    assert retry_after_seconds(httpx.Headers({"Retry-After": "7"})) == 7.0
+    assert retry_after_seconds(httpx.Headers({})) is None
+    assert retry_after_seconds(httpx.Headers({"Retry-After": "soon"})) is None
+
+    later = datetime.now(timezone.utc) + timedelta(seconds=30)
+    seconds = retry_after_seconds(httpx.Headers({"Retry-After": format_datetime(later, usegmt=True)}))
+    assert 25 <= seconds <= 30
+
+    past = datetime.now(timezone.utc) - timedelta(minutes=5)
+    assert retry_after_seconds(httpx.Headers({"Retry-After": format_datetime(past, usegmt=True)})) == 0.0
@@ -0,0 +1,173 @@
+"""
+Тесты воркера очереди прогревов (app.worker)
+
+Захват задач (SELECT ... FOR UPDATE SKIP LOCKED) и аренда живут в
+PostgreSQL; здесь проверяется сторона воркера: слоты конкурентности,
+heartbeat, возврат задач при остановке и запись результата.
+"""
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from app import worker as worker_module
+from app.worker import WarmingWorker
+
+
+def _task(task_id, job_id=None):
+    return SimpleNamespace(
+        id=task_id, domain_id=1, domain_name="example.com", urls=["https://example.com/"],
+        warming_type="auto", attempts=1, job_id=job_id, deadline_at=None,
+    )
+
+
+class FakeDB:
+    def __init__(self, tasks=(), options_error=None, lease_owned=True):
+        self.tasks = list(tasks)
+        self.options_error = options_error
+        self.lease_owned = lease_owned
+        self.completed = []
+        self.failed = []
+        self.released = []
+        self.renewed = 0
+
+    async def claim_warming_task(self, worker_id, lease_seconds, max_attempts):
+        return self.tasks.pop(0) if self.tasks else None
+
+    async def get_domain_warming_options(self, domain_id):
+        if self.options_error:
+            raise self.options_error
+        return {}
+
+    async def renew_warming_task_lease(self, task_id, worker_id, lease_seconds):
+        self.renewed += 1
+        return self.lease_owned
+
+    async def complete_warming_task(self, task_id, worker_id, stats):
+        self.completed.append((task_id, stats))
+        return True
+
+    async def fail_warming_task(self, task_id, worker_id, error, max_attempts, retry_delay):
+        self.failed.append((task_id, error))
+
+    async def release_warming_task(self, task_id, worker_id):
+        self.released.append(task_id)
+
+    async def update_job_last_run(self, job_id):
+        pass
+
+
+class FakeWarmer:
+    def __init__(self, duration=0.0):
+        self.duration = duration
+        self.calls = 0
+        self.max_active = 0
+        self._active = 0
+
+    async def warm_site(self, urls, domain_name="", deadline_seconds=None, **options):
+        self.calls += 1
+        self._active += 1
+        self.max_active = max(self.max_active, self._active)
+        try:
+            await asyncio.sleep(self.duration)
+        finally:
+            self._active -= 1
+        return {"started_at": datetime(2026, 1, 1), "total_requests": len(urls)}
+
+
+class FakeHistoryWriter:
+    def __init__(self):
+        self.results = []
+
+    async def submit_warming_result(self, domain_id, stats, warming_type):
+        self.results.append((domain_id, warming_type))
+
+
+@pytest.fixture
+def env(monkeypatch):
+    def setup(db, warmer):
+        history = FakeHistoryWriter()
+        monkeypatch.setattr(worker_module, "db_manager", db)
+        monkeypatch.setattr(worker_module, "warmer", warmer)
+        monkeypatch.setattr(worker_module, "history_writer", history)
+        return history
+    return setup
+
+
+def _worker(concurrency=2, lease_seconds=60):
+    worker = WarmingWorker(worker_id="test:1", concurrency=concurrency)
+    worker.poll_interval = 0.01
+    worker.lease_seconds = lease_seconds
+    return worker
+
+
+def test_worker_runs_tasks_within_concurrency(env):
+    db = FakeDB(tasks=[_task(i, job_id=i) for i in range(5)])
+    fake_warmer = FakeWarmer(duration=0.05)
+    history = env(db, fake_warmer)
+
+    async def scenario():
+        worker = _worker(concurrency=2)
+        runner = asyncio.create_task(worker.run())
+        while len(db.completed) < 5:
+            await asyncio.sleep(0.01)
+        worker.stop()
+        await runner
+        return worker
+
+    worker = asyncio.run(scenario())
+
+    assert sorted(task_id for task_id, _ in db.completed) == [0, 1, 2, 3, 4]
+    assert fake_warmer.max_active == 2
+    assert len(history.results) == 5
+    assert worker.running == {}
+    # Статистика уходит в JSON-колонку: даты - строками
+    assert db.completed[0][1]["started_at"] == "2026-01-01T00:00:00"
+
+
+def test_options_lookup_failure_frees_slot_and_fails_task(env):
+    db = FakeDB(options_error=RuntimeError("db down"))
+    env(db, FakeWarmer())
+    worker = _worker()
+    worker.running[7] = None
+
+    asyncio.run(worker._execute(_task(7)))
+
+    assert worker.running == {}
+    assert db.failed == [(7, "db down")]
+    assert db.completed == []
+
+
+def test_lost_lease_cancels_warming_without_recording(env):
+    db = FakeDB(lease_owned=False)
+    env(db, FakeWarmer(duration=10))
+    # Heartbeat раз в max(1, lease / 3) секунд
+    worker = _worker(lease_seconds=1)
+    worker.running[3] = None
+
+    asyncio.run(asyncio.wait_for(worker._execute(_task(3)), timeout=5))
+
+    assert db.renewed == 1
+    assert worker.running == {}
+    assert db.completed == [] and db.failed == [] and db.released == []
+
+
+def test_stop_returns_running_tasks_to_queue(env):
+    db = FakeDB(tasks=[_task(1), _task(2)])
+    env(db, FakeWarmer(duration=10))
+
+    async def scenario():
+        worker = _worker(concurrency=2)
+        runner = asyncio.create_task(worker.run())
+        while len(worker.running) < 2:
+            await asyncio.sleep(0.01)
+        worker.stop()
+        await asyncio.wait_for(runner, timeout=5)
+        return worker
+
+    worker = asyncio.run(scenario())
+
+    assert sorted(db.released) == [1, 2]
+    assert db.completed == []
+    assert worker.running == {}